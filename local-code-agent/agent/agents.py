@@ -1,13 +1,15 @@
-from agent.tool_schemas import TOOL_SCHEMAS
+import threading
 import config
-import google.generativeai as genai
-from google.ai.generativelanguage import Tool
+from agent.utils import estimate_tokens
+from agent.prompt_cache import get_prompt_cache, is_missing_cache_error
+from agent.response_cache import get_response_cache
+
+def _build_model(tool_names):
+    # Imported here so that importing this module does not pull in the Gemini SDK
+    import google.generativeai as genai
+    from google.ai.generativelanguage import Tool
+    from agent.tool_schemas import TOOL_SCHEMAS
 
-def create_agent(system_prompt, tool_names):
-    """
-    Returns a function that can be called with a user message and conversation history.
-    This function will invoke Gemini with the appropriate tools.
-    """
     # Create the tool list from schemas
     tool_declarations = [TOOL_SCHEMAS[name] for name in tool_names if name in TOOL_SCHEMAS]
 
@@ -16,32 +18,104 @@ def create_agent(system_prompt, tool_names):
 
     genai.configure(api_key=config.GEMINI_API_KEY)
 
-    model = genai.GenerativeModel(model_name=config.GEMINI_MODEL, tools=tools)
+    return genai.GenerativeModel(model_name=config.GEMINI_MODEL, tools=tools)
+
+def create_agent(system_prompt, tool_names, prompt_cache=None, prefix=None, response_cache=None):
+    """
+    Returns a function that can be called with a user message and conversation history.
+    This function will invoke Gemini with the appropriate tools.
+    The underlying GenerativeModel is created on the first call (or by `agent_fn.warm_up()`).
+
+    prefix is a list of messages sent after the system prompt on every call. With a
+    prompt cache (by default the shared one if PROMPT_CACHE_ENABLED is set), the
+    system prompt, tools and prefix are cached and only the rest is sent.
+    With a response cache (by default the shared one unless RESPONSE_CACHE_MODE is
+    "off"), responses are recorded and replayed by a hash of the full request.
+    """
+    model = None
+    lock = threading.Lock()
+    prefix = list(prefix or [])
+
+    def get_model():
+        nonlocal model
+        if model is None:
+            with lock:
+                if model is None:
+                    model = _build_model(tool_names)
+        return model
 
-    def agent_fn(user_input, history=None):
+    def agent_fn(user_input, history=None, stream=False):
         if history is None:
             history = []
 
         # Combine system prompt as a user message (since Gemini has no system role)
         # We assume history contains the previous turn's messages
-        messages = [{"role": "user", "parts": [system_prompt]}] + history + [{"role": "user", "parts": [user_input]}]
+        full_messages = [{"role": "user", "parts": [system_prompt]}] + prefix + history + [{"role": "user", "parts": [user_input]}]
+
+        def generate():
+            cache = prompt_cache if prompt_cache is not None else get_prompt_cache()
+            cached_model = cache.get_model(system_prompt, tool_names, prefix) if cache is not None else None
+
+            if cached_model is not None:
+                # The static prefix lives in the cached content; send only the delta
+                delta = history + [{"role": "user", "parts": [user_input]}]
+                try:
+                    return cached_model.generate_content(delta, stream=stream)
+                except Exception as e:
+                    if not is_missing_cache_error(e):
+                        raise
+                    print("Warning: Cached prompt prefix expired, creating it again")
+                    cache.invalidate(system_prompt, tool_names, prefix)
+                    cached_model = cache.get_model(system_prompt, tool_names, prefix)
+                    if cached_model is not None:
+                        return cached_model.generate_content(delta, stream=stream)
+            # With stream=True the response is an iterator of partial chunks
+            return get_model().generate_content(full_messages, stream=stream)
 
         try:
-            response = model.generate_content(messages)
-            return response
+            responses = response_cache if response_cache is not None else get_response_cache()
+            if responses is not None:
+                return responses.generate(config.GEMINI_MODEL, tool_names, full_messages, generate, stream=stream)
+            return generate()
         except Exception as e:
             print(f"Error in agent generation: {e}")
             raise e
 
+    agent_fn.warm_up = get_model
+    # Tokens sent with every call besides the history and the user message
+    agent_fn.prompt_tokens = estimate_tokens(system_prompt) + sum(
+        estimate_tokens(str(part)) for message in prefix for part in message.get("parts", [])
+    )
     return agent_fn
 
+def warm_up(background=False):
+    """
+    Builds the models of all predefined agents ahead of their first call.
+    With background=True this happens in a daemon thread and returns immediately.
+    """
+    def load():
+        try:
+            for agent_fn in (code_reader, code_writer, tester, debugger, planner):
+                agent_fn.warm_up()
+        except Exception as e:
+            print(f"Warning: Agent warm-up failed: {e}")
+
+    if background:
+        thread = threading.Thread(target=load, name="agents-warm-up", daemon=True)
+        thread.start()
+        return thread
+    load()
+
 # Define agents
 
 code_reader = create_agent(
     "You are a Code Reader. Your job is to understand and explain the existing codebase. "
     "You have tools to search, read files, and list directories. "
+    "To find where a symbol is defined, used or called from, use find_definition, "
+    "find_references and callers_of rather than searching. "
     "Do not modify any files. Provide clear explanations based on the code.",
-    ["search_code", "read_file", "list_directory", "get_code_structure", "ask_orchestrator"]
+    ["search_code", "read_file", "list_directory", "get_code_structure",
+     "find_definition", "find_references", "callers_of", "ask_orchestrator"]
 )
 
 code_writer = create_agent(
@@ -69,7 +143,10 @@ debugger = create_agent(
 planner = create_agent(
     "You are a Planner. Given a user request, break it down into a sequence of subtasks that can be handled by specialised agents. "
     "Available agents: reader (understands code), writer (modifies code), tester (runs tests), debugger (fixes errors). "
-    "Output a JSON list of objects, each with 'agent' and 'task' fields. "
-    "Example: [{'agent': 'reader', 'task': '...'}, {'agent': 'writer', 'task': '...'}]",
+    "Output a JSON list of objects, each with 'id', 'agent' and 'task' fields, and an optional 'depends_on' list "
+    "with the ids of earlier steps whose results the step needs. Steps that do not depend on each other run in parallel, "
+    "so only add dependencies that are really needed. "
+    "Example: [{'id': 'a', 'agent': 'reader', 'task': '...'}, {'id': 'b', 'agent': 'reader', 'task': '...'}, "
+    "{'id': 'c', 'agent': 'writer', 'task': '...', 'depends_on': ['a', 'b']}]",
     []
 )
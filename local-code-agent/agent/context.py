@@ -0,0 +1,68 @@
+from agent.utils import estimate_tokens
+
+"""
+Token-budgeted compaction of previous step results.
+The orchestrator passes earlier results to later steps as context. Without a
+budget, long plans resend every earlier file dump to every later step, so the
+prompt grows roughly quadratically with plan length. ContextBuilder keeps the
+most recent results intact and shrinks older ones to fit the budget.
+"""
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    Shortens text to about max_tokens, keeping its beginning and end, which is
+    where answers and conclusions usually are.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_chars = max(0, max_tokens * 4)
+    head = text[:max_chars * 2 // 3]
+    tail = text[len(text) - max_chars // 3:] if max_chars // 3 else ""
+    omitted = estimate_tokens(text) - max_tokens
+    return f"{head}\n... [{omitted} tokens omitted] ...\n{tail}"
+
+class ContextBuilder:
+    def __init__(self, total_budget, step_budget, min_step_tokens=64, summarize=None):
+        """
+        Args:
+            total_budget: Maximum estimated tokens of context passed to one step.
+            step_budget: Maximum estimated tokens kept from any single result.
+            min_step_tokens: Below this, a result is replaced by a one-line stub.
+            summarize: Optional function (text, max_tokens) -> text used instead of
+                truncation, e.g. an LLM summarizer.
+        """
+        self.total_budget = total_budget
+        self.step_budget = step_budget
+        self.min_step_tokens = min_step_tokens
+        self.summarize = summarize or truncate_to_tokens
+
+    def build(self, results):
+        """
+        Compacts an ordered dict of step_id -> result (oldest first).
+        Returns (context_string, report) where report maps each step id to
+        {"original_tokens", "tokens", "mode"} with mode one of full/truncated/stub.
+        """
+        remaining = self.total_budget
+        kept = {}
+        report = {}
+
+        # Newest results are most relevant to the next step, so they are funded first
+        for step_id in reversed(list(results)):
+            text = str(results[step_id])
+            original = estimate_tokens(text)
+            allowance = min(self.step_budget, remaining)
+
+            if original <= allowance:
+                compacted, mode = text, "full"
+            elif allowance >= self.min_step_tokens:
+                compacted, mode = self.summarize(text, allowance), "truncated"
+            else:
+                compacted, mode = f"[omitted, {original} tokens; use ask_orchestrator get_state to see it]", "stub"
+
+            tokens = estimate_tokens(compacted)
+            remaining = max(0, remaining - tokens)
+            kept[step_id] = compacted
+            report[step_id] = {"original_tokens": original, "tokens": tokens, "mode": mode}
+
+        parts = [f"Result from {step_id}:\n{kept[step_id]}\n" for step_id in results]
+        return "\n".join(parts), report
@@ -2,6 +2,7 @@ import config
 from agent.tools import execute_tool, search_code
 from agent.execution import execute_agent_loop
 from agent.agents import create_agent
+from agent.utils import estimate_tokens
 
 """
 This module contains the single-agent implementation.
@@ -10,7 +11,8 @@ It uses the shared `create_agent` utility and delegates execution to `execute_ag
 
 # Define constants for clarity and maintainability
 SYSTEM_PROMPT = """You are an AI assistant that helps developers with their local codebase.
-You have access to the following tools: search_code, read_file, write_file, run_command, list_directory, get_code_structure, ask_user.
+You have access to the following tools: search_code, read_file, write_file, run_command, list_directory, get_code_structure, find_definition, find_references, callers_of, ask_user.
+Use find_definition, find_references and callers_of to locate a known symbol and its uses; they are faster than search_code.
 Always think step by step. Use tools to gather information. When you have enough information, provide a final answer.
 """
 
@@ -21,32 +23,44 @@ TOOL_NAMES = [
     "run_command",
     "list_directory",
     "get_code_structure",
+    "find_definition",
+    "find_references",
+    "callers_of",
     "ask_user"
 ]
 
-def run_agent(user_query):
+def run_agent(user_query, stream=False):
     """
     Runs the single-agent loop.
+    With stream=True, the agent's text is printed as it is generated.
     """
-    # Create the agent function
-    agent = create_agent(SYSTEM_PROMPT, TOOL_NAMES)
-
     history = []
+    prefix = []
 
     # Initial search to provide context
     print(f"Agent: Searching code for context...")
     try:
         context = search_code(user_query)
         if context:
-            history.append({"role": "user", "parts": [f"Context found from codebase:\n{context}"]})
+            message = {"role": "user", "parts": [f"Context found from codebase:\n{context}"]}
+            # With prompt caching the context is part of the cached prefix instead of the history
+            if config.PROMPT_CACHE_ENABLED:
+                prefix.append(message)
+            else:
+                history.append(message)
     except Exception as e:
         print(f"Initial search failed: {e}")
 
+    # Create the agent function
+    agent = create_agent(SYSTEM_PROMPT, TOOL_NAMES, prefix=prefix)
+
     # We do NOT append user_query to history here, because agent_fn appends it at the end of every prompt.
     # This acts as a reminder of the task.
 
     def get_response_fn(hist):
         # Calls the agent which interacts with Gemini
+        if stream:
+            return agent(user_query, hist, stream=True)
         return agent(user_query, hist)
 
     # Delegate the execution loop to the shared utility
@@ -56,5 +70,7 @@ def run_agent(user_query):
         history,
         execute_tool,
         max_iterations=10,
-        log_func=print
+        log_func=print,
+        on_text=(lambda text: print(text, end="", flush=True)) if stream else None,
+        fixed_tokens=agent.prompt_tokens + estimate_tokens(user_query)
     )
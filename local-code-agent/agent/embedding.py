@@ -1,11 +1,14 @@
 import numpy as np
-import google.generativeai as genai
-from sentence_transformers import SentenceTransformer
 import config
+from agent.embedding_cache import EmbeddingCache
+from agent.gemini_client import AsyncEmbeddingClient, GeminiRestTransport, run_sync
 
 class GeminiEmbedder:
     def __init__(self, model_name):
+        # Imported here so that importing this module does not pull in the Gemini SDK
+        import google.generativeai as genai
         genai.configure(api_key=config.GEMINI_API_KEY)
+        self.genai = genai
         self.model_name = model_name
 
     def encode(self, content, task_type="retrieval_document"):
@@ -18,7 +21,7 @@ class GeminiEmbedder:
             A numpy array of embeddings.
         """
         if isinstance(content, str):
-            result = genai.embed_content(
+            result = self.genai.embed_content(
                 model=self.model_name,
                 content=content,
                 task_type=task_type
@@ -26,7 +29,7 @@ class GeminiEmbedder:
             return np.array(result['embedding'])
         elif isinstance(content, list):
             # Batch embedding
-            result = genai.embed_content(
+            result = self.genai.embed_content(
                 model=self.model_name,
                 content=content,
                 task_type=task_type
@@ -35,16 +38,100 @@ class GeminiEmbedder:
         else:
             raise ValueError("Content must be a string or a list of strings.")
 
+class AsyncGeminiEmbedder(GeminiEmbedder):
+    """
+    Gemini embedder backed by AsyncEmbeddingClient: batches are split to the API
+    limits, sent concurrently within the configured request and token budgets,
+    and transient failures such as 429s are retried with jittered backoff.
+    """
+    def __init__(self, model_name, transport=None, **client_options):
+        # Talks to the REST API directly and needs no Gemini SDK
+        self.model_name = model_name
+        if transport is None:
+            transport = GeminiRestTransport(config.GEMINI_API_KEY, base_url=config.GEMINI_API_BASE_URL)
+        options = {
+            "concurrency": config.GEMINI_EMBED_CONCURRENCY,
+            "requests_per_minute": config.GEMINI_EMBED_RPM,
+            "tokens_per_minute": config.GEMINI_EMBED_TPM,
+            "max_batch_items": config.EMBED_BATCH_LIMITS["gemini"]["max_items"],
+            "max_batch_tokens": config.EMBED_BATCH_LIMITS["gemini"]["max_tokens"],
+            "max_retries": config.GEMINI_EMBED_MAX_RETRIES,
+        }
+        options.update(client_options)
+        self.client = AsyncEmbeddingClient(transport, model_name, **options)
+
+    async def aencode(self, content, task_type="retrieval_document"):
+        if isinstance(content, str):
+            return (await self.client.embed([content], task_type))[0]
+        elif isinstance(content, list):
+            return await self.client.embed(content, task_type)
+        else:
+            raise ValueError("Content must be a string or a list of strings.")
+
+    def encode(self, content, task_type="retrieval_document"):
+        return np.array(run_sync(self.aencode(content, task_type=task_type)))
+
 class SentenceTransformerEmbedder:
     def __init__(self, model_name):
+        # Imported here: sentence_transformers loads torch, which takes seconds
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
         self.model = SentenceTransformer(model_name)
 
     def encode(self, content, **kwargs):
         # SentenceTransformer encode doesn't use task_type, so we ignore kwargs
         return self.model.encode(content)
 
-def get_embedding_model(model_name):
-    if model_name.startswith("models/"):
-        return GeminiEmbedder(model_name)
+class CachedEmbedder:
+    """
+    Wraps an embedder with a content-addressed EmbeddingCache.
+    Only texts that are not already cached are sent to the underlying embedder.
+    """
+    def __init__(self, embedder, cache):
+        self.embedder = embedder
+        self.cache = cache
+        self.model_name = embedder.model_name
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, content, task_type="retrieval_document"):
+        if isinstance(content, str):
+            return self.encode([content], task_type=task_type)[0]
+        if not isinstance(content, list):
+            raise ValueError("Content must be a string or a list of strings.")
+
+        keys = [EmbeddingCache.key(self.model_name, task_type, text) for text in content]
+        vectors = self.cache.get_many(keys)
+
+        # Identical texts within a batch only need to be embedded once
+        missing = {}
+        for key, text in zip(keys, content):
+            if key not in vectors:
+                missing.setdefault(key, text)
+
+        self.hits += len(keys) - sum(1 for key in keys if key in missing)
+        self.misses += len(missing)
+
+        if missing:
+            fresh = self.embedder.encode(list(missing.values()), task_type=task_type)
+            fresh = {key: [float(x) for x in vector] for key, vector in zip(missing, fresh)}
+            self.cache.put_many(fresh)
+            vectors.update(fresh)
+
+        return np.array([vectors[key] for key in keys])
+
+def embedding_backend(model_name):
+    """
+    Returns the backend name ("gemini" or "sentence_transformer") used for a model.
+    """
+    return "gemini" if model_name.startswith("models/") else "sentence_transformer"
+
+def get_embedding_model(model_name, cache_path=None, cache_max_entries=500_000):
+    if embedding_backend(model_name) == "gemini":
+        embedder = AsyncGeminiEmbedder(model_name) if config.GEMINI_EMBED_ASYNC else GeminiEmbedder(model_name)
     else:
-        return SentenceTransformerEmbedder(model_name)
+        embedder = SentenceTransformerEmbedder(model_name)
+
+    if cache_path:
+        return CachedEmbedder(embedder, EmbeddingCache(cache_path, max_entries=cache_max_entries))
+    return embedder
@@ -0,0 +1,149 @@
+import collections
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+
+"""
+Content-addressed, on-disk embedding cache.
+Vectors are keyed by (model name, task type, sha256 of the text), so a chunk whose
+text is unchanged hits the cache even if its id or position in the file changed.
+The cache is bounded by entry count and evicts the least recently used vectors.
+"""
+
+class EmbeddingCache:
+    def __init__(self, path, max_entries=500_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn = None
+        self._lock = threading.Lock()
+        # Logical clock for LRU ordering; unlike wall time it never produces ties
+        self._clock = 0
+
+    @staticmethod
+    def key(model_name, task_type, text):
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{model_name}\0{task_type}\0{text_hash}".encode("utf-8")).hexdigest()
+
+    def _connect(self):
+        # Opened lazily so constructing an embedder never touches the disk.
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used INTEGER NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings (last_used)")
+            self._clock = self._conn.execute("SELECT COALESCE(MAX(last_used), 0) FROM embeddings").fetchone()[0]
+        return self._conn
+
+    def _tick(self):
+        self._clock += 1
+        return self._clock
+
+    def get_many(self, keys):
+        """
+        Returns a dict mapping each cached key to its vector (a list of floats).
+        Hits are marked as recently used.
+        """
+        found = {}
+        if not keys:
+            return found
+
+        with self._lock:
+            conn = self._connect()
+            unique_keys = list(dict.fromkeys(keys))
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(unique_keys), 500):
+                batch = unique_keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+
+            if found:
+                conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(self._tick(), key) for key in found]
+                )
+                conn.commit()
+        return found
+
+    def put_many(self, items):
+        """
+        Stores a dict of key -> vector and evicts the least recently used entries
+        if the cache grew past max_entries.
+        """
+        if not items:
+            return
+
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), self._tick()) for key, vector in items.items()]
+            )
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        if not self.max_entries:
+            return
+        count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        # Evict down to 90% of the bound so we do not evict on every insert
+        excess = count - int(self.max_entries * 0.9)
+        conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (excess,)
+        )
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+class LRUCache:
+    """
+    Small thread-safe in-memory LRU map, used for query embeddings that are
+    repeated within a session.
+    """
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
@@ -1,12 +1,73 @@
 import json
+from concurrent.futures import ThreadPoolExecutor
 from google.ai.generativelanguage import Content, Part, FunctionResponse
+import config
+from agent.history import HistoryPolicy
+
+# Tools without side effects; consecutive calls to these within one turn run concurrently
+READ_ONLY_TOOLS = {
+    "read_file", "search_code", "list_directory", "get_code_structure",
+    "find_definition", "find_references", "callers_of"
+}
+
+def _call_tool(tool_executor, tool_name, tool_args):
+    try:
+        return tool_executor(tool_name, tool_args)
+    except Exception as e:
+        return f"Error executing tool {tool_name}: {e}"
+
+def run_tool_calls(calls, tool_executor, max_workers=None):
+    """
+    Executes a list of (tool_name, tool_args) calls and returns their results in order.
+    Runs of consecutive read-only calls execute concurrently in a thread pool; any
+    other tool acts as a barrier and runs alone, so side effects keep their order.
+    """
+    if max_workers is None:
+        max_workers = config.MAX_PARALLEL_TOOL_CALLS
+
+    results = [None] * len(calls)
+    i = 0
+    while i < len(calls):
+        j = i
+        while j < len(calls) and calls[j][0] in READ_ONLY_TOOLS:
+            j += 1
+
+        if j - i > 1 and max_workers > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, j - i)) as pool:
+                futures = [pool.submit(_call_tool, tool_executor, name, args) for name, args in calls[i:j]]
+                for k, future in enumerate(futures):
+                    results[i + k] = future.result()
+            i = j
+        else:
+            name, args = calls[i]
+            results[i] = _call_tool(tool_executor, name, args)
+            i += 1
+    return results
+
+def consume_stream(response, on_text):
+    """
+    Iterates a streamed response, passing each text part to on_text as soon as it
+    arrives. Function-call parts are not forwarded; their names are returned.
+    Once consumed, the response exposes the aggregated parts and candidates.
+    """
+    function_calls = []
+    for chunk in response:
+        for part in getattr(chunk, "parts", None) or []:
+            if getattr(part, "function_call", None):
+                function_calls.append(part.function_call.name)
+            elif getattr(part, "text", None):
+                on_text(part.text)
+    return function_calls
 
 def execute_agent_loop(
     get_response_fn,
     history,
     tool_executor,
     max_iterations=10,
-    log_func=None
+    log_func=None,
+    on_text=None,
+    history_policy=None,
+    fixed_tokens=0
 ):
     """
     Executes the agent loop.
@@ -17,14 +78,36 @@ def execute_agent_loop(
         tool_executor: A function that takes tool_name and tool_args, executes the tool, and returns the result string.
         max_iterations: Maximum number of iterations.
         log_func: Optional function for logging (e.g., print).
+        on_text: Optional callback for streaming. When set, responses are consumed as a stream
+            and every text chunk is passed to it as it arrives.
+        history_policy: Optional HistoryPolicy deciding what part of the history is sent to
+            the model each iteration. Defaults to one with the configured token budget.
+            The history list itself always keeps the full conversation.
+        fixed_tokens: Estimated tokens sent with every request besides the history
+            (system prompt, prefix and task message); they count against the budget.
     """
     if log_func is None:
         log_func = lambda x: None
+    if history_policy is None:
+        history_policy = HistoryPolicy(
+            config.HISTORY_TOKEN_BUDGET,
+            keep_recent=config.HISTORY_KEEP_RECENT,
+            stub_tokens=config.HISTORY_STUB_TOKENS,
+            max_result_tokens=config.HISTORY_RESULT_MAX_TOKENS
+        )
 
     for i in range(max_iterations):
         log_func(f"Iteration {i+1}/{max_iterations}")
         try:
-            response = get_response_fn(history)
+            prompt_history = history_policy.apply(history, fixed_tokens=fixed_tokens)
+            turn = history_policy.turns[-1]
+            if turn["saved"]:
+                log_func(f"History: {turn['tokens']} tokens sent, {turn['saved']} saved")
+            response = get_response_fn(prompt_history)
+            if on_text is not None:
+                function_calls = consume_stream(response, on_text)
+                if function_calls:
+                    log_func(f"Streamed function calls: {function_calls}")
         except Exception as e:
             return f"Error calling agent: {e}"
 
@@ -33,38 +116,33 @@ def execute_agent_loop(
              return "Error: Empty response from agent."
 
         part = response.parts[0]
+        function_calls = [p.function_call for p in response.parts if hasattr(p, 'function_call') and p.function_call]
 
-        # Check for function call
-        if hasattr(part, 'function_call') and part.function_call:
-            fc = part.function_call
-            tool_name = fc.name
-            tool_args = dict(fc.args)
-
-            log_func(f"Agent calls tool: {tool_name} with {tool_args}")
+        # Check for function calls; a single turn may request several
+        if function_calls:
+            calls = [(fc.name, dict(fc.args)) for fc in function_calls]
+            for tool_name, tool_args in calls:
+                log_func(f"Agent calls tool: {tool_name} with {tool_args}")
 
             # Append model's tool call to history
             # We assume response.candidates[0].content is the correct object to append
             history.append(response.candidates[0].content)
 
-            # Execute tool
-            try:
-                result = tool_executor(tool_name, tool_args)
-            except Exception as e:
-                result = f"Error executing tool {tool_name}: {e}"
-
-            log_func(f"Tool Result: {result[:200]}..." if len(str(result)) > 200 else f"Tool Result: {result}")
-
-            # Append tool response to history
-            # Create the Part with FunctionResponse
-            func_response_part = Part(
-                function_response=FunctionResponse(
-                    name=tool_name,
-                    response={"result": result}
-                )
-            )
-
-            # Append as a Content object with role 'function'
-            history.append(Content(role="function", parts=[func_response_part]))
+            results = run_tool_calls(calls, tool_executor)
+
+            # Create one Part with a FunctionResponse per call, in the order the model made them
+            response_parts = []
+            for (tool_name, _), result in zip(calls, results):
+                log_func(f"Tool Result: {result[:200]}..." if len(str(result)) > 200 else f"Tool Result: {result}")
+                response_parts.append(Part(
+                    function_response=FunctionResponse(
+                        name=tool_name,
+                        response={"result": result}
+                    )
+                ))
+
+            # Append all responses as a single Content object with role 'function'
+            history.append(Content(role="function", parts=response_parts))
 
         elif hasattr(part, 'text') and part.text:
             # Final answer
@@ -0,0 +1,257 @@
+import asyncio
+import collections
+import contextlib
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from agent.utils import estimate_tokens
+
+"""
+Asyncio client for the Gemini batchEmbedContents REST endpoint.
+Keeps several requests in flight, stays inside a requests-per-minute and
+tokens-per-minute budget, retries transient failures (429, 5xx, network errors)
+with jittered exponential backoff and splits batches the API rejects as too large.
+The base URL is configurable so the client can be pointed at a local fake server.
+"""
+
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com"
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+class EmbeddingAPIError(Exception):
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self):
+        # status None means the request never got an HTTP answer (timeout, connection reset)
+        return self.status is None or self.status in RETRYABLE_STATUS
+
+    @property
+    def too_large(self):
+        if self.status == 413:
+            return True
+        message = str(self).lower()
+        return self.status == 400 and any(s in message for s in ("at most", "too large", "exceeds"))
+
+class RateLimiter:
+    """
+    Sliding-window limiter for requests and tokens per period (60s by default).
+    State is guarded by a threading lock so one limiter can be shared by several
+    event loops, e.g. one per indexing thread.
+    """
+    def __init__(self, requests_per_period, tokens_per_period, period=60.0):
+        self.requests_per_period = requests_per_period
+        self.tokens_per_period = tokens_per_period
+        self.period = period
+        self._window = collections.deque()
+        self._tokens = 0
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens):
+        """
+        Reserves capacity if available and returns 0, otherwise returns how long to wait.
+        """
+        now = time.monotonic()
+        with self._lock:
+            while self._window and now - self._window[0][0] >= self.period:
+                self._tokens -= self._window.popleft()[1]
+
+            fits_requests = len(self._window) < self.requests_per_period
+            # A single request larger than the whole budget is let through on an empty window
+            fits_tokens = self._tokens + tokens <= self.tokens_per_period or not self._window
+            if fits_requests and fits_tokens:
+                self._window.append((now, tokens))
+                self._tokens += tokens
+                return 0.0
+            return max(0.0, self._window[0][0] + self.period - now)
+
+    async def acquire(self, tokens=0):
+        while True:
+            delay = self._reserve(tokens)
+            if not delay:
+                return
+            await asyncio.sleep(delay)
+
+class GeminiRestTransport:
+    def __init__(self, api_key, base_url=DEFAULT_BASE_URL, timeout=60):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    async def batch_embed(self, model_name, texts, task_type):
+        # urllib is blocking; run it in the default executor so requests overlap
+        return await asyncio.to_thread(self._post, model_name, texts, task_type)
+
+    def _post(self, model_name, texts, task_type):
+        body = {
+            "requests": [
+                {
+                    "model": model_name,
+                    "content": {"parts": [{"text": text}]},
+                    "taskType": task_type.upper(),
+                }
+                for text in texts
+            ]
+        }
+        request = urllib.request.Request(
+            f"{self.base_url}/v1beta/{model_name}:batchEmbedContents",
+            data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json", "x-goog-api-key": self.api_key},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                data = json.loads(response.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            raise EmbeddingAPIError(
+                f"Embedding request failed with HTTP {e.code}: {e.read().decode('utf-8', 'replace')}",
+                status=e.code,
+                retry_after=_parse_retry_after(e.headers.get("Retry-After") if e.headers else None),
+            )
+        except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+            raise EmbeddingAPIError(f"Embedding request failed: {e}")
+
+        return [item["values"] for item in data["embeddings"]]
+
+def _parse_retry_after(value):
+    # Only the delta-seconds form is honoured; an HTTP date falls back to backoff
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+class AsyncEmbeddingClient:
+    def __init__(self, transport, model_name, concurrency=8, requests_per_minute=1500,
+                 tokens_per_minute=1_000_000, max_batch_items=100, max_batch_tokens=20_000,
+                 max_retries=6, backoff_base=1.0, backoff_max=60.0, rate_period=60.0):
+        self.transport = transport
+        self.model_name = model_name
+        self.concurrency = concurrency
+        self.max_batch_items = max_batch_items
+        self.max_batch_tokens = max_batch_tokens
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute, period=rate_period)
+        # Requests in flight across every call, including calls from other threads
+        # running their own event loops (EMBED_WORKERS), so like the limiter it
+        # is a threading primitive rather than an asyncio.Semaphore
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self.retries = 0
+        self.splits = 0
+
+    def split_batches(self, texts):
+        batches = []
+        current = []
+        current_tokens = 0
+        for text in texts:
+            tokens = estimate_tokens(text)
+            if current and (len(current) >= self.max_batch_items or current_tokens + tokens > self.max_batch_tokens):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    async def embed(self, texts, task_type="retrieval_document"):
+        """
+        Embeds a list of texts and returns one vector per text, in order.
+        """
+        results = await asyncio.gather(
+            *(self._embed_batch(batch, task_type) for batch in self.split_batches(texts))
+        )
+        return [vector for batch in results for vector in batch]
+
+    @contextlib.asynccontextmanager
+    async def _slot(self):
+        if not self._slots.acquire(blocking=False):
+            await self._wait_for_slot()
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    async def _wait_for_slot(self):
+        """
+        Blocks in a worker thread until a slot is free. If the request is cancelled
+        while the thread waits, whichever side finishes last gives the slot back,
+        so a cancelled request never keeps one (even if its event loop is gone).
+        """
+        lock = threading.Lock()
+        state = {"acquired": False, "cancelled": False}
+
+        def acquire():
+            self._slots.acquire()
+            with lock:
+                if state["cancelled"]:
+                    self._slots.release()
+                else:
+                    state["acquired"] = True
+
+        try:
+            await asyncio.to_thread(acquire)
+        except asyncio.CancelledError:
+            with lock:
+                state["cancelled"] = True
+                if state["acquired"]:
+                    self._slots.release()
+            raise
+
+    async def _embed_batch(self, texts, task_type):
+        attempt = 0
+        while True:
+            await self.limiter.acquire(sum(estimate_tokens(t) for t in texts))
+            try:
+                async with self._slot():
+                    return await self.transport.batch_embed(self.model_name, texts, task_type)
+            except EmbeddingAPIError as e:
+                if e.too_large and len(texts) > 1:
+                    self.splits += 1
+                    middle = len(texts) // 2
+                    halves = await asyncio.gather(
+                        self._embed_batch(texts[:middle], task_type),
+                        self._embed_batch(texts[middle:], task_type),
+                    )
+                    return halves[0] + halves[1]
+                if not e.retryable or attempt >= self.max_retries:
+                    raise
+
+                # Full jitter keeps concurrent retries from hitting the API in lockstep
+                delay = e.retry_after
+                if delay is None:
+                    delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                attempt += 1
+                self.retries += 1
+                await asyncio.sleep(delay)
+
+def run_sync(coro):
+    """
+    Runs a coroutine to completion from synchronous code, even if the calling
+    thread already runs an event loop.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    result = {}
+
+    def runner():
+        try:
+            result["value"] = asyncio.run(coro)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=runner)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
@@ -0,0 +1,212 @@
+import os
+import subprocess
+import threading
+import time
+from agent import indexer
+from agent.manifest import IndexManifest
+from agent.walker import is_ignored_dir, looks_binary
+import config
+
+"""
+Git-backed indexing.
+index_commit() indexes the tree of a commit by reading blobs from the object
+database, so any commit can be indexed without checking it out. The manifest
+stores each file's blob id and the indexed commit; the next run asks
+`git diff --name-status` for the paths changed since that commit and only
+re-chunks those, so moving between commits or branches costs only the delta.
+Unchanged blobs are never read, and a blob whose chunks were embedded before
+(e.g. when switching back to a branch) is served by the embedding cache.
+"""
+
+class GitError(Exception):
+    pass
+
+def git(repo, *args, input=None):
+    """
+    Runs a git command in repo and returns its stdout as bytes.
+    """
+    result = subprocess.run(
+        ["git", "-C", repo, *args],
+        input=input,
+        capture_output=True
+    )
+    if result.returncode != 0:
+        raise GitError(f"git {' '.join(args)} failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return result.stdout
+
+def resolve_commit(repo, rev):
+    return git(repo, "rev-parse", "--verify", f"{rev}^{{commit}}").decode("ascii").strip()
+
+def commit_exists(repo, commit):
+    try:
+        git(repo, "cat-file", "-e", f"{commit}^{{commit}}")
+        return True
+    except GitError:
+        return False
+
+def is_source_path(path):
+    """
+    Applies the extension and directory-name rules of the working-tree walker to a
+    path in a tree. Ignore files are not consulted: tracked files are indexed, as
+    git itself does not ignore them.
+    """
+    parts = path.split("/")
+    return path.endswith(indexer.SOURCE_EXTENSIONS) and not any(is_ignored_dir(p) for p in parts[:-1])
+
+def list_tree(repo, commit):
+    """
+    Returns {path: blob id} for the source files in a commit's tree.
+    """
+    tree = {}
+    for entry in git(repo, "ls-tree", "-r", "-z", commit).split(b"\0"):
+        if not entry:
+            continue
+        info, path = entry.split(b"\t", 1)
+        _, kind, blob = info.split()
+        path = path.decode("utf-8", "surrogateescape")
+        if kind == b"blob" and is_source_path(path):
+            tree[path] = blob.decode("ascii")
+    return tree
+
+def diff_name_status(repo, old, new):
+    """
+    Returns (changed, deleted): paths added or modified between two commits, and
+    paths that no longer exist. A rename counts as a deletion plus an addition.
+    """
+    fields = git(repo, "diff", "--name-status", "-z", "-M", old, new).split(b"\0")
+    changed = set()
+    deleted = set()
+    i = 0
+    while i < len(fields) and fields[i]:
+        status = fields[i].decode("ascii")
+        if status[0] in "RC":
+            source, target = (f.decode("utf-8", "surrogateescape") for f in fields[i + 1:i + 3])
+            if status[0] == "R":
+                deleted.add(source)
+            changed.add(target)
+            i += 3
+            continue
+        path = fields[i + 1].decode("utf-8", "surrogateescape")
+        (deleted if status[0] == "D" else changed).add(path)
+        i += 2
+    return {p for p in changed if is_source_path(p)}, {p for p in deleted if is_source_path(p)}
+
+def read_blobs(repo, blob_ids):
+    """
+    Yields (blob id, content bytes) for each id, in order, from one
+    `git cat-file --batch` process. Content is None for a missing object.
+    """
+    process = subprocess.Popen(
+        ["git", "-C", repo, "cat-file", "--batch"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL
+    )
+
+    def feed():
+        # Written from a thread so a full stdout pipe can never block the requests
+        try:
+            for blob_id in blob_ids:
+                process.stdin.write(f"{blob_id}\n".encode("ascii"))
+        except OSError:
+            pass
+        finally:
+            process.stdin.close()
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+    try:
+        for blob_id in blob_ids:
+            header = process.stdout.readline().split()
+            if len(header) < 3:
+                yield blob_id, None
+                continue
+            content = process.stdout.read(int(header[2]))
+            process.stdout.read(1)
+            yield blob_id, content
+    finally:
+        process.stdout.close()
+        process.wait()
+        feeder.join()
+
+def parse_blob(file_path, content, root):
+    """
+    Returns (chunks, symbols) for a blob's content, like parse_file does for a file.
+    """
+    if len(content) > config.MAX_FILE_SIZE:
+        print(f"Warning: Skipping file {file_path} because it exceeds the maximum size of {config.MAX_FILE_SIZE} bytes.")
+        return [], {}
+    if looks_binary(content):
+        return [], {}
+    try:
+        text = content.decode("utf-8")
+    except UnicodeDecodeError as e:
+        print(f"Error reading file {file_path}: {e}")
+        return [], {}
+    symbols = {}
+    return indexer.chunks_from_source(file_path, text, symbols, root=root), symbols
+
+def index_commit(repo, rev="HEAD", namespace=None, manifest=None):
+    """
+    Indexes the tree of `rev` (any commit-ish) without touching the working tree.
+    If the namespace was last indexed from a commit that still exists, only the
+    paths from `git diff --name-status <indexed> <rev>` are processed; otherwise
+    every path whose blob id differs from the manifest is.
+    Returns the index_codebase stats plus "commit".
+    """
+    repo = os.path.abspath(repo)
+    commit = resolve_commit(repo, rev)
+    indexer.ensure_namespace(namespace, repo)
+    root = indexer.namespace_root(namespace, repo)
+    if manifest is None:
+        manifest = IndexManifest(indexer.manifest_path(namespace))
+
+    tree = list_tree(repo, commit)
+    if manifest.commit and commit_exists(repo, manifest.commit):
+        changed, deleted = diff_name_status(repo, manifest.commit, commit)
+        print(f"Indexing {commit[:12]}: {len(changed)} changed, {len(deleted)} deleted since {manifest.commit[:12]}.")
+    else:
+        changed = set(tree)
+        deleted = {os.path.relpath(p, repo).replace(os.sep, "/") for p in manifest.paths_under(repo)} - set(tree)
+        print(f"Indexing {commit[:12]}: comparing {len(tree)} files by blob id.")
+
+    # Paths whose blob is already indexed (same content on both sides) need no work
+    pending = []
+    for path in sorted(changed):
+        entry = manifest.get(os.path.join(repo, path))
+        if path in tree and not (entry and entry["hash"] == tree[path]):
+            pending.append(path)
+
+    writer = indexer.IndexWriter(namespace)
+    writer.stats["skipped"] = len(tree) - len(pending)
+    try:
+        try:
+            for path, (blob_id, content) in zip(pending, read_blobs(repo, [tree[p] for p in pending])):
+                file_path = os.path.join(repo, path)
+                started = time.perf_counter()
+                if content is None:
+                    print(f"Error reading file {file_path}: blob {blob_id} is missing")
+                    continue
+                chunks, symbols = parse_blob(file_path, content, root)
+                result = indexer.apply_parse_result(file_path, None, manifest, blob_id, chunks, symbols)
+                writer.collect(file_path, *result, busy=time.perf_counter() - started)
+        finally:
+            writer.close()
+
+        for path in sorted(deleted):
+            entry = manifest.remove(os.path.join(repo, path))
+            if entry is not None:
+                writer.remove(os.path.join(repo, path), entry["chunk_ids"])
+
+        stats = writer.finish()
+    except BaseException:
+        writer.discard()
+        raise
+
+    manifest.commit = commit
+    manifest.save()
+    stats["commit"] = commit
+    print(f"Indexed {repo}@{commit[:12]}: {stats['updated']} updated, {stats['skipped']} unchanged, {stats['removed']} removed.")
+    print(indexer.format_report(stats["stages"]))
+    return stats
+
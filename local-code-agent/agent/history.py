@@ -0,0 +1,217 @@
+from google.ai.generativelanguage import Content, Part, FunctionResponse
+from agent.context import truncate_to_tokens
+from agent.utils import estimate_tokens
+
+"""
+History policy for the agent loop.
+Every iteration of execute_agent_loop resends the whole history, including full
+tool results. HistoryPolicy builds the view of the history that is actually sent:
+older reads of a file that was read again later are replaced by a stub, and if the
+history is still over its token budget, old tool results are shrunk to short
+excerpts, oldest first. The most recent entries are only cut down to the
+per-result cap, which applies to every entry. The budget is what is left after
+the prompt that is sent with every request (system prompt, task message).
+The stored history itself is left unchanged.
+"""
+
+def _parts(entry):
+    if isinstance(entry, dict):
+        return entry.get("parts") or []
+    return getattr(entry, "parts", None) or []
+
+def _role(entry):
+    if isinstance(entry, dict):
+        return entry.get("role")
+    return getattr(entry, "role", None)
+
+def _function_responses(entry):
+    if _role(entry) != "function":
+        return []
+    return [p for p in _parts(entry) if getattr(p, "function_response", None)]
+
+def _result_text(part):
+    response = part.function_response.response
+    try:
+        return str(response["result"])
+    except (KeyError, TypeError):
+        return str(response)
+
+def entry_tokens(entry):
+    """
+    Estimated tokens of one history entry (a dict message or a Content object).
+    """
+    if isinstance(entry, str):
+        return estimate_tokens(entry)
+    total = 0
+    for part in _parts(entry):
+        if isinstance(part, str):
+            total += estimate_tokens(part)
+        elif getattr(part, "function_response", None):
+            total += estimate_tokens(_result_text(part))
+        elif getattr(part, "function_call", None):
+            call = part.function_call
+            total += estimate_tokens(f"{getattr(call, 'name', '')}{_call_args(call)}")
+        elif getattr(part, "text", None):
+            total += estimate_tokens(part.text)
+    return total
+
+def _call_args(call):
+    try:
+        return dict(call.args)
+    except (TypeError, ValueError):
+        return {}
+
+def _read_paths(history, index):
+    """
+    Returns the read_file path for each function response in history[index], taken
+    from the function calls of the model turn just before it (None where unknown).
+    """
+    responses = _function_responses(history[index])
+    paths = [None] * len(responses)
+    if index == 0:
+        return paths
+    calls = [p.function_call for p in _parts(history[index - 1]) if getattr(p, "function_call", None)]
+    if len(calls) != len(responses):
+        return paths
+    for k, (call, part) in enumerate(zip(calls, responses)):
+        if part.function_response.name == "read_file" and getattr(call, "name", None) == "read_file":
+            paths[k] = _call_args(call).get("path")
+    return paths
+
+def _replace_results(entry, replacements):
+    """
+    Returns a copy of a function Content with the results at the given part
+    indices (among its function responses) replaced.
+    """
+    parts = []
+    k = 0
+    for part in _parts(entry):
+        if getattr(part, "function_response", None):
+            if k in replacements:
+                part = Part(function_response=FunctionResponse(
+                    name=part.function_response.name,
+                    response={"result": replacements[k]}
+                ))
+            k += 1
+        parts.append(part)
+    return Content(role="function", parts=parts)
+
+def _cap_message(entry, max_tokens):
+    """
+    Returns a copy of a dict message with text parts over max_tokens truncated,
+    or None if none is.
+    """
+    parts = _parts(entry)
+    if not any(isinstance(p, str) and estimate_tokens(p) > max_tokens for p in parts):
+        return None
+    capped = [truncate_to_tokens(p, max_tokens) if isinstance(p, str) else p for p in parts]
+    return dict(entry, parts=capped)
+
+class HistoryPolicy:
+    def __init__(self, max_tokens, keep_recent=4, stub_tokens=64, max_result_tokens=None):
+        """
+        Args:
+            max_tokens: Token budget for the request sent to the model, of which the
+                history gets what the fixed prompt passed to apply() leaves.
+            keep_recent: Number of most recent history entries that are only capped,
+                never shrunk to stubs.
+            stub_tokens: Size that old tool results are shrunk to when over budget.
+            max_result_tokens: Cap on any single tool result or message, pinned
+                entries included (None for no cap).
+        """
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.stub_tokens = stub_tokens
+        self.max_result_tokens = max_result_tokens
+        # One entry per apply() call:
+        # {"original_tokens", "tokens", "saved", "deduplicated", "capped", "shrunk"}
+        self.turns = []
+
+    def apply(self, history, fixed_tokens=0):
+        """
+        Returns the history to send to the model. The same list is returned if
+        nothing had to change, otherwise a compacted copy.
+        fixed_tokens is the size of what is sent along with the history on every
+        request (system prompt, cached prefix, task message).
+        """
+        budget = self.max_tokens - fixed_tokens
+        original = sum(entry_tokens(entry) for entry in history)
+        pinned_from = max(0, len(history) - self.keep_recent)
+        replacements = {}
+        messages = {}
+
+        # Only the latest read of each file is kept; earlier copies are stale or redundant
+        read_paths = [_read_paths(history, i) for i in range(len(history))]
+        latest_read = {}
+        for i, paths in enumerate(read_paths):
+            for k, path in enumerate(paths):
+                if path is not None:
+                    latest_read[path] = (i, k)
+        deduplicated = 0
+        tokens = original
+        for i in range(pinned_from):
+            responses = _function_responses(history[i])
+            for k, path in enumerate(read_paths[i]):
+                if path is not None and latest_read[path] != (i, k):
+                    stub = f"[Superseded: {path} was read again later in the conversation]"
+                    replacements.setdefault(i, {})[k] = stub
+                    tokens -= estimate_tokens(_result_text(responses[k])) - estimate_tokens(stub)
+                    deduplicated += 1
+        superseded = {(i, k) for i, parts in replacements.items() for k in parts}
+
+        # A single huge result (e.g. the latest read of a large file) is cut even when pinned
+        capped = 0
+        if self.max_result_tokens is not None:
+            for i, entry in enumerate(history):
+                if isinstance(entry, dict):
+                    message = _cap_message(entry, self.max_result_tokens)
+                    if message is not None:
+                        messages[i] = message
+                        tokens -= entry_tokens(entry) - entry_tokens(message)
+                        capped += 1
+                    continue
+                for k, part in enumerate(_function_responses(entry)):
+                    text = _result_text(part)
+                    if (i, k) in superseded or estimate_tokens(text) <= self.max_result_tokens:
+                        continue
+                    stub = truncate_to_tokens(text, self.max_result_tokens)
+                    replacements.setdefault(i, {})[k] = stub
+                    tokens -= estimate_tokens(text) - estimate_tokens(stub)
+                    capped += 1
+
+        # Over budget: shrink the oldest tool results first
+        shrunk = 0
+        for i in range(pinned_from):
+            if tokens <= budget:
+                break
+            for k, part in enumerate(_function_responses(history[i])):
+                if (i, k) in superseded:
+                    continue
+                text = replacements.get(i, {}).get(k, _result_text(part))
+                if estimate_tokens(text) <= self.stub_tokens:
+                    continue
+                stub = truncate_to_tokens(text, self.stub_tokens)
+                replacements.setdefault(i, {})[k] = stub
+                tokens -= estimate_tokens(text) - estimate_tokens(stub)
+                shrunk += 1
+
+        self.turns.append({
+            "original_tokens": original,
+            "tokens": tokens,
+            "saved": original - tokens,
+            "deduplicated": deduplicated,
+            "capped": capped,
+            "shrunk": shrunk,
+        })
+        if not replacements and not messages:
+            return history
+        return [
+            messages[i] if i in messages
+            else _replace_results(entry, replacements[i]) if i in replacements
+            else entry
+            for i, entry in enumerate(history)
+        ]
+
+    @property
+    def tokens_saved(self):
+        return sum(turn["saved"] for turn in self.turns)
@@ -1,18 +1,202 @@
+import json
 import os
+import re
 import sys
-import chromadb
-from agent.embedding import get_embedding_model
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
+from agent.manifest import IndexManifest, hash_file
+from agent.pipeline import Pipeline, Batcher, StageStats, format_report
+from agent.lexical import LexicalIndex, is_symbol_query, reciprocal_rank_fusion
+from agent.symbols import SymbolIndex, extract_symbols
+from agent.walker import Walker, is_binary, is_ignore_file, ignore_file_scope
+from agent.embedding_cache import LRUCache
+from agent import utils
 from tree_sitter_languages import get_language, get_parser
 import config
 
-# Initialize ChromaDB client and collection
-chroma_client = chromadb.PersistentClient(path=config.CHROMA_PERSIST_DIR)
-# Initialize embedding model
-# Load model once
-print("Loading embedding model...")
-embedding_model = get_embedding_model(config.EMBEDDING_MODEL)
+# The vector store and the embedding model are expensive to create, so they are
+# built on first use rather than at import time. Importing this module (and so
+# agent.tools) stays cheap, and code paths that never search never load a model.
+_collection = None
+_embedding_model = None
+_lexical_index = None
+_symbol_index = None
+_init_lock = threading.Lock()
+_query_embeddings = LRUCache(config.QUERY_EMBEDDING_CACHE_SIZE)
 
-collection = chroma_client.get_or_create_collection(name="code_chunks")
+# Index namespaces: one per project root. The default namespace (config.PROJECT_ROOT)
+# uses the globals above; the others keep their resources in _namespace_resources.
+DEFAULT_NAMESPACE = "default"
+NAMESPACE_RE = re.compile(r"^[A-Za-z0-9](?:[A-Za-z0-9_-]{0,40}[A-Za-z0-9])?$")
+_namespace_resources = {}
+
+def is_default_namespace(namespace):
+    return namespace is None or namespace == DEFAULT_NAMESPACE
+
+def namespace_path(namespace, filename):
+    return os.path.join(config.CHROMA_PERSIST_DIR, "namespaces", namespace, filename)
+
+def _namespace_resource(namespace, kind, create):
+    if not NAMESPACE_RE.match(namespace):
+        raise ValueError(f"Invalid namespace name: {namespace!r}")
+    with _init_lock:
+        resources = _namespace_resources.setdefault(namespace, {})
+        if kind not in resources:
+            resources[kind] = create()
+        return resources[kind]
+
+def _registry_path():
+    return os.path.join(config.CHROMA_PERSIST_DIR, "namespaces.json")
+
+def get_namespaces():
+    """
+    Returns {namespace: project root} for the default namespace, the namespaces
+    indexed before (recorded in namespaces.json) and config.INDEX_NAMESPACES.
+    """
+    namespaces = {DEFAULT_NAMESPACE: os.path.abspath(config.PROJECT_ROOT)}
+    try:
+        with open(_registry_path(), "r", encoding="utf-8") as f:
+            namespaces.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read namespace registry: {e}")
+    namespaces.update({name: os.path.abspath(root) for name, root in config.INDEX_NAMESPACES.items()})
+    return namespaces
+
+def register_namespace(namespace, root):
+    if not NAMESPACE_RE.match(namespace):
+        raise ValueError(f"Invalid namespace name: {namespace!r}")
+    with _init_lock:
+        try:
+            with open(_registry_path(), "r", encoding="utf-8") as f:
+                registry = json.load(f)
+        except (OSError, ValueError):
+            registry = {}
+        if registry.get(namespace) == os.path.abspath(root):
+            return
+        registry[namespace] = os.path.abspath(root)
+        os.makedirs(config.CHROMA_PERSIST_DIR, exist_ok=True)
+        tmp_path = f"{_registry_path()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(registry, f, indent=2)
+        os.replace(tmp_path, _registry_path())
+
+def namespace_root(namespace, directory):
+    """
+    Returns the root that chunk ids of files under directory are relative to: the
+    namespace's project root (config.PROJECT_ROOT for the default namespace) when
+    directory lies inside it, otherwise None so the ids stay absolute. Either way
+    two directories indexed into one namespace can never produce the same id.
+    """
+    root = get_namespaces().get(DEFAULT_NAMESPACE if is_default_namespace(namespace) else namespace)
+    if root is None:
+        return None
+    root = os.path.abspath(root)
+    directory = os.path.abspath(directory)
+    if os.path.commonpath([root, directory]) != root:
+        return None
+    return root
+
+def ensure_namespace(namespace, directory):
+    """
+    Registers directory as the root of a namespace that is not known yet.
+    """
+    if not is_default_namespace(namespace) and namespace not in get_namespaces():
+        register_namespace(namespace, directory)
+
+def resolve_namespaces(repo=None):
+    """
+    Returns the namespaces a search targets: the default one for None, every known
+    namespace for "*", otherwise the given name(s) (a list or a comma separated string).
+    """
+    if not repo:
+        return [DEFAULT_NAMESPACE]
+    known = get_namespaces()
+    if repo == "*":
+        return list(known)
+    names = [n.strip() for n in repo.split(",") if n.strip()] if isinstance(repo, str) else list(repo)
+    unknown = [n for n in names if n not in known]
+    if unknown:
+        raise ValueError(f"Unknown repository: {', '.join(unknown)} (known: {', '.join(sorted(known))})")
+    return names
+
+def get_collection(namespace=None):
+    """
+    Returns the vector store selected by config.VECTOR_STORE (see agent.vector_store).
+    All namespaces share one client; each has its own collection.
+    """
+    global _collection
+    if not is_default_namespace(namespace):
+        from agent.vector_store import open_vector_store
+        return _namespace_resource(
+            namespace, "collection",
+            lambda: open_vector_store(config.VECTOR_STORE, config.CHROMA_PERSIST_DIR, name=f"code_chunks_{namespace}")
+        )
+    if _collection is None:
+        with _init_lock:
+            if _collection is None:
+                from agent.vector_store import open_vector_store
+                _collection = open_vector_store(config.VECTOR_STORE, config.CHROMA_PERSIST_DIR)
+    return _collection
+
+def get_embedder():
+    global _embedding_model
+    if _embedding_model is None:
+        with _init_lock:
+            if _embedding_model is None:
+                from agent.embedding import get_embedding_model
+                print("Loading embedding model...")
+                _embedding_model = get_embedding_model(
+                    config.EMBEDDING_MODEL,
+                    cache_path=config.EMBEDDING_CACHE_PATH,
+                    cache_max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES
+                )
+    return _embedding_model
+
+def get_lexical_index(namespace=None):
+    global _lexical_index
+    if not is_default_namespace(namespace):
+        return _namespace_resource(
+            namespace, "lexical", lambda: LexicalIndex(namespace_path(namespace, "lexical_index.sqlite3"))
+        )
+    if _lexical_index is None:
+        with _init_lock:
+            if _lexical_index is None:
+                _lexical_index = LexicalIndex(config.LEXICAL_INDEX_PATH)
+    return _lexical_index
+
+def get_symbol_index(namespace=None):
+    global _symbol_index
+    if not is_default_namespace(namespace):
+        return _namespace_resource(
+            namespace, "symbols", lambda: SymbolIndex(namespace_path(namespace, "symbols.sqlite3"))
+        )
+    if _symbol_index is None:
+        with _init_lock:
+            if _symbol_index is None:
+                _symbol_index = SymbolIndex(config.SYMBOL_INDEX_PATH)
+    return _symbol_index
+
+def warm_up(background=False):
+    """
+    Creates the Chroma collection and loads the embedding model ahead of time.
+    With background=True this happens in a daemon thread and returns immediately.
+    """
+    def load():
+        try:
+            get_collection()
+            get_lexical_index()
+            get_embedder()
+        except Exception as e:
+            print(f"Warning: Index warm-up failed: {e}")
+
+    if background:
+        thread = threading.Thread(target=load, name="indexer-warm-up", daemon=True)
+        thread.start()
+        return thread
+    load()
 
 def get_parser_for_file(ext):
     ext_map = {
@@ -36,25 +220,57 @@ def get_parser_for_file(ext):
         # print(f"No parser found for extension {ext} ({lang_name}): {e}")
         return None, None
 
-def extract_chunks(file_path):
+def chunk_id(file_path, start_line, root=None):
+    """
+    Chunk ids are the file path relative to the namespace root (see namespace_root)
+    plus the start line, so they do not depend on where the repository is checked out.
+    """
+    if root:
+        file_path = os.path.relpath(file_path, root).replace(os.sep, "/")
+    return f"{file_path}:{start_line}"
+
+def extract_chunks(file_path, symbols=None, root=None):
+    """
+    Splits a file into function/class chunks using its tree-sitter parse.
+    If a dict is passed as symbols, it is filled with the file's definitions,
+    references, imports and calls from the same parse (see agent.symbols).
+    Chunk ids are relative to root when it is given (see chunk_id).
+    Read and decode errors (READ_ERRORS) propagate, so the caller keeps the
+    file's previous chunks and manifest entry instead of recording it as empty.
+    """
     ext = os.path.splitext(file_path)[1]
     parser, language = get_parser_for_file(ext)
     if not parser:
         return []
 
-    try:
-        if os.path.getsize(file_path) > config.MAX_FILE_SIZE:
-            print(f"Warning: Skipping file {file_path} because it exceeds the maximum size of {config.MAX_FILE_SIZE} bytes.")
-            return []
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
-    except Exception as e:
-        print(f"Error reading file {file_path}: {e}")
+    if os.path.getsize(file_path) > config.MAX_FILE_SIZE:
+        print(f"Warning: Skipping file {file_path} because it exceeds the maximum size of {config.MAX_FILE_SIZE} bytes.")
+        return []
+    with open(file_path, "r", encoding="utf-8") as f:
+        content = f.read()
+
+    return chunks_from_source(file_path, content, symbols, root)
+
+def chunks_from_source(file_path, content, symbols=None, root=None):
+    """
+    extract_chunks for content that does not come from the working tree (e.g. a
+    git blob); file_path is only used for the language, the ids and the metadata.
+    """
+    ext = os.path.splitext(file_path)[1]
+    parser, language = get_parser_for_file(ext)
+    if not parser:
         return []
 
-    tree = parser.parse(bytes(content, "utf8"))
+    source = bytes(content, "utf8")
+    tree = parser.parse(source)
     root_node = tree.root_node
 
+    if symbols is not None:
+        try:
+            symbols.update(extract_symbols(root_node, source))
+        except Exception as e:
+            print(f"Error extracting symbols from {file_path}: {e}")
+
     chunks = []
 
     # Query for Python
@@ -83,7 +299,7 @@ def extract_chunks(file_path):
     else:
         # Fallback for other supported languages or unexpected ones
         chunks.append({
-            "id": f"{file_path}:0",
+            "id": chunk_id(file_path, 0, root),
             "text": content,
             "metadata": {
                 "file_path": file_path,
@@ -115,7 +331,7 @@ def extract_chunks(file_path):
             text = content[node.start_byte:node.end_byte]
 
             chunks.append({
-                "id": f"{file_path}:{start_line}",
+                "id": chunk_id(file_path, start_line, root),
                 "text": text,
                 "metadata": {
                     "file_path": file_path,
@@ -131,7 +347,7 @@ def extract_chunks(file_path):
     # If no chunks found (e.g. script without functions), add whole file
     if not chunks:
          chunks.append({
-            "id": f"{file_path}:0",
+            "id": chunk_id(file_path, 0, root),
             "text": content,
             "metadata": {
                 "file_path": file_path,
@@ -143,61 +359,483 @@ def extract_chunks(file_path):
 
     return chunks
 
-def index_codebase(directory):
-    for root, dirs, files in os.walk(directory):
-        # Ignore hidden directories and venv
-        dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ['venv', '__pycache__', 'chroma_db', 'site-packages']]
-
-        dir_chunks = []
-        for file in files:
-            if file.endswith(('.py', '.js', '.ts', '.java', '.cpp', '.h', '.c')):
-                file_path = os.path.join(root, file)
-                chunks = extract_chunks(file_path)
-                dir_chunks.extend(chunks)
-
-        if dir_chunks:
-            # Batch encoding and upserting for the whole directory
-            # Using a batch size of 100 to stay within common API limits
-            batch_size = 100
-            for i in range(0, len(dir_chunks), batch_size):
-                batch = dir_chunks[i:i + batch_size]
-                ids = [c["id"] for c in batch]
-                documents = [c["text"] for c in batch]
-                metadatas = [c["metadata"] for c in batch]
-                embeddings = embedding_model.encode(documents, task_type="retrieval_document").tolist()
-
-                collection.upsert(
-                    ids=ids,
-                    documents=documents,
-                    metadatas=metadatas,
-                    embeddings=embeddings
-                )
+SOURCE_EXTENSIONS = ('.py', '.js', '.ts', '.java', '.cpp', '.h', '.c')
+DELETE_BATCH_SIZE = 100
+# Errors of a file that cannot be read right now (removed, unreadable, not UTF-8).
+# The file is left as last indexed and retried on the next run.
+READ_ERRORS = (OSError, UnicodeDecodeError)
+
+def iter_source_files(directory, root=None):
+    """
+    Yields the non-binary source files under directory that are not ignored
+    (see agent.walker); ignore files are read from root (default: directory) down.
+    """
+    return Walker(root or directory).files(directory, extensions=SOURCE_EXTENSIONS)
+
+def is_ignored(path, directory):
+    """
+    Returns True if a path is outside directory or would be skipped by iter_source_files.
+    """
+    return Walker(directory).is_ignored(path)
+
+def expand_changed_paths(directory, paths, manifest):
+    """
+    Turns paths reported as changed (files or directories, existing or not) into
+    (source files to refresh, indexed files that may have disappeared).
+    """
+    files = set()
+    candidates = set()
+    for path in paths:
+        path = os.path.abspath(path)
+        if is_ignore_file(path):
+            # New ignore rules can hide or reveal anything below the ignore file
+            path = ignore_file_scope(path)
+        if is_ignored(path, directory):
+            continue
+        if os.path.isdir(path):
+            files.update(iter_source_files(path, root=directory))
+        elif os.path.isfile(path) and path.endswith(SOURCE_EXTENSIONS) and not is_binary(path):
+            files.add(path)
+        if manifest.get(path) is not None:
+            candidates.add(path)
+        candidates.update(manifest.paths_under(path))
+    return sorted(files), candidates
+
+def parse_file(file_path, known_hash=None, root=None):
+    """
+    Hashes a file and extracts its chunks and symbols, unless its content hash equals known_hash.
+    Chunk ids are relative to root (see chunk_id).
+    Returns (content_hash, chunks, symbols); chunks and symbols are None when the
+    content is unchanged.
+    This is the CPU-bound part of indexing and runs inside the worker processes.
+    """
+    content_hash = hash_file(file_path)
+    if content_hash == known_hash:
+        return content_hash, None, None
+    symbols = {}
+    return content_hash, extract_chunks(file_path, symbols, root=root), symbols
+
+def apply_parse_result(file_path, stat_result, manifest, content_hash, chunks, symbols=None):
+    """
+    Records a parse result in the manifest.
+    Returns (status, chunks, stale_ids, symbols) where status is "skipped" or "updated",
+    chunks are the new chunks to upsert, stale_ids the chunk ids to delete and
+    symbols the file's new symbol data (None if skipped).
+    """
+    entry = manifest.get(file_path)
+    if chunks is None:
+        # Touched but not modified: remember the new mtime so the next run skips the hash too.
+        manifest.update(file_path, stat_result, content_hash, entry["chunk_ids"])
+        return "skipped", [], [], None
+
+    new_ids = [c["id"] for c in chunks]
+    kept = set(new_ids)
+    stale_ids = [cid for cid in (entry["chunk_ids"] if entry else []) if cid not in kept]
+    manifest.update(file_path, stat_result, content_hash, new_ids)
+    return "updated", chunks, stale_ids, symbols or {}
+
+def refresh_file(file_path, manifest, force=False, root=None):
+    """
+    Decides whether a file needs re-indexing and extracts its chunks if so.
+    Returns the same (status, chunks, stale_ids, symbols) tuple as apply_parse_result.
+    """
+    stat_result = os.stat(file_path)
+    entry = manifest.get(file_path)
+    if entry and not force and manifest.is_unchanged(file_path, stat_result):
+        return "skipped", [], [], None
+
+    known_hash = entry["hash"] if entry and not force else None
+    content_hash, chunks, symbols = parse_file(file_path, known_hash, root=root)
+    return apply_parse_result(file_path, stat_result, manifest, content_hash, chunks, symbols)
+
+def embed_batch(batch):
+    documents = [c["text"] for c in batch]
+    embeddings = get_embedder().encode(documents, task_type="retrieval_document").tolist()
+    return batch, embeddings
+
+def upsert_batch(item, namespace=None):
+    batch, embeddings = item
+    get_collection(namespace).upsert(
+        ids=[c["id"] for c in batch],
+        documents=[c["text"] for c in batch],
+        metadatas=[c["metadata"] for c in batch],
+        embeddings=embeddings
+    )
+
+def manifest_path(namespace=None):
+    if is_default_namespace(namespace):
+        return config.INDEX_MANIFEST_PATH
+    return namespace_path(namespace, "index_manifest.json")
+
+class IndexWriter:
+    """
+    Applies parse results to a namespace's collection, lexical index and symbol
+    index. Chunks stream through the embed and upsert stages of a Pipeline while
+    the caller keeps parsing; deletions are batched. Used by index_codebase for
+    the working tree and by agent.git_index for git objects.
+    """
+    def __init__(self, namespace=None, workers=1):
+        from agent.embedding import embedding_backend
+
+        self.namespace = namespace
+        self.collection = get_collection(namespace)
+        self.lexical = get_lexical_index(namespace)
+        self.symbol_index = get_symbol_index(namespace)
+        self.stats = {"skipped": 0, "updated": 0, "removed": 0}
+        self.stale_ids = []
+
+        # Batches are built across files and directories, bounded by the backend's
+        # per-request limits, so repos of many tiny directories still send full requests
+        limits = config.EMBED_BATCH_LIMITS[embedding_backend(config.EMBEDDING_MODEL)]
+        self.batcher = Batcher(
+            max_items=limits["max_items"],
+            max_size=limits["max_tokens"],
+            size=lambda chunk: utils.estimate_tokens(chunk["text"]),
+            max_wait=config.EMBED_BATCH_MAX_WAIT
+        )
+
+        self.parse_stats = StageStats("parse", workers)
+        self.pipeline = Pipeline(queue_size=config.INDEX_QUEUE_SIZE)
+        self.pipeline.add_stage("embed", embed_batch, workers=config.EMBED_WORKERS)
+        self.pipeline.add_stage("upsert", lambda item: upsert_batch(item, namespace), workers=config.UPSERT_WORKERS, units=lambda item: len(item[0]))
+        self.pipeline.start()
 
-def search_code(query, n_results=5):
-    query_embedding = embedding_model.encode(query, task_type="retrieval_query").tolist()
-    results = collection.query(
-        query_embeddings=[query_embedding],
+    def flush_due(self):
+        if self.batcher.due():
+            return self.pipeline.put(self.batcher.flush())
+        return 0.0
+
+    def collect(self, file_path, status, chunks, stale, symbols, busy=0.0):
+        self.stats[status] += 1
+        if symbols is not None:
+            self.symbol_index.replace_file(file_path, symbols, commit=False)
+        self.stale_ids.extend(stale)
+        # The lexical index is cheap to update in place, unlike the embeddings
+        for chunk_id in stale:
+            self.lexical.remove(chunk_id)
+        for chunk in chunks:
+            self.lexical.add(chunk["id"], chunk["text"])
+        if len(self.stale_ids) >= DELETE_BATCH_SIZE:
+            self.collection.delete(ids=self.stale_ids)
+            self.stale_ids = []
+
+        blocked = 0.0
+        for chunk in chunks:
+            for batch in self.batcher.add(chunk):
+                blocked += self.pipeline.put(batch)
+        blocked += self.flush_due()
+        self.parse_stats.record(len(chunks), busy, blocked)
+
+    def remove(self, file_path, chunk_ids):
+        """
+        Drops everything indexed for a file that no longer exists.
+        """
+        self.stale_ids.extend(chunk_ids)
+        self.stats["removed"] += 1
+        for chunk_id in chunk_ids:
+            self.lexical.remove(chunk_id)
+        self.symbol_index.remove_file(file_path, commit=False)
+
+    def close(self):
+        """
+        Sends the last partial batch and waits for the pipeline to drain.
+        """
+        try:
+            if len(self.batcher):
+                self.pipeline.put(self.batcher.flush())
+        finally:
+            self.pipeline.close()
+
+    def discard(self):
+        """
+        Called when a run fails: drops the unsaved lexical and symbol changes so
+        both match the saved manifest again, and the next run redoes the work.
+        """
+        self.lexical.rollback()
+        self.symbol_index.rollback()
+
+    def finish(self):
+        """
+        Applies pending deletions and persists the indexes. Returns the stats.
+        """
+        if self.stale_ids:
+            self.collection.delete(ids=self.stale_ids)
+            self.stale_ids = []
+        self.collection.flush()
+        self.lexical.save()
+        self.symbol_index.commit()
+        self.stats["stages"] = [self.parse_stats] + self.pipeline.stats
+        return self.stats
+
+def index_codebase(directory, manifest=None, force=False, workers=None, namespace=None, paths=None):
+    """
+    Incrementally indexes a directory into a namespace (the default one if None).
+    Only new or changed files are re-chunked and re-embedded; chunks of files that
+    disappeared since the last run are removed from the collection.
+    With paths (files or directories reported as changed, e.g. by agent.watcher),
+    only those are refreshed or removed instead of walking the whole directory.
+    Chunk ids are relative to the namespace root, or absolute for a directory
+    outside it (see namespace_root).
+
+    Parsing, embedding and upserting run as overlapping pipeline stages connected
+    by bounded queues: files are parsed in the main process (or a process pool of
+    `workers` when > 1) while earlier batches are being embedded and upserted by
+    config.EMBED_WORKERS and config.UPSERT_WORKERS threads.
+    Returns a dict with the number of files skipped, updated and removed, plus
+    the per-stage throughput stats under "stages".
+    """
+    directory = os.path.abspath(directory)
+    ensure_namespace(namespace, directory)
+    root = namespace_root(namespace, directory)
+    if manifest is None:
+        manifest = IndexManifest(manifest_path(namespace))
+    if workers is None:
+        workers = config.INDEX_WORKERS
+
+    seen = set()
+    if paths is None:
+        files = iter_source_files(directory)
+        removal_candidates = manifest.paths_under(directory)
+    else:
+        files, removal_candidates = expand_changed_paths(directory, paths, manifest)
+
+    writer = IndexWriter(namespace, workers)
+    try:
+        try:
+            if workers > 1:
+                _index_files_parallel(root, files, manifest, force, workers, seen, writer.collect, writer.flush_due)
+            else:
+                for file_path in files:
+                    seen.add(file_path)
+                    started = time.perf_counter()
+                    try:
+                        result = refresh_file(file_path, manifest, force=force, root=root)
+                    except READ_ERRORS as e:
+                        print(f"Error reading file {file_path}: {e}")
+                        continue
+                    writer.collect(file_path, *result, busy=time.perf_counter() - started)
+        finally:
+            writer.close()
+
+        # Drop chunks of files that were deleted or renamed since the last run
+        for file_path in removal_candidates:
+            if file_path not in seen:
+                entry = manifest.remove(file_path)
+                writer.remove(file_path, entry["chunk_ids"])
+
+        stats = writer.finish()
+    except BaseException:
+        # The manifest is not saved, so the next run retries every file of this one
+        writer.discard()
+        raise
+    # The index now reflects the working tree rather than an indexed commit
+    manifest.commit = None
+    manifest.save()
+    print(f"Indexed {directory}: {stats['updated']} updated, {stats['skipped']} skipped, {stats['removed']} removed.")
+    print(format_report(stats["stages"]))
+    return stats
+
+def _timed_parse_file(file_path, known_hash, root=None):
+    started = time.perf_counter()
+    content_hash, chunks, symbols = parse_file(file_path, known_hash, root=root)
+    return content_hash, chunks, symbols, time.perf_counter() - started
+
+def _index_files_parallel(root, files, manifest, force, workers, seen, collect, flush_due):
+    """
+    Parses files in a process pool. At most `workers * 4` files are in flight at
+    once, so memory use stays flat however large the repository is; results are
+    handed to `collect` in completion order.
+    """
+    max_in_flight = workers * 4
+    in_flight = {}
+
+    def drain(return_when):
+        # Wake up periodically so a partial batch is flushed on time even while
+        # slow files are still being parsed
+        done, _ = wait(in_flight, timeout=config.EMBED_BATCH_MAX_WAIT, return_when=return_when)
+        flush_due()
+        for future in done:
+            file_path, stat_result = in_flight.pop(future)
+            try:
+                content_hash, chunks, symbols, busy = future.result()
+            except READ_ERRORS as e:
+                print(f"Error reading file {file_path}: {e}")
+                continue
+            result = apply_parse_result(file_path, stat_result, manifest, content_hash, chunks, symbols)
+            collect(file_path, *result, busy=busy)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for file_path in files:
+            seen.add(file_path)
+            try:
+                stat_result = os.stat(file_path)
+            except OSError as e:
+                print(f"Error reading file {file_path}: {e}")
+                continue
+
+            entry = manifest.get(file_path)
+            if entry and not force and manifest.is_unchanged(file_path, stat_result):
+                collect(file_path, "skipped", [], [], None)
+                continue
+
+            known_hash = entry["hash"] if entry and not force else None
+            in_flight[pool.submit(_timed_parse_file, file_path, known_hash, root)] = (file_path, stat_result)
+            while len(in_flight) >= max_in_flight:
+                drain(FIRST_COMPLETED)
+
+        while in_flight:
+            drain(ALL_COMPLETED)
+
+def format_result(text, metadata, namespace=None):
+    repository = f"Repository: {namespace}\n" if namespace else ""
+    return f"{repository}File: {metadata['file_path']}\nLines: {metadata['start_line']}-{metadata['end_line']}\nSnippet:\n{text}\n"
+
+def normalize_query(query):
+    return " ".join(query.split())
+
+def embed_queries(queries):
+    """
+    Returns one embedding per query. Queries seen before in this process come from
+    an in-memory LRU; the others are embedded together in a single request.
+    """
+    keys = [normalize_query(q) for q in queries]
+    vectors = [_query_embeddings.get(key) for key in keys]
+    missing = list(dict.fromkeys(key for key, vector in zip(keys, vectors) if vector is None))
+    if missing:
+        fresh = dict(zip(missing, get_embedder().encode(missing, task_type="retrieval_query").tolist()))
+        for key, vector in fresh.items():
+            _query_embeddings.put(key, vector)
+        vectors = [vector if vector is not None else fresh[key] for key, vector in zip(keys, vectors)]
+    return vectors
+
+def search_code(query, n_results=5, repo=None):
+    """
+    Hybrid search. A query naming a single identifier that some indexed chunk defines
+    is answered from the lexical index alone, without embedding the query. Other
+    queries combine the BM25 ranking with the vector ranking by reciprocal rank fusion.
+    repo selects the namespace(s) to search (see resolve_namespaces).
+    """
+    return search_code_batch([query], n_results=n_results, repo=repo)[0]
+
+def _fetch_chunks(namespace, ids):
+    """
+    Returns {doc_id: (text, metadata)} for chunks found by the lexical index,
+    which keeps no texts, read from the namespace's vector store.
+    """
+    if not ids:
+        return {}
+    result = get_collection(namespace).get(ids=list(ids))
+    return {
+        doc_id: (text, metadata)
+        for doc_id, text, metadata in zip(result["ids"], result["documents"], result["metadatas"])
+    }
+
+def _search_namespace(namespace, queries, indices, embeddings, n_results):
+    """
+    Vector search of one namespace for queries[i], i in indices, fused with its
+    lexical ranking. Returns {i: [(doc_id, text, metadata), ...]}.
+    """
+    lexical = get_lexical_index(namespace)
+    results = get_collection(namespace).query(
+        query_embeddings=[embeddings[i] for i in indices],
         n_results=n_results
     )
 
-    formatted_results = []
-    if results['documents']:
-        for i, doc in enumerate(results['documents'][0]):
-            meta = results['metadatas'][0][i]
-            formatted_results.append(f"File: {meta['file_path']}\nLines: {meta['start_line']}-{meta['end_line']}\nSnippet:\n{doc}\n")
+    ranked = {}
+    for row, i in enumerate(indices):
+        found = {}
+        vector_ids = []
+        if results['documents'] and row < len(results['documents']):
+            for j, doc in enumerate(results['documents'][row]):
+                meta = results['metadatas'][row][j]
+                doc_id = results['ids'][row][j] if results.get('ids') else f"{meta['file_path']}:{meta['start_line']}"
+                found[doc_id] = (doc, meta)
+                vector_ids.append(doc_id)
 
-    return "\n".join(formatted_results)
+        lexical_ids = [doc_id for doc_id, _ in lexical.search(queries[i], n_results=n_results)]
+        found.update(_fetch_chunks(namespace, [doc_id for doc_id in lexical_ids if doc_id not in found]))
+        lexical_ids = [doc_id for doc_id in lexical_ids if doc_id in found]
+
+        order = reciprocal_rank_fusion([vector_ids, lexical_ids]) if lexical_ids else vector_ids
+        ranked[i] = [(doc_id, *found[doc_id]) for doc_id in order[:n_results]]
+    return ranked
+
+def search_code_batch(queries, n_results=5, repo=None):
+    """
+    Runs search_code for several queries and returns one result string per query.
+    All queries that need a vector search are embedded in one request, and each
+    namespace's collection is queried once. When several namespaces are searched,
+    their rankings are fused and each result names its repository.
+    """
+    namespaces = resolve_namespaces(repo)
+    # rankings[i] holds one ranked list of (namespace, doc_id, text, metadata) per namespace
+    rankings = [[] for _ in queries]
+    pending = {}
+    for namespace in namespaces:
+        lexical = get_lexical_index(namespace)
+        for i, query in enumerate(queries):
+            if is_symbol_query(query):
+                ids = lexical.lookup_symbol(query, n_results=n_results)
+                chunks = _fetch_chunks(namespace, ids)
+                if chunks:
+                    rankings[i].append([(namespace, d, *chunks[d]) for d in ids if d in chunks])
+                    continue
+            pending.setdefault(namespace, []).append(i)
+
+    if pending:
+        needed = sorted({i for indices in pending.values() for i in indices})
+        embeddings = dict(zip(needed, embed_queries([queries[i] for i in needed])))
+        for namespace, indices in pending.items():
+            for i, hits in _search_namespace(namespace, queries, indices, embeddings, n_results).items():
+                rankings[i].append([(namespace, *hit) for hit in hits])
+
+    answers = []
+    for lists in rankings:
+        if len(namespaces) == 1:
+            hits = lists[0] if lists else []
+        else:
+            entries = {(hit[0], hit[1]): hit for hits in lists for hit in hits}
+            order = reciprocal_rank_fusion([[(hit[0], hit[1]) for hit in hits] for hits in lists])
+            hits = [entries[key] for key in order[:n_results]]
+        answers.append("\n".join(
+            format_result(text, metadata, namespace if len(namespaces) > 1 else None)
+            for namespace, _, text, metadata in hits
+        ))
+    return answers
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        directory = sys.argv[1]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if args:
+        directory = args[0]
         print(f"Indexing directory: {directory}")
-        index_codebase(directory)
+        workers = None
+        namespace = None
+        commit = None
+        for flag in sys.argv[1:]:
+            if flag.startswith("--workers="):
+                workers = int(flag.split("=", 1)[1])
+            elif flag.startswith("--namespace="):
+                namespace = flag.split("=", 1)[1]
+            elif flag.startswith("--commit="):
+                commit = flag.split("=", 1)[1]
+        if commit:
+            from agent.git_index import index_commit
+            index_commit(directory, commit, namespace=namespace)
+        else:
+            index_codebase(directory, force="--full" in sys.argv, workers=workers, namespace=namespace)
         print("Indexing complete.")
 
+        if "--watch" in sys.argv:
+            from agent.watcher import watch
+            try:
+                watch(directory, namespace=namespace, polling="--poll" in sys.argv)
+            except KeyboardInterrupt:
+                print("\nStopped watching.")
+            sys.exit(0)
+
         # Test search
         test_query = "function to parse file"
         print(f"\nTesting search '{test_query}':")
-        print(search_code(test_query))
+        print(search_code(test_query, repo=namespace))
     else:
-        print("Usage: python -m agent.indexer <directory_to_index>")
+        print("Usage: python -m agent.indexer <directory_to_index> [--full] [--workers=N] [--namespace=NAME] [--commit=REV] [--watch [--poll]]")
@@ -0,0 +1,220 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+
+"""
+Inverted index over identifiers and words of the indexed chunks.
+Identifiers are indexed whole (lowercased) and split into their snake_case and
+camelCase parts, so `extract_json_from_text` matches both the exact symbol and
+queries like "extract json". Documents are ranked with BM25. The postings are
+stored in SQLite next to the Chroma database and queried per term, so opening
+the index reads nothing up front.
+"""
+
+IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+# A query that is a single (possibly dotted) identifier is treated as a symbol lookup
+SYMBOL_QUERY_RE = re.compile(r"^\s*[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*\s*$")
+DEFINITION_RE = re.compile(r"^\s*(?:async\s+)?(?:def|class|function|struct|interface)\s+([A-Za-z_][A-Za-z0-9_]*)")
+# A module-level assignment defines a constant or variable: MAX_FILE_SIZE = 1024
+ASSIGNMENT_RE = re.compile(r"^([A-Za-z_][A-Za-z0-9_]*)\s*(?::[^=]*)?=(?!=)")
+
+def split_identifier(identifier):
+    """
+    Returns the lowercased parts of an identifier: "parseHTTPResponse" ->
+    ["parse", "http", "response"], "MAX_FILE_SIZE" -> ["max", "file", "size"].
+    """
+    parts = []
+    for piece in identifier.split("_"):
+        parts.extend(p.lower() for p in CAMEL_RE.findall(piece))
+    return parts
+
+def tokenize(text):
+    """
+    Returns the terms of a text: every identifier lowercased, plus its parts when
+    it is a compound identifier.
+    """
+    terms = []
+    for identifier in IDENTIFIER_RE.findall(text):
+        whole = identifier.lower()
+        terms.append(whole)
+        parts = split_identifier(identifier)
+        if len(parts) > 1 or (parts and parts[0] != whole):
+            terms.extend(parts)
+    return terms
+
+def defined_names(text):
+    """
+    Returns the names a chunk defines: the function or class it starts with, and
+    every definition or assignment at the start of a line (module level).
+    """
+    names = set()
+    for i, line in enumerate(text.splitlines()):
+        match = DEFINITION_RE.match(line)
+        if match and (i < 3 or not line[:1].isspace()):
+            names.add(match.group(1))
+            continue
+        match = ASSIGNMENT_RE.match(line)
+        if match:
+            names.add(match.group(1))
+    return names
+
+def is_symbol_query(query):
+    return bool(SYMBOL_QUERY_RE.match(query))
+
+class LexicalIndex:
+    """
+    Postings, document lengths and defined names in SQLite. Chunk texts are not
+    stored: callers read them from the vector store. Changes are made in a
+    transaction that save() commits and rollback() drops. Without a path the
+    index lives in memory.
+    """
+    def __init__(self, path=None, k1=1.2, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._conn = None
+        # (number of documents, total length), recomputed after changes
+        self._stats = None
+        self._lock = threading.RLock()
+
+    def _connect(self):
+        # Opened lazily, so importing the indexer stays cheap
+        if self._conn is None:
+            if self.path:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path or ":memory:", check_same_thread=False)
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS docs (doc_id TEXT PRIMARY KEY, length INTEGER);"
+                "CREATE TABLE IF NOT EXISTS postings ("
+                "term TEXT, doc_id TEXT, tf INTEGER, PRIMARY KEY (term, doc_id)) WITHOUT ROWID;"
+                "CREATE TABLE IF NOT EXISTS definitions (name TEXT, doc_id TEXT);"
+                "CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings (doc_id);"
+                "CREATE INDEX IF NOT EXISTS idx_definitions_name ON definitions (name);"
+                "CREATE INDEX IF NOT EXISTS idx_definitions_doc ON definitions (doc_id);"
+            )
+        return self._conn
+
+    def save(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.commit()
+
+    def rollback(self):
+        """
+        Drops changes made since the index was last saved.
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._conn.rollback()
+                self._stats = None
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __len__(self):
+        with self._lock:
+            return self._statistics()[0]
+
+    def __contains__(self, doc_id):
+        with self._lock:
+            return self._connect().execute("SELECT 1 FROM docs WHERE doc_id = ?", (doc_id,)).fetchone() is not None
+
+    def add(self, doc_id, text):
+        """
+        Adds a chunk, replacing any previous version with the same id.
+        """
+        terms = tokenize(text)
+        with self._lock:
+            conn = self._connect()
+            self._delete(conn, doc_id)
+            conn.execute("INSERT INTO docs VALUES (?, ?)", (doc_id, len(terms)))
+            conn.executemany(
+                "INSERT INTO postings VALUES (?, ?, ?)",
+                [(term, doc_id, tf) for term, tf in Counter(terms).items()]
+            )
+            conn.executemany(
+                "INSERT INTO definitions VALUES (?, ?)", [(name, doc_id) for name in defined_names(text)]
+            )
+            self._stats = None
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._delete(self._connect(), doc_id)
+            self._stats = None
+
+    def _delete(self, conn, doc_id):
+        for table in ("docs", "postings", "definitions"):
+            conn.execute(f"DELETE FROM {table} WHERE doc_id = ?", (doc_id,))
+
+    def _statistics(self):
+        if self._stats is None:
+            count, total = self._connect().execute("SELECT COUNT(*), SUM(length) FROM docs").fetchone()
+            self._stats = (count, total or 0)
+        return self._stats
+
+    def _score(self, terms):
+        # BM25 over the given terms; callers hold the lock
+        n_docs, total_length = self._statistics()
+        if not n_docs:
+            return {}
+        avg_length = total_length / n_docs or 1.0
+        conn = self._connect()
+        scores = {}
+        for term in terms:
+            posting = conn.execute(
+                "SELECT p.doc_id, p.tf, d.length FROM postings p JOIN docs d ON d.doc_id = p.doc_id "
+                "WHERE p.term = ?",
+                (term,)
+            ).fetchall()
+            if not posting:
+                continue
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, tf, length in posting:
+                norm = tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_length))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * norm
+        return scores
+
+    def search(self, query, n_results=5):
+        """
+        Returns up to n_results (doc_id, score) pairs ranked by BM25.
+        """
+        with self._lock:
+            scores = self._score(set(tokenize(query)))
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:n_results]
+
+    def lookup_symbol(self, query, n_results=5):
+        """
+        Answers a query naming one identifier: chunks that define it come first,
+        then chunks that mention it, by BM25 on the identifier. Returns [] unless
+        some chunk defines the symbol, so a name that is only mentioned (a common
+        word, a library call) falls back to the hybrid search.
+        """
+        name = query.strip().split(".")[-1]
+        with self._lock:
+            defining = {row[0] for row in self._connect().execute(
+                "SELECT doc_id FROM definitions WHERE name = ?", (name,)
+            )}
+            if not defining:
+                return []
+            scores = self._score([name.lower()])
+        ranked = sorted(scores, key=lambda doc_id: (doc_id not in defining, -scores[doc_id], doc_id))
+        return ranked[:n_results]
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuses several ranked lists of ids into one. Each id scores sum(1 / (k + rank))
+    over the lists it appears in, so ids ranked well by either retriever rise.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return [doc_id for doc_id, _ in sorted(scores.items(), key=lambda item: (-item[1], item[0]))]
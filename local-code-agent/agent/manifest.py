@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+
+"""
+Persistent index manifest.
+Records, for every indexed file, its size, mtime, content hash and the ids of the
+chunks it produced, so that re-indexing only touches files that actually changed.
+The content hash is the git blob id, so entries written from the working tree and
+from git objects (agent.git_index) can be compared; `commit` is the commit the
+index was last built from in git mode.
+"""
+
+MANIFEST_VERSION = 2
+
+def hash_file(file_path, block_size=1 << 16):
+    """
+    Returns the git blob id of a file's content (sha1 of "blob <size>\\0" + content).
+    """
+    digest = hashlib.sha1()
+    digest.update(f"blob {os.path.getsize(file_path)}\0".encode("ascii"))
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class IndexManifest:
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        self.commit = None
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            self.files = {}
+            return
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: Could not read index manifest {self.path}, starting fresh: {e}")
+            self.files = {}
+            return
+
+        if data.get("version") == 1:
+            # Version 1 chunk ids were absolute paths. Keep the entries so those ids are
+            # deleted as stale, but forget size and hash so every file is re-chunked.
+            self.files = data.get("files", {})
+            for entry in self.files.values():
+                entry["size"] = None
+                entry["hash"] = None
+            return
+
+        if data.get("version") != MANIFEST_VERSION:
+            print(f"Warning: Index manifest {self.path} has an unknown version, starting fresh.")
+            self.files = {}
+            return
+
+        self.files = data.get("files", {})
+        self.commit = data.get("commit")
+
+    def save(self):
+        """
+        Writes the manifest atomically so an interrupted run never leaves a truncated file.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "commit": self.commit, "files": self.files}, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, file_path):
+        return self.files.get(file_path)
+
+    def is_unchanged(self, file_path, stat_result):
+        """
+        Cheap check based on size and mtime only; does not read the file.
+        """
+        entry = self.files.get(file_path)
+        if not entry:
+            return False
+        return entry["size"] == stat_result.st_size and entry["mtime"] == stat_result.st_mtime_ns
+
+    def update(self, file_path, stat_result, content_hash, chunk_ids):
+        """
+        Records a file's state. stat_result is None for content read from git,
+        so the next working-tree run falls back to comparing hashes.
+        """
+        self.files[file_path] = {
+            "size": stat_result.st_size if stat_result is not None else None,
+            "mtime": stat_result.st_mtime_ns if stat_result is not None else None,
+            "hash": content_hash,
+            "chunk_ids": list(chunk_ids),
+        }
+
+    def remove(self, file_path):
+        return self.files.pop(file_path, None)
+
+    def paths_under(self, directory):
+        """
+        Returns the manifest paths that live inside the given directory.
+        """
+        prefix = os.path.join(os.path.abspath(directory), "")
+        return [p for p in self.files if p.startswith(prefix)]
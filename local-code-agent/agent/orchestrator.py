@@ -1,44 +1,200 @@
 from agent.agents import code_reader, code_writer, tester, debugger, planner
-from agent.tools import execute_tool, search_code, read_file, list_directory, run_command
+from agent.tools import execute_tool, search_code, search_code_batch, read_file, list_directory, run_command
 from agent.execution import execute_agent_loop
-from agent.utils import extract_json_from_text
+from agent.utils import extract_json_from_text, estimate_tokens
+from agent.context import ContextBuilder, truncate_to_tokens
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import config
 import json
+import threading
 import traceback
 
+# Agents that write files, run commands or prompt the user never run alongside other
+# steps (the debugger runs tests through ask_orchestrator "run_test")
+EXCLUSIVE_AGENTS = {"writer", "code_writer", "tester", "debugger"}
+# Tools that ask the user for input; calls from parallel steps are serialized
+INTERACTIVE_TOOLS = {"write_file", "run_command", "ask_user"}
+# Agents whose steps get search results for their task prefetched before the plan runs
+PREFETCH_AGENTS = {"reader", "code_reader", "writer", "code_writer", "debugger"}
+
+def print_stream(text):
+    print(text, end="", flush=True)
+
 class Orchestrator:
-    def __init__(self):
+    def __init__(self, stream=False, on_text=print_stream):
+        # When streaming, agent replies are printed token by token as they arrive
+        self.stream = stream
+        self.on_text = on_text
+        self.reset_state()
+        self.context_builder = ContextBuilder(
+            total_budget=config.CONTEXT_TOKEN_BUDGET,
+            step_budget=config.CONTEXT_STEP_TOKEN_BUDGET
+        )
+        # Guards state["results"], which parallel steps read while others complete
+        self._lock = threading.Lock()
+        # Held while a command confirmation is prompted, so parallel steps never
+        # ask the user two questions at once
+        self._prompt_lock = threading.Lock()
+        # self.conversation_history = []
+
+    def reset_state(self):
+        """
+        Starts a fresh state. run() calls this for each query, so a server session
+        that reuses one Orchestrator never passes one query's context or results
+        to the next.
+        """
         self.state = {
             "context": {},
             "plan": [],
-            "results": {}
+            "results": {},
+            # Per-step token accounting: context passed in and result produced
+            "token_usage": {}
         }
-        # self.conversation_history = []
 
     def run(self, user_query):
         print(f"Orchestrator: Received query: {user_query}")
+        self.reset_state()
 
         # 1. Generate plan
         plan = self.create_plan(user_query)
         self.state["plan"] = plan
         print(f"Orchestrator: Plan generated: {json.dumps(plan, indent=2)}")
 
-        # 2. Execute steps
-        for step in plan:
-            agent_name = step.get("agent")
-            task = step.get("task")
-            step_id = self.get_step_id(step)
-
-            print(f"\nOrchestrator: Executing step {step_id} with agent {agent_name}...")
-            print(f"Task: {task}")
+        if config.ORCHESTRATOR_PREFETCH:
+            self.prefetch_context(plan)
 
-            result = self.call_agent(agent_name, task)
-            self.state["results"][step_id] = result
-            print(f"Orchestrator: Step {step_id} completed.")
+        # 2. Execute steps, running independent ones concurrently
+        self.execute_plan(plan)
 
         # 3. Synthesize answer
         final_answer = self.synthesize_answer()
         return final_answer
 
+    def prefetch_context(self, plan):
+        """
+        Searches the index for the tasks of all steps of PREFETCH_AGENTS in one
+        batched call and stores the results in state["context"] by step id, so
+        those steps start with relevant code instead of spending turns searching.
+        """
+        step_ids = [self.get_step_id(step) for step in plan]
+        targets = [(sid, step.get("task")) for step, sid in zip(plan, step_ids)
+                   if str(step.get("agent", "")).lower() in PREFETCH_AGENTS and step.get("task")]
+        if not targets:
+            return
+        print(f"Orchestrator: Prefetching context for {len(targets)} step(s)...")
+        results = search_code_batch([task for _, task in targets])
+        with self._lock:
+            for (sid, _), result in zip(targets, results):
+                if result and not result.startswith("Error"):
+                    self.state["context"][sid] = result
+
+    def build_dependencies(self, plan, step_ids):
+        """
+        Returns a dict mapping each step id to the ids of the steps it depends on.
+        If the planner gave no `depends_on` edges at all, every step depends on all
+        previous ones, which reproduces strictly sequential execution.
+        """
+        if not any("depends_on" in step for step in plan):
+            return {sid: step_ids[:i] for i, sid in enumerate(step_ids)}
+
+        known = set(step_ids)
+        dependencies = {}
+        for step, sid in zip(plan, step_ids):
+            deps = step.get("depends_on") or []
+            if not isinstance(deps, list):
+                deps = [deps]
+            resolved = []
+            for dep in deps:
+                dep = str(dep)
+                # Planners sometimes refer to steps by their 1-based position
+                if dep not in known and f"step_{dep}" in known:
+                    dep = f"step_{dep}"
+                if dep in known and dep != sid:
+                    resolved.append(dep)
+                else:
+                    print(f"Orchestrator: Ignoring unknown dependency '{dep}' of step {sid}.")
+            dependencies[sid] = resolved
+        return dependencies
+
+    def execute_plan(self, plan, max_workers=None):
+        """
+        Runs plan steps as a DAG. A step starts once all the steps it depends on
+        have finished, with at most `max_workers` steps in flight. Steps whose agent
+        has side effects or prompts the user (see EXCLUSIVE_AGENTS) always run alone.
+        """
+        if max_workers is None:
+            max_workers = config.ORCHESTRATOR_MAX_WORKERS
+        max_workers = max(1, max_workers)
+
+        step_ids = [self.get_step_id(step) for step in plan]
+        dependencies = self.build_dependencies(plan, step_ids)
+        steps = dict(zip(step_ids, plan))
+        pending = list(step_ids)
+        done = set()
+        running = {}
+        streamed = set()
+
+        def is_exclusive(sid):
+            return str(steps[sid].get("agent", "")).lower() in EXCLUSIVE_AGENTS
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while pending or running:
+                ready = [sid for sid in pending if all(dep in done for dep in dependencies[sid])]
+                if not ready and not running:
+                    # Dependency cycle: run the earliest remaining step with what is available
+                    print(f"Orchestrator: Dependency cycle detected, running step {pending[0]} anyway.")
+                    ready = [pending[0]]
+
+                batch = []
+                for sid in ready:
+                    if len(running) + len(batch) >= max_workers:
+                        break
+                    if is_exclusive(sid):
+                        if not running and not batch:
+                            batch.append(sid)
+                        break
+                    if any(is_exclusive(r) for r in running.values()):
+                        break
+                    batch.append(sid)
+
+                # Stream only when a step runs alone, so concurrent output never interleaves
+                stream = self.stream and len(batch) == 1 and not running
+                for sid in batch:
+                    pending.remove(sid)
+                    step = steps[sid]
+                    print(f"\nOrchestrator: Executing step {sid} with agent {step.get('agent')}...")
+                    print(f"Task: {step.get('task')}")
+                    context_ids = [dep for dep in dependencies[sid] if dep in done]
+                    future = pool.submit(self.call_agent, step.get("agent"), step.get("task"), context_ids, stream, sid)
+                    running[future] = sid
+                    if stream:
+                        streamed.add(sid)
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    sid = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = f"Error executing step {sid}: {e}"
+                    if sid in streamed:
+                        print()
+                    elif self.stream:
+                        # Steps that ran alongside others were not streamed; show
+                        # their result now so the streaming caller still sees it
+                        self.on_text(f"=== Step {sid} ===\n{result}\n")
+                    with self._lock:
+                        self.state["results"][sid] = result
+                        usage = self.state["token_usage"].setdefault(sid, {})
+                        usage["result_tokens"] = estimate_tokens(str(result))
+                    done.add(sid)
+                    print(f"Orchestrator: Step {sid} completed.")
+
+        # Report results in plan order rather than completion order
+        with self._lock:
+            results = self.state["results"]
+            self.state["results"] = {sid: results[sid] for sid in step_ids if sid in results}
+
     def get_step_id(self, step):
         # Generate a simple ID if not present
         if "id" in step:
@@ -80,7 +236,7 @@ class Orchestrator:
         if "debug" in q or "error" in q or "fail" in q: return "debugger"
         return "reader"
 
-    def call_agent(self, agent_name, task):
+    def call_agent(self, agent_name, task, context_ids=None, stream=None, step_id=None):
         agent_map = {
             "reader": code_reader,
             "code_reader": code_reader,
@@ -95,23 +251,49 @@ class Orchestrator:
             print(f"Unknown agent: {agent_name}. Defaulting to reader.")
             agent_fn = code_reader
 
-        return self.run_agent_loop(agent_fn, task)
+        return self.run_agent_loop(agent_fn, task, context_ids=context_ids, stream=stream, step_id=step_id)
 
-    def run_agent_loop(self, agent_fn, task, max_iterations=10):
+    def run_agent_loop(self, agent_fn, task, max_iterations=10, context_ids=None, stream=None, step_id=None):
+        """
+        Runs one agent on a task. context_ids limits the previous results included
+        in the prompt to those steps (None includes all of them); the context is
+        compacted to the configured token budget.
+        """
         history = []
+        if stream is None:
+            stream = self.stream
 
-        context_str = self.get_context_string()
+        context_str, report = self.build_context(context_ids)
+        if step_id is not None and report:
+            original = sum(r["original_tokens"] for r in report.values())
+            tokens = sum(r["tokens"] for r in report.values())
+            print(f"  Context for {step_id}: {tokens} tokens (compacted from {original})")
+            with self._lock:
+                usage = self.state["token_usage"].setdefault(step_id, {})
+                usage["context_tokens"] = tokens
+                usage["context_original_tokens"] = original
+                usage["context"] = report
         if context_str:
             task = f"{task}\n\nContext from previous steps:\n{context_str}"
 
+        with self._lock:
+            prefetched = self.state["context"].get(step_id) if step_id is not None else None
+        if prefetched:
+            prefetched = truncate_to_tokens(prefetched, config.CONTEXT_STEP_TOKEN_BUDGET)
+            history.append({"role": "user", "parts": [f"Relevant code found for this task:\n{prefetched}"]})
+
         def get_response_fn(hist):
+            if stream:
+                return agent_fn(task, hist, stream=True)
             return agent_fn(task, hist)
 
         def tool_executor(name, args):
             if name == "ask_orchestrator":
                 return self.handle_orchestrator_request(args)
-            else:
-                return execute_tool(name, args)
+            if name in INTERACTIVE_TOOLS:
+                with self._prompt_lock:
+                    return execute_tool(name, args)
+            return execute_tool(name, args)
 
         # Simple logging wrapper to match previous style roughly
         def log_func(msg):
@@ -122,7 +304,9 @@ class Orchestrator:
             history,
             tool_executor,
             max_iterations=max_iterations,
-            log_func=log_func
+            log_func=log_func,
+            on_text=self.on_text if stream else None,
+            fixed_tokens=agent_fn.prompt_tokens + estimate_tokens(task)
         )
 
     def handle_orchestrator_request(self, args):
@@ -139,21 +323,30 @@ class Orchestrator:
             path = args.get("path")
             return list_directory(path)
         elif action == "get_state":
-            return json.dumps(self.state, default=str)
+            with self._lock:
+                return json.dumps(self.state, default=str)
         elif action == "run_test":
              cmd = args.get("command")
-             return run_command(cmd)
+             with self._prompt_lock:
+                 return run_command(cmd)
         else:
             return f"Unknown orchestrator action: {action}"
 
-    def get_context_string(self):
-        if not self.state["results"]:
-            return ""
+    def build_context(self, step_ids=None):
+        """
+        Returns (context_string, report) for the results of the given steps (all
+        steps if None), compacted by the ContextBuilder to the token budget.
+        """
+        with self._lock:
+            results = dict(self.state["results"])
+        if step_ids is not None:
+            results = {sid: results[sid] for sid in step_ids if sid in results}
+        if not results:
+            return "", {}
+        return self.context_builder.build(results)
 
-        summary = []
-        for step_id, result in self.state["results"].items():
-            summary.append(f"Result from {step_id}:\n{result}\n")
-        return "\n".join(summary)
+    def get_context_string(self, step_ids=None):
+        return self.build_context(step_ids)[0]
 
     def synthesize_answer(self):
         parts = ["Mission Completed.\n\n"]
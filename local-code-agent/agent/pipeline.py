@@ -0,0 +1,220 @@
+import queue
+import threading
+import time
+
+"""
+A small staged producer/consumer pipeline.
+Each stage runs its own pool of worker threads and is connected to the next one
+by a bounded queue, so a slow stage applies back-pressure upstream instead of
+letting work pile up in memory. Every stage records its throughput so a run can
+report which stage was the bottleneck.
+"""
+
+_DONE = object()
+
+class StageStats:
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.units = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def record(self, units, busy, blocked=0.0):
+        now = time.perf_counter()
+        with self._lock:
+            if self.started is None:
+                self.started = now - busy
+            self.finished = now
+            self.items += 1
+            self.units += units
+            self.busy += busy
+            self.blocked += blocked
+
+    @property
+    def wall(self):
+        if self.started is None:
+            return 0.0
+        return self.finished - self.started
+
+    @property
+    def utilization(self):
+        """
+        Fraction of the stage's worker capacity spent doing work (0..1).
+        """
+        capacity = self.wall * self.workers
+        return self.busy / capacity if capacity else 0.0
+
+    def summary(self):
+        rate = self.units / self.wall if self.wall else 0.0
+        return (f"{self.name}: {self.items} items, {self.units} chunks in {self.wall:.2f}s "
+                f"({rate:.1f} chunks/s, {self.workers} workers, {self.utilization:.0%} busy, "
+                f"{self.blocked:.2f}s blocked downstream)")
+
+def format_report(stats_list):
+    lines = [s.summary() for s in stats_list]
+    active = [s for s in stats_list if s.items]
+    if active:
+        bottleneck = max(active, key=lambda s: s.utilization)
+        lines.append(f"Bottleneck: {bottleneck.name}")
+    return "\n".join(lines)
+
+class _Stage:
+    def __init__(self, name, fn, workers, units):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.units = units
+        self.stats = StageStats(name, self.workers)
+        self.threads = []
+
+class Pipeline:
+    def __init__(self, queue_size=8):
+        self.queue_size = queue_size
+        self.stages = []
+        self.queues = []
+        self.error = None
+        self._failed = threading.Event()
+
+    def add_stage(self, name, fn, workers=1, units=len):
+        """
+        Appends a stage. fn receives one item and returns the item for the next
+        stage; units(item) is the amount of work it represents (e.g. chunks).
+        """
+        self.stages.append(_Stage(name, fn, workers, units))
+        return self
+
+    @property
+    def stats(self):
+        return [stage.stats for stage in self.stages]
+
+    def start(self):
+        self.queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._work, args=(index,), name=f"{stage.name}-{n}", daemon=True
+                )
+                thread.start()
+                stage.threads.append(thread)
+        return self
+
+    def put(self, item):
+        """
+        Feeds an item to the first stage, blocking while its queue is full.
+        Returns the number of seconds spent blocked.
+        """
+        if self._failed.is_set():
+            raise self.error
+        started = time.perf_counter()
+        self._put(self.queues[0], item)
+        if self._failed.is_set():
+            raise self.error
+        return time.perf_counter() - started
+
+    def _put(self, q, item):
+        # Poll so a failure downstream can never leave a producer blocked forever
+        while True:
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if self._failed.is_set():
+                    return
+
+    def _work(self, index):
+        stage = self.stages[index]
+        inbox = self.queues[index]
+        outbox = self.queues[index + 1] if index + 1 < len(self.queues) else None
+
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                return
+            if self._failed.is_set():
+                # Keep draining so upstream stages can finish
+                continue
+
+            started = time.perf_counter()
+            try:
+                result = stage.fn(item)
+            except Exception as e:
+                self.error = e
+                self._failed.set()
+                continue
+            busy = time.perf_counter() - started
+
+            blocked = 0.0
+            if outbox is not None and result is not None:
+                put_started = time.perf_counter()
+                self._put(outbox, result)
+                blocked = time.perf_counter() - put_started
+            stage.stats.record(stage.units(item), busy, blocked)
+
+    def close(self):
+        """
+        Signals end of input, waits for every stage to drain and re-raises the
+        first error raised by any stage.
+        """
+        for index, stage in enumerate(self.stages):
+            for _ in stage.threads:
+                self.queues[index].put(_DONE)
+            for thread in stage.threads:
+                thread.join()
+
+        if self.error is not None:
+            raise self.error
+
+class Batcher:
+    """
+    Groups a stream of items into batches bounded by item count and by a size
+    budget (e.g. estimated tokens), independent of where the items came from.
+    A batch is released as soon as either bound would be exceeded, or once its
+    oldest item has waited max_wait seconds so a slow producer never stalls it.
+    """
+    def __init__(self, max_items, max_size, size=len, max_wait=None):
+        self.max_items = max_items
+        self.max_size = max_size
+        self.size = size
+        self.max_wait = max_wait
+        self._items = []
+        self._total = 0
+        self._oldest = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, item):
+        """
+        Adds an item and returns the list of batches that became ready.
+        An item larger than max_size on its own is released as a batch of one.
+        """
+        ready = []
+        item_size = self.size(item)
+        if self._items and (len(self._items) >= self.max_items or self._total + item_size > self.max_size):
+            ready.append(self.flush())
+
+        if not self._items:
+            self._oldest = time.monotonic()
+        self._items.append(item)
+        self._total += item_size
+
+        if len(self._items) >= self.max_items or self._total >= self.max_size:
+            ready.append(self.flush())
+        return ready
+
+    def due(self):
+        if not self._items or self.max_wait is None:
+            return False
+        return time.monotonic() - self._oldest >= self.max_wait
+
+    def flush(self):
+        batch = self._items
+        self._items = []
+        self._total = 0
+        self._oldest = None
+        return batch
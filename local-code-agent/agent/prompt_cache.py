@@ -0,0 +1,177 @@
+import datetime
+import hashlib
+import json
+import threading
+import time
+import config
+from agent.utils import estimate_tokens
+
+"""
+Reuse of static prompt prefixes.
+Every agent call sends the system prompt, the tool declarations and (for the
+single agent) the initial search context again. With a prompt cache the prefix
+is registered once as cached content and later calls send only the history
+and the user message. Backends are pluggable: GeminiCacheBackend uses the
+Gemini cached-content API, InMemoryCacheBackend re-adds the prefix locally and
+is used in tests and offline runs. A model is re-created shortly before its
+cached content expires, or when a call finds the cached content gone.
+"""
+
+# Smallest cached content, in tokens, that the cached-content API accepts per model
+CACHED_CONTENT_MIN_TOKENS = {
+    "gemini-1.5-pro": 32768,
+    "gemini-1.5-flash": 32768,
+}
+
+def min_cached_tokens(model_name):
+    """
+    Returns the cached-content minimum of model_name. Unknown models get the
+    1.5 minimum, so a prefix that could be too small is sent in full rather
+    than rejected by the API on every call.
+    """
+    for prefix, tokens in CACHED_CONTENT_MIN_TOKENS.items():
+        if model_name.startswith(prefix):
+            return tokens
+    return max(CACHED_CONTENT_MIN_TOKENS.values())
+
+def is_missing_cache_error(error):
+    """
+    True if a call failed because its cached content expired or was deleted
+    (the API answers 404 / NOT_FOUND for both).
+    """
+    if getattr(error, "code", None) == 404:
+        return True
+    message = str(error).lower()
+    return "cachedcontent" in message.replace(" ", "") and ("not found" in message or "expired" in message)
+
+def _message_text(message):
+    if isinstance(message, dict):
+        return "".join(str(part) for part in message.get("parts", []))
+    return str(message)
+
+def prefix_key(model_name, system_prompt, tool_names, prefix):
+    payload = json.dumps(
+        [model_name, system_prompt, sorted(tool_names), [_message_text(m) for m in prefix]]
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class GeminiCacheBackend:
+    def create(self, system_prompt, tool_names, prefix, ttl):
+        """
+        Registers the prefix as Gemini cached content and returns a model bound to it.
+        Tools must be part of the cached content; a model built from cached content
+        cannot add its own.
+        """
+        import google.generativeai as genai
+        from google.generativeai import caching
+        from google.ai.generativelanguage import Tool
+        from agent.tool_schemas import TOOL_SCHEMAS
+
+        genai.configure(api_key=config.GEMINI_API_KEY)
+        tool_declarations = [TOOL_SCHEMAS[name] for name in tool_names if name in TOOL_SCHEMAS]
+        cached_content = caching.CachedContent.create(
+            model=f"models/{config.GEMINI_MODEL}",
+            system_instruction=system_prompt,
+            contents=list(prefix) or None,
+            tools=[Tool(function_declarations=tool_declarations)] if tool_declarations else None,
+            ttl=datetime.timedelta(seconds=ttl),
+        )
+        return genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+
+class InMemoryCacheBackend:
+    """
+    Local stand-in for the cached-content API. The returned model prepends the
+    registered prefix and forwards to a model built by model_factory(tool_names).
+    """
+    def __init__(self, model_factory):
+        self.model_factory = model_factory
+        self.created = []
+
+    def create(self, system_prompt, tool_names, prefix, ttl):
+        self.created.append((system_prompt, list(tool_names), list(prefix)))
+        return _PrefixedModel(self.model_factory(tool_names), system_prompt, prefix)
+
+class _PrefixedModel:
+    def __init__(self, model, system_prompt, prefix):
+        self.model = model
+        self.prefix = [{"role": "user", "parts": [system_prompt]}] + list(prefix)
+
+    def generate_content(self, messages, **kwargs):
+        return self.model.generate_content(self.prefix + list(messages), **kwargs)
+
+class PromptCache:
+    def __init__(self, backend, ttl=3600, min_tokens=0, refresh_margin=60):
+        """
+        Args:
+            backend: Object with create(system_prompt, tool_names, prefix, ttl) -> model.
+            ttl: Lifetime of cached content in seconds.
+            min_tokens: Prefixes estimated below this size are not cached
+                (the Gemini API rejects small cached contents).
+            refresh_margin: A model is re-created this many seconds before its
+                cached content expires.
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self.refresh_margin = refresh_margin
+        # key -> (model or None, time.monotonic() at creation)
+        self._models = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_model(self, system_prompt, tool_names, prefix=()):
+        """
+        Returns a model with the prefix cached, or None if the prefix is not cached
+        (too small, or the backend failed), in which case the caller sends it in full.
+        """
+        tokens = estimate_tokens(system_prompt) + sum(estimate_tokens(_message_text(m)) for m in prefix)
+        if tokens < self.min_tokens:
+            return None
+
+        key = prefix_key(config.GEMINI_MODEL, system_prompt, tool_names, prefix)
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl - self.refresh_margin:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            try:
+                model = self.backend.create(system_prompt, tool_names, prefix, self.ttl)
+            except Exception as e:
+                print(f"Warning: Could not cache prompt prefix, sending it in full: {e}")
+                model = None
+            # A failed prefix is remembered as None so it is not retried on every call
+            self._models[key] = (model, time.monotonic())
+            return model
+
+    def invalidate(self, system_prompt, tool_names, prefix=()):
+        """
+        Forgets the model of a prefix whose cached content is gone on the server,
+        so the next get_model() creates it again.
+        """
+        key = prefix_key(config.GEMINI_MODEL, system_prompt, tool_names, prefix)
+        with self._lock:
+            self._models.pop(key, None)
+
+_prompt_cache = None
+_prompt_cache_lock = threading.Lock()
+
+def get_prompt_cache():
+    """
+    Returns the shared prompt cache, or None when PROMPT_CACHE_ENABLED is off.
+    """
+    global _prompt_cache
+    if not config.PROMPT_CACHE_ENABLED:
+        return None
+    if _prompt_cache is None:
+        with _prompt_cache_lock:
+            if _prompt_cache is None:
+                _prompt_cache = PromptCache(
+                    GeminiCacheBackend(),
+                    ttl=config.PROMPT_CACHE_TTL,
+                    min_tokens=(config.PROMPT_CACHE_MIN_TOKENS if config.PROMPT_CACHE_MIN_TOKENS is not None
+                                else min_cached_tokens(config.GEMINI_MODEL)),
+                    refresh_margin=config.PROMPT_CACHE_REFRESH_MARGIN
+                )
+    return _prompt_cache
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import threading
+from collections.abc import Mapping
+import config
+
+"""
+Deterministic cache of model responses.
+Responses are stored as JSON files keyed by a hash of the model name, the tool
+names and the serialized message list. In "record" mode a cached response is
+reused and a missing one is fetched from the model and stored; in "replay" mode
+only cached responses are used and a miss is an error, so a recorded run can be
+repeated offline and deterministically.
+"""
+
+MODES = ("off", "record", "replay")
+
+class ResponseCacheMiss(Exception):
+    pass
+
+def _plain(value):
+    # Protobuf maps and repeated fields (function call args) to JSON types
+    if isinstance(value, Mapping):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)) or (hasattr(value, "__iter__") and not isinstance(value, (str, bytes))):
+        return [_plain(v) for v in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+def serialize_part(part):
+    if isinstance(part, str):
+        return {"text": part}
+    if getattr(part, "function_call", None):
+        return {"function_call": {"name": part.function_call.name, "args": _plain(part.function_call.args)}}
+    if getattr(part, "function_response", None):
+        return {"function_response": {"name": part.function_response.name,
+                                      "response": _plain(part.function_response.response)}}
+    return {"text": getattr(part, "text", None) or ""}
+
+def serialize_message(message):
+    if isinstance(message, dict):
+        return {"role": message.get("role"), "parts": [serialize_part(p) for p in message.get("parts", [])]}
+    return {"role": getattr(message, "role", None),
+            "parts": [serialize_part(p) for p in getattr(message, "parts", None) or []]}
+
+def request_key(model_name, tool_names, messages):
+    payload = json.dumps(
+        [model_name, sorted(tool_names), [serialize_message(m) for m in messages]],
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class _Part:
+    def __init__(self, text=None, function_call=None):
+        self.text = text
+        self.function_call = function_call
+
+class _FunctionCall:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+class _Candidate:
+    def __init__(self, content):
+        self.content = content
+
+class CachedResponse:
+    """
+    Rebuilt response with the attributes execute_agent_loop and the planner use:
+    parts, text, candidates[0].content, and iteration as a single streamed chunk.
+    """
+    def __init__(self, parts):
+        from google.ai.generativelanguage import Content, Part, FunctionCall
+
+        self.parts = []
+        content_parts = []
+        for part in parts:
+            if "function_call" in part:
+                call = part["function_call"]
+                self.parts.append(_Part(function_call=_FunctionCall(call["name"], call["args"])))
+                content_parts.append(Part(function_call=FunctionCall(name=call["name"], args=call["args"])))
+            else:
+                self.parts.append(_Part(text=part["text"]))
+                content_parts.append(Part(text=part["text"]))
+        self.candidates = [_Candidate(Content(role="model", parts=content_parts))]
+
+    @property
+    def text(self):
+        return "".join(p.text for p in self.parts if p.text)
+
+    def __iter__(self):
+        yield self
+
+class _RecordingStream:
+    """
+    Passes a streamed response through and stores it once fully consumed.
+    """
+    def __init__(self, response, on_complete):
+        self._response = response
+        self._on_complete = on_complete
+
+    def __iter__(self):
+        for chunk in self._response:
+            yield chunk
+        self._on_complete(self._response)
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+class ResponseCache:
+    def __init__(self, directory, mode="record"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown response cache mode: {mode} (expected one of {', '.join(MODES)})")
+        self.directory = directory
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def store(self, key, response):
+        parts = [serialize_part(p) for p in response.parts]
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"parts": parts}, f, indent=2)
+        os.replace(tmp_path, self._path(key))
+
+    def generate(self, model_name, tool_names, messages, generate_fn, stream=False):
+        """
+        Returns the cached response for the request, or calls generate_fn() and
+        records its result (raises ResponseCacheMiss in replay mode).
+        """
+        key = request_key(model_name, tool_names, messages)
+        cached = self.load(key)
+        with self._lock:
+            if cached is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if cached is not None:
+            return CachedResponse(cached["parts"])
+        if self.mode == "replay":
+            raise ResponseCacheMiss(f"No recorded response for request {key[:12]} in {self.directory}")
+
+        response = generate_fn()
+        if stream:
+            return _RecordingStream(response, lambda r: self.store(key, r))
+        self.store(key, response)
+        return response
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """
+    Returns the shared response cache, or None when RESPONSE_CACHE_MODE is "off".
+    """
+    global _response_cache
+    if config.RESPONSE_CACHE_MODE == "off":
+        return None
+    with _response_cache_lock:
+        if _response_cache is None or _response_cache.mode != config.RESPONSE_CACHE_MODE:
+            _response_cache = ResponseCache(config.RESPONSE_CACHE_DIR, config.RESPONSE_CACHE_MODE)
+    return _response_cache
@@ -0,0 +1,396 @@
+import http.client
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import config
+
+"""
+Long-lived agent server.
+`python run.py --serve` loads the index and the agent models once and answers
+queries over a small JSON API, on a Unix socket or on localhost HTTP:
+
+    GET    /health              status, uptime, open sessions
+    GET    /latency             latency percentiles per endpoint
+    POST   /sessions            -> {"session_id"}
+    DELETE /sessions/<id>
+    POST   /query               {"query", "session_id"?, "stream"?}
+
+Each session has its own Orchestrator; sessions run concurrently, queries of one
+session run one at a time. With "stream": true the reply is newline-delimited
+JSON: {"text": ...} chunks as the agents generate them, then a final line with
+the answer. AgentClient is the matching client used by `run.py --client`; it only
+needs the standard library, so the client starts instantly.
+The server has no terminal to prompt on, so serve() runs with config.INTERACTIVE
+off: write_file and run_command refuse with an explanation the agent can relay,
+and ask_user tells the agent to proceed on its own assumptions.
+"""
+
+class ServerError(Exception):
+    pass
+
+def default_address():
+    """
+    Returns the server address from config as AgentClient/serve keyword arguments.
+    """
+    if config.SERVER_SOCKET and hasattr(socket, "AF_UNIX"):
+        return {"socket_path": config.SERVER_SOCKET}
+    return {"host": config.SERVER_HOST, "port": config.SERVER_PORT}
+
+class LatencyStats:
+    """
+    Keeps the last `window` durations per name and reports percentiles in milliseconds.
+    """
+    def __init__(self, window=1000):
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(seconds)
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def summary(self):
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+            counts = dict(self._counts)
+        report = {}
+        for name, values in samples.items():
+            def percentile(p):
+                return round(values[min(len(values) - 1, int(p * len(values)))] * 1000, 1)
+            report[name] = {
+                "count": counts[name],
+                "mean_ms": round(sum(values) / len(values) * 1000, 1),
+                "p50_ms": percentile(0.5),
+                "p95_ms": percentile(0.95),
+                "max_ms": round(values[-1] * 1000, 1),
+            }
+        return report
+
+class Session:
+    def __init__(self, session_id, orchestrator):
+        self.id = session_id
+        self.orchestrator = orchestrator
+        self.created = time.time()
+        self.last_used = self.created
+        self.queries = 0
+        # One query at a time per session; the orchestrator state is not shared
+        self.lock = threading.Lock()
+
+def _default_orchestrator_factory():
+    from agent.orchestrator import Orchestrator
+    return Orchestrator(stream=False)
+
+class AgentServer:
+    def __init__(self, orchestrator_factory=None, session_ttl=None):
+        self.orchestrator_factory = orchestrator_factory or _default_orchestrator_factory
+        self.session_ttl = config.SERVER_SESSION_TTL if session_ttl is None else session_ttl
+        self.sessions = {}
+        self.latency = LatencyStats()
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def create_session(self):
+        self.expire_sessions()
+        session = Session(uuid.uuid4().hex[:12], self.orchestrator_factory())
+        with self._lock:
+            self.sessions[session.id] = session
+        return session
+
+    def get_session(self, session_id):
+        with self._lock:
+            return self.sessions.get(session_id)
+
+    def close_session(self, session_id):
+        with self._lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def expire_sessions(self):
+        cutoff = time.time() - self.session_ttl
+        with self._lock:
+            for session_id in [s.id for s in self.sessions.values() if s.last_used < cutoff and not s.lock.locked()]:
+                del self.sessions[session_id]
+
+    def ask(self, query, session_id=None, on_text=None):
+        """
+        Runs a query in a session (a new one if session_id is None) and returns
+        {"session_id", "answer", "elapsed"}. on_text receives streamed text.
+        Raises KeyError for an unknown session.
+        """
+        session = self.get_session(session_id) if session_id else self.create_session()
+        if session is None:
+            raise KeyError(session_id)
+
+        with session.lock:
+            started = time.perf_counter()
+            orchestrator = session.orchestrator
+            orchestrator.stream = on_text is not None
+            if on_text is not None:
+                orchestrator.on_text = on_text
+            answer = orchestrator.run(query)
+            elapsed = time.perf_counter() - started
+            session.queries += 1
+            session.last_used = time.time()
+        self.latency.record("query", elapsed)
+        return {"session_id": session.id, "answer": answer, "elapsed": elapsed}
+
+    def health(self):
+        with self._lock:
+            sessions = len(self.sessions)
+        return {"status": "ok", "uptime": round(time.time() - self.started, 1), "sessions": sessions}
+
+    def make_server(self, socket_path=None, host=None, port=None):
+        """
+        Returns a threading HTTP server bound to a Unix socket (socket_path) or to host:port.
+        """
+        handler = type("AgentRequestHandler", (_RequestHandler,), {"agent": self})
+        if socket_path:
+            if os.path.exists(socket_path):
+                # A stale socket from a previous run; refuse if a server still answers on it
+                if _socket_in_use(socket_path):
+                    raise ServerError(f"An agent server is already listening on {socket_path}")
+                os.remove(socket_path)
+            os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+            server = _ThreadingUnixHTTPServer(socket_path, handler)
+            os.chmod(socket_path, 0o600)
+            return server
+        return ThreadingHTTPServer((host or config.SERVER_HOST, config.SERVER_PORT if port is None else port), handler)
+
+def _socket_in_use(socket_path):
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        # BaseHTTPRequestHandler expects these from HTTPServer
+        self.server_name = "localhost"
+        self.server_port = 0
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    server_version = "LocalCodeAgent/1.0"
+    agent = None
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "local"
+
+    def log_message(self, format, *args):
+        # Requests are reported through /latency rather than logged one by one
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length).decode("utf-8"))
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _timed(self, name, handle):
+        started = time.perf_counter()
+        try:
+            handle()
+        finally:
+            self.agent.latency.record(name, time.perf_counter() - started)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._timed("health", lambda: self._send_json(200, self.agent.health()))
+        elif self.path == "/latency":
+            self._timed("latency", lambda: self._send_json(200, self.agent.latency.summary()))
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint: {self.path}"})
+
+    def do_POST(self):
+        try:
+            payload = self._read_json()
+        except ValueError as e:
+            self._send_json(400, {"error": f"Invalid JSON: {e}"})
+            return
+        if self.path == "/sessions":
+            self._timed("sessions", lambda: self._send_json(200, {"session_id": self.agent.create_session().id}))
+        elif self.path == "/query":
+            self._query(payload)
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint: {self.path}"})
+
+    def do_DELETE(self):
+        prefix = "/sessions/"
+        if self.path.startswith(prefix):
+            closed = self.agent.close_session(self.path[len(prefix):])
+            self._send_json(200 if closed else 404, {"closed": closed})
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint: {self.path}"})
+
+    def _query(self, payload):
+        query = payload.get("query")
+        session_id = payload.get("session_id")
+        if not isinstance(query, str) or not query.strip():
+            self._send_json(400, {"error": "Missing query"})
+            return
+        if session_id and self.agent.get_session(session_id) is None:
+            self._send_json(404, {"error": f"Unknown session: {session_id}"})
+            return
+
+        if not payload.get("stream"):
+            try:
+                result = self.agent.ask(query, session_id)
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+                return
+            self._send_json(200, result)
+            return
+
+        # Streamed reply: no Content-Length, the connection closes after the last line
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        self.close_connection = True
+        write_lock = threading.Lock()
+        disconnected = []
+
+        def write_line(item):
+            if disconnected:
+                return
+            with write_lock:
+                try:
+                    self.wfile.write((json.dumps(item) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+                except OSError:
+                    # The client went away; the query still completes for the session
+                    disconnected.append(True)
+
+        try:
+            result = self.agent.ask(query, session_id, on_text=lambda text: write_line({"text": text}))
+            write_line(dict(result, done=True))
+        except Exception as e:
+            write_line({"error": str(e), "done": True})
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+class AgentClient:
+    def __init__(self, socket_path=None, host=None, port=None, timeout=None):
+        self.socket_path = socket_path
+        self.host = host or config.SERVER_HOST
+        self.port = config.SERVER_PORT if port is None else port
+        self.timeout = timeout
+
+    def _connection(self):
+        if self.socket_path:
+            return _UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _send(self, method, path, payload=None):
+        connection = self._connection()
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        connection.request(method, path, body=body, headers=headers)
+        return connection, connection.getresponse()
+
+    def request(self, method, path, payload=None):
+        connection, response = self._send(method, path, payload)
+        try:
+            data = json.loads(response.read().decode("utf-8") or "{}")
+        finally:
+            connection.close()
+        if response.status >= 400:
+            raise ServerError(data.get("error") or f"HTTP {response.status}")
+        return data
+
+    def health(self):
+        return self.request("GET", "/health")
+
+    def latency(self):
+        return self.request("GET", "/latency")
+
+    def create_session(self):
+        return self.request("POST", "/sessions", {})["session_id"]
+
+    def close_session(self, session_id):
+        return self.request("DELETE", f"/sessions/{session_id}")["closed"]
+
+    def query(self, query, session_id=None, on_text=None):
+        """
+        Asks a query and returns {"session_id", "answer", "elapsed"}. With on_text,
+        the reply is streamed and on_text is called with each chunk of text.
+        """
+        payload = {"query": query, "session_id": session_id, "stream": on_text is not None}
+        if on_text is None:
+            return self.request("POST", "/query", payload)
+
+        connection, response = self._send("POST", "/query", payload)
+        try:
+            if response.status >= 400:
+                data = json.loads(response.read().decode("utf-8") or "{}")
+                raise ServerError(data.get("error") or f"HTTP {response.status}")
+            for line in response:
+                item = json.loads(line.decode("utf-8"))
+                if "error" in item:
+                    raise ServerError(item["error"])
+                if item.get("done"):
+                    return {key: item[key] for key in ("session_id", "answer", "elapsed")}
+                on_text(item["text"])
+        finally:
+            connection.close()
+        raise ServerError("The server closed the connection before the answer was complete")
+
+def serve(socket_path=None, host=None, port=None, watch=False):
+    """
+    Loads the index and the agent models, then serves until interrupted.
+    With watch=True, config.PROJECT_ROOT is watched and its index kept up to date.
+    """
+    from agent import agents, indexer
+
+    # Confirmations and questions would block on the server's own stdin
+    config.INTERACTIVE = False
+    print("Loading index and models...")
+    started = time.perf_counter()
+    indexer.warm_up()
+    agents.warm_up()
+    print(f"Ready in {time.perf_counter() - started:.1f}s.")
+    if watch:
+        from agent.watcher import start_watching
+        start_watching(config.PROJECT_ROOT)
+
+    agent = AgentServer()
+    server = agent.make_server(socket_path=socket_path, host=host, port=port)
+    where = socket_path or f"http://{server.server_address[0]}:{server.server_address[1]}"
+    print(f"Agent server listening on {where}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down.")
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
@@ -0,0 +1,134 @@
+import os
+import threading
+from collections import Counter
+from agent.walker import Walker, is_ignore_file, ignore_file_scope
+import config
+
+"""
+Cached project tree behind tools.get_code_structure.
+Each directory's filtered listing is kept in memory with the directory's mtime.
+A call stats the directories of the tree and rescans only those whose mtime
+changed (files added, removed or renamed), so repeated calls on a large
+repository cost one stat per directory. The watcher calls invalidate() for
+changes mtimes do not reveal, such as an edited .gitignore.
+The output is bounded: deep directories are collapsed to file counts, large
+ones are summarized by extension, and the depth shrinks to fit max_entries.
+"""
+
+STRUCTURE_EXTENSIONS = ('.py', '.js', '.ts', '.java', '.cpp', '.h', '.c', '.md', '.txt')
+
+class _Node:
+    __slots__ = ("mtime", "dirs", "files", "total")
+
+    def __init__(self, mtime, dirs, files):
+        self.mtime = mtime
+        self.dirs = dirs
+        self.files = files
+        # Files in this directory and all its subdirectories, set by _refresh
+        self.total = len(files)
+
+_trees = {}
+_structure_lock = threading.Lock()
+
+def _forget(nodes, path):
+    prefix = os.path.join(path, "")
+    for key in [k for k in nodes if k == path or k.startswith(prefix)]:
+        del nodes[key]
+
+def invalidate(paths=None):
+    """
+    Forgets cached listings for changed paths (all of them if paths is None).
+    A changed ignore file invalidates everything below its directory.
+    """
+    with _structure_lock:
+        if paths is None:
+            _trees.clear()
+            return
+        for nodes in _trees.values():
+            for path in paths:
+                path = os.path.abspath(path)
+                if is_ignore_file(path):
+                    _forget(nodes, ignore_file_scope(path))
+                else:
+                    nodes.pop(path, None)
+                    nodes.pop(os.path.dirname(path), None)
+
+def _refresh(walker, nodes, path):
+    """
+    Brings the cached node of path and of its subdirectories up to date.
+    Returns the node, or None if the directory is gone.
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        nodes.pop(path, None)
+        return None
+    node = nodes.get(path)
+    if node is None or node.mtime != mtime:
+        _, dirnames, filenames = next(walker.walk(path), (path, [], []))
+        for removed in set(node.dirs if node else []) - set(dirnames):
+            _forget(nodes, os.path.join(path, removed))
+        node = _Node(mtime, dirnames, [f for f in filenames if f.endswith(STRUCTURE_EXTENSIONS)])
+        nodes[path] = node
+    total = len(node.files)
+    for name in node.dirs:
+        child = _refresh(walker, nodes, os.path.join(path, name))
+        if child is not None:
+            total += child.total
+    node.total = total
+    return node
+
+def _count(count, singular, plural):
+    return f"{count} {singular if count == 1 else plural}"
+
+def _summarize_files(files):
+    by_extension = Counter(os.path.splitext(f)[1] or f for f in files)
+    return ", ".join(f"{ext}: {count}" for ext, count in by_extension.most_common())
+
+def _render(nodes, path, name, depth, max_depth, lines):
+    node = nodes.get(path)
+    if node is None:
+        return
+    indent = "  " * depth
+    if depth >= max_depth and node.dirs:
+        lines.append(f"{indent}{name}/ ({_count(node.total, 'file', 'files')} in {_count(len(node.dirs), 'subdirectory', 'subdirectories')})")
+        return
+    lines.append(f"{indent}{name}/ ({_count(node.total, 'file', 'files')})")
+    for child in node.dirs:
+        _render(nodes, os.path.join(path, child), child, depth + 1, max_depth, lines)
+    if len(node.files) > config.STRUCTURE_DIR_FILE_LIMIT:
+        lines.append(f"{indent}  ... {_count(len(node.files), 'file', 'files')} ({_summarize_files(node.files)})")
+    else:
+        lines.extend(f"{indent}  {f}" for f in node.files)
+
+def code_structure(root, path=None, max_depth=None, max_entries=None):
+    """
+    Returns the tree under path (default: root) as indented lines, bounded by
+    max_depth and max_entries.
+    """
+    root = os.path.abspath(root)
+    path = os.path.abspath(os.path.join(root, path)) if path else root
+    max_depth = max(1, int(max_depth or config.STRUCTURE_MAX_DEPTH))
+    max_entries = max(1, int(max_entries or config.STRUCTURE_MAX_ENTRIES))
+
+    with _structure_lock:
+        nodes = _trees.setdefault(root, {})
+        walker = Walker(root)
+        if not os.path.isdir(path) or walker.is_ignored(path) or _refresh(walker, nodes, path) is None:
+            return f"Error: {path} is not a directory in the project."
+
+        # Shrink the depth until the tree fits, instead of cutting it off part way
+        name = os.path.basename(path) or path
+        for depth in range(max_depth, 0, -1):
+            lines = []
+            _render(nodes, path, name, 0, depth, lines)
+            if len(lines) <= max_entries:
+                break
+
+    if len(lines) > max_entries:
+        omitted = len(lines) - max_entries
+        lines = lines[:max_entries]
+        lines.append(f"... {omitted} more entries; pass a narrower path to see them")
+    if depth < max_depth:
+        lines.append(f"(depth reduced from {max_depth} to {depth} to stay within {max_entries} entries)")
+    return "\n".join(lines)
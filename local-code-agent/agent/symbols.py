@@ -0,0 +1,281 @@
+import os
+import re
+import sqlite3
+import threading
+
+"""
+Symbol table and cross-reference index.
+While chunking a file, the indexer walks its tree-sitter parse tree once more
+and records definitions, identifier references, imports and call edges (caller
+-> callee, by name). They are stored in SQLite next to the Chroma collection and
+answer "where is X defined / used / called from" without embedding anything.
+Names are resolved textually: a call `self.save()` is an edge to any `save`.
+"""
+
+# Node type -> kind of symbol it defines, across the supported grammars
+DEFINITION_TYPES = {
+    "function_definition": "function",
+    "function_declaration": "function",
+    "method_definition": "method",
+    "method_declaration": "method",
+    "constructor_declaration": "method",
+    "class_definition": "class",
+    "class_declaration": "class",
+    "class_specifier": "class",
+    "struct_specifier": "struct",
+    "interface_declaration": "interface",
+}
+CALL_TYPES = {"call", "call_expression", "method_invocation"}
+IMPORT_TYPES = {"import_statement", "import_from_statement", "import_declaration", "preproc_include"}
+IDENTIFIER_TYPES = {"identifier", "type_identifier", "field_identifier", "property_identifier"}
+IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+MAX_LINE_TEXT = 200
+
+def _text(node, source):
+    return source[node.start_byte:node.end_byte].decode("utf-8", "replace")
+
+def _definition_name_node(node):
+    name = node.child_by_field_name("name")
+    if name is not None:
+        return name
+    # C/C++ functions name themselves through nested declarators: int *f(void)
+    declarator = node.child_by_field_name("declarator")
+    while declarator is not None and declarator.type not in IDENTIFIER_TYPES | {"qualified_identifier"}:
+        declarator = declarator.child_by_field_name("declarator")
+    return declarator
+
+def _callee_name(node, source):
+    # call (Python) and call_expression use "function"; Java's method_invocation uses "name"
+    callee = node.child_by_field_name("function") or node.child_by_field_name("name")
+    if callee is None:
+        return None
+    names = IDENTIFIER_RE.findall(_text(callee, source))
+    # self.index.save -> save, ns::helper -> helper
+    return names[-1] if names else None
+
+def _import_entries(node, source):
+    """
+    Returns (module, name) pairs for an import node.
+    """
+    text = _text(node, source).strip()
+    if node.type == "preproc_include":
+        path = node.child_by_field_name("path")
+        module = _text(path, source).strip('"<>') if path is not None else text
+        return [(module, None)]
+    if node.type == "import_from_statement":
+        module_node = node.child_by_field_name("module_name")
+        module = _text(module_node, source) if module_node is not None else ""
+        names = [
+            _text(child.child_by_field_name("name") or child, source)
+            for child in node.children
+            if child.type in ("dotted_name", "aliased_import") and child != module_node
+        ]
+        return [(module, name) for name in names] or [(module, None)]
+    if node.type == "import_statement" and node.child_by_field_name("source") is not None:
+        # JavaScript/TypeScript: import { a, b } from "module"
+        module = _text(node.child_by_field_name("source"), source).strip("'\"")
+        clause = text[:text.rfind("from")] if "from" in text else ""
+        names = [n for n in IDENTIFIER_RE.findall(clause) if n not in ("import", "as", "type")]
+        return [(module, name) for name in names] or [(module, None)]
+    if node.type == "import_statement":
+        # Python: import a.b, c as d
+        modules = [
+            _text(child.child_by_field_name("name") or child, source)
+            for child in node.children
+            if child.type in ("dotted_name", "aliased_import")
+        ]
+        return [(module, None) for module in modules]
+    # Java: import a.b.C;
+    module = text[len("import"):].rstrip(";").strip() if text.startswith("import") else text
+    return [(module, module.split(".")[-1])]
+
+def extract_symbols(root_node, source):
+    """
+    Walks a tree-sitter tree and returns a dict with lists of tuples:
+        definitions: (name, qualname, kind, start_line, end_line)
+        references:  (name, line, text of the line)
+        imports:     (module, name, line)
+        calls:       (caller_qualname, callee_name, line)
+    Lines are 0-based like the chunk metadata. source is the file content as bytes.
+    """
+    definitions = []
+    references = set()
+    imports = []
+    calls = []
+    name_ranges = set()
+
+    # Iterative depth-first walk; each stack entry carries the enclosing definition names
+    stack = [(root_node, ())]
+    while stack:
+        node, scope = stack.pop()
+        child_scope = scope
+
+        if node.type in DEFINITION_TYPES:
+            name_node = _definition_name_node(node)
+            if name_node is not None:
+                names = IDENTIFIER_RE.findall(_text(name_node, source))
+                name = names[-1] if names else None
+                if name:
+                    kind = DEFINITION_TYPES[node.type]
+                    if kind == "function" and scope and scope[-1][1] in ("class", "struct", "interface"):
+                        kind = "method"
+                    qualname = ".".join([s[0] for s in scope] + [name])
+                    definitions.append((name, qualname, kind, node.start_point[0], node.end_point[0]))
+                    name_ranges.add((name_node.start_byte, name_node.end_byte))
+                    child_scope = scope + ((name, kind),)
+        elif node.type in CALL_TYPES:
+            callee = _callee_name(node, source)
+            if callee:
+                caller = ".".join(s[0] for s in scope) or "<module>"
+                calls.append((caller, callee, node.start_point[0]))
+        elif node.type in IMPORT_TYPES:
+            for module, name in _import_entries(node, source):
+                imports.append((module, name, node.start_point[0]))
+        elif node.type in IDENTIFIER_TYPES and (node.start_byte, node.end_byte) not in name_ranges:
+            references.add((_text(node, source), node.start_point[0]))
+
+        for child in reversed(node.children):
+            stack.append((child, child_scope))
+
+    lines = source.split(b"\n")
+    return {
+        "definitions": definitions,
+        "references": [
+            (name, line, lines[line].decode("utf-8", "replace").strip()[:MAX_LINE_TEXT])
+            for name, line in sorted(references, key=lambda r: (r[1], r[0]))
+        ],
+        "imports": imports,
+        "calls": calls,
+    }
+
+class SymbolIndex:
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # Opened lazily, like the embedding cache, so importing the indexer stays cheap
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS definitions ("
+                "file_path TEXT, name TEXT, qualname TEXT, kind TEXT, start_line INTEGER, end_line INTEGER);"
+                "CREATE TABLE IF NOT EXISTS refs (file_path TEXT, name TEXT, line INTEGER, text TEXT);"
+                "CREATE TABLE IF NOT EXISTS imports (file_path TEXT, module TEXT, name TEXT, line INTEGER);"
+                "CREATE TABLE IF NOT EXISTS calls (file_path TEXT, caller TEXT, callee TEXT, line INTEGER);"
+                "CREATE INDEX IF NOT EXISTS idx_definitions_name ON definitions (name);"
+                "CREATE INDEX IF NOT EXISTS idx_definitions_qualname ON definitions (qualname);"
+                "CREATE INDEX IF NOT EXISTS idx_definitions_file ON definitions (file_path);"
+                "CREATE INDEX IF NOT EXISTS idx_refs_name ON refs (name);"
+                "CREATE INDEX IF NOT EXISTS idx_refs_file ON refs (file_path);"
+                "CREATE INDEX IF NOT EXISTS idx_imports_file ON imports (file_path);"
+                "CREATE INDEX IF NOT EXISTS idx_imports_name ON imports (name);"
+                "CREATE INDEX IF NOT EXISTS idx_calls_callee ON calls (callee);"
+                "CREATE INDEX IF NOT EXISTS idx_calls_file ON calls (file_path);"
+            )
+        return self._conn
+
+    def _delete_file(self, conn, file_path):
+        for table in ("definitions", "refs", "imports", "calls"):
+            conn.execute(f"DELETE FROM {table} WHERE file_path = ?", (file_path,))
+
+    def replace_file(self, file_path, symbols, commit=True):
+        """
+        Replaces everything recorded for a file with the output of extract_symbols.
+        """
+        with self._lock:
+            conn = self._connect()
+            self._delete_file(conn, file_path)
+            conn.executemany(
+                "INSERT INTO definitions VALUES (?, ?, ?, ?, ?, ?)",
+                [(file_path, *d) for d in symbols.get("definitions", [])]
+            )
+            conn.executemany(
+                "INSERT INTO refs VALUES (?, ?, ?, ?)",
+                [(file_path, *r) for r in symbols.get("references", [])]
+            )
+            conn.executemany(
+                "INSERT INTO imports VALUES (?, ?, ?, ?)",
+                [(file_path, *i) for i in symbols.get("imports", [])]
+            )
+            conn.executemany(
+                "INSERT INTO calls VALUES (?, ?, ?, ?)",
+                [(file_path, *c) for c in symbols.get("calls", [])]
+            )
+            if commit:
+                conn.commit()
+
+    def remove_file(self, file_path, commit=True):
+        with self._lock:
+            conn = self._connect()
+            self._delete_file(conn, file_path)
+            if commit:
+                conn.commit()
+
+    def commit(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.commit()
+
+    def rollback(self):
+        """
+        Drops changes made with commit=False since the last commit.
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._conn.rollback()
+
+    def _query(self, sql, params):
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def find_definition(self, name):
+        """
+        Returns definitions of a name or dotted qualname (e.g. "Orchestrator.run"),
+        as dicts with file_path, qualname, kind, start_line and end_line.
+        """
+        column = "qualname" if "." in name else "name"
+        rows = self._query(
+            f"SELECT file_path, qualname, kind, start_line, end_line FROM definitions "
+            f"WHERE {column} = ? ORDER BY file_path, start_line",
+            (name,)
+        )
+        return [dict(zip(("file_path", "qualname", "kind", "start_line", "end_line"), row)) for row in rows]
+
+    def find_references(self, name, limit=100):
+        """
+        Returns up to `limit` places where an identifier appears (definitions excluded).
+        """
+        name = name.split(".")[-1]
+        rows = self._query(
+            "SELECT file_path, line, text FROM refs WHERE name = ? ORDER BY file_path, line LIMIT ?",
+            (name, limit)
+        )
+        return [dict(zip(("file_path", "line", "text"), row)) for row in rows]
+
+    def callers_of(self, name, limit=100):
+        """
+        Returns the functions that call `name`, with the file and line of each call.
+        """
+        name = name.split(".")[-1]
+        rows = self._query(
+            "SELECT file_path, caller, line FROM calls WHERE callee = ? ORDER BY file_path, line LIMIT ?",
+            (name, limit)
+        )
+        return [dict(zip(("file_path", "caller", "line"), row)) for row in rows]
+
+    def imports_of(self, file_path):
+        rows = self._query(
+            "SELECT module, name, line FROM imports WHERE file_path = ? ORDER BY line",
+            (file_path,)
+        )
+        return [dict(zip(("module", "name", "line"), row)) for row in rows]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -6,7 +6,12 @@ search_code_schema = FunctionDeclaration(
     parameters=Schema(
         type=Type.OBJECT,
         properties={
-            "query": Schema(type=Type.STRING, description="The natural language search query.")
+            "query": Schema(type=Type.STRING, description="The natural language search query."),
+            "repo": Schema(
+                type=Type.STRING,
+                description="Optional repository namespace to search, a comma separated list, or '*' for all "
+                            "indexed repositories. Defaults to the current project."
+            )
         },
         required=["query"]
     )
@@ -63,10 +68,67 @@ list_directory_schema = FunctionDeclaration(
 
 get_code_structure_schema = FunctionDeclaration(
     name="get_code_structure",
-    description="Get a tree-like view of the project structure.",
+    description="Get a tree-like view of the project structure, with file counts per directory. "
+                "Deep directories are collapsed and large ones summarized by file extension; "
+                "pass path to expand one of them.",
+    parameters=Schema(
+        type=Type.OBJECT,
+        properties={
+            "path": Schema(type=Type.STRING, description="Optional directory to show, relative to the project root. Defaults to the root."),
+            "max_depth": Schema(type=Type.INTEGER, description="Optional number of directory levels to expand (default 3)."),
+            "max_entries": Schema(type=Type.INTEGER, description="Optional maximum number of lines to return (default 200).")
+        },
+    )
+)
+
+find_definition_schema = FunctionDeclaration(
+    name="find_definition",
+    description="Find where a function, method or class is defined, using the symbol index. Faster and more precise than search_code for a known name.",
     parameters=Schema(
         type=Type.OBJECT,
-        properties={},
+        properties={
+            "name": Schema(type=Type.STRING, description="The symbol name, e.g. 'run_agent' or 'Orchestrator.run'."),
+            "repo": Schema(
+                type=Type.STRING,
+                description="Optional repository namespace to search, a comma separated list, or '*' for all "
+                            "indexed repositories. Defaults to the current project."
+            )
+        },
+        required=["name"]
+    )
+)
+
+find_references_schema = FunctionDeclaration(
+    name="find_references",
+    description="List every place where an identifier is used, with the line of code, using the symbol index.",
+    parameters=Schema(
+        type=Type.OBJECT,
+        properties={
+            "name": Schema(type=Type.STRING, description="The identifier to look up."),
+            "repo": Schema(
+                type=Type.STRING,
+                description="Optional repository namespace to search, a comma separated list, or '*' for all "
+                            "indexed repositories. Defaults to the current project."
+            )
+        },
+        required=["name"]
+    )
+)
+
+callers_of_schema = FunctionDeclaration(
+    name="callers_of",
+    description="List the functions that call a given function or method, using the symbol index.",
+    parameters=Schema(
+        type=Type.OBJECT,
+        properties={
+            "name": Schema(type=Type.STRING, description="The name of the called function or method."),
+            "repo": Schema(
+                type=Type.STRING,
+                description="Optional repository namespace to search, a comma separated list, or '*' for all "
+                            "indexed repositories. Defaults to the current project."
+            )
+        },
+        required=["name"]
     )
 )
 
@@ -107,6 +169,9 @@ TOOL_SCHEMAS = {
     "run_command": run_command_schema,
     "list_directory": list_directory_schema,
     "get_code_structure": get_code_structure_schema,
+    "find_definition": find_definition_schema,
+    "find_references": find_references_schema,
+    "callers_of": callers_of_schema,
     "ask_user": ask_user_schema,
     "ask_orchestrator": ask_orchestrator_schema
 }
@@ -4,16 +4,29 @@ import shutil
 import datetime
 import shlex
 import config
-from agent import indexer, utils
+from agent import indexer, structure, utils
 
 ALLOWED_COMMANDS = ["pytest", "git", "python", "npm", "node", "make"]
+NON_INTERACTIVE_MESSAGE = ("Error: {action} needs confirmation from the user, but the agent runs without a "
+                           "terminal (server mode), so it was refused. Describe the change or command in your "
+                           "answer instead.")
 
-def search_code(query: str) -> str:
+def search_code(query: str, repo: str = None) -> str:
     try:
-        return indexer.search_code(query)
+        return indexer.search_code(query, repo=repo)
     except Exception as e:
         return f"Error searching code: {e}"
 
+def search_code_batch(queries: list) -> list:
+    """
+    Searches for several queries at once (one embedding request, one index query).
+    Not exposed to the model; used by the orchestrator to prefetch context.
+    """
+    try:
+        return indexer.search_code_batch(queries)
+    except Exception as e:
+        return [f"Error searching code: {e}"] * len(queries)
+
 def read_file(path: str) -> str:
     if not utils.is_path_safe(path):
         return f"Error: Path {path} is unsafe or outside project root."
@@ -32,6 +45,8 @@ def read_file(path: str) -> str:
 def write_file(path: str, content: str) -> str:
     if not utils.is_path_safe(path):
         return f"Error: Path {path} is unsafe or outside project root."
+    if not config.INTERACTIVE:
+        return NON_INTERACTIVE_MESSAGE.format(action=f"Writing {path}")
 
     # Preview content for user confirmation
     preview_lines = content.splitlines()[:10]
@@ -79,6 +94,8 @@ def run_command(command: str) -> str:
     exe = parts[0]
     if exe not in ALLOWED_COMMANDS:
         return f"Error: Command '{exe}' is not allowed. Allowed: {ALLOWED_COMMANDS}"
+    if not config.INTERACTIVE:
+        return NON_INTERACTIVE_MESSAGE.format(action=f"Running '{command}'")
 
     print(f"\n[CONFIRMATION REQUIRED] Agent wants to run command:")
     print(f"Command: {command}")
@@ -118,28 +135,60 @@ def list_directory(path: str) -> str:
     except Exception as e:
         return f"Error listing directory {path}: {e}"
 
-def get_code_structure() -> str:
-    root = utils.get_project_root()
-    output = []
-    for dirpath, dirnames, filenames in os.walk(root):
-        # Filter hidden dirs
-        dirnames[:] = [d for d in dirnames if not d.startswith('.') and d not in ['venv', '__pycache__', 'chroma_db', 'site-packages']]
-
-        rel_path = os.path.relpath(dirpath, root)
-        if rel_path == ".":
-            output.append(f"{os.path.basename(root)}/")
-        else:
-            indent = "  " * rel_path.count(os.sep)
-            output.append(f"{indent}{os.path.basename(dirpath)}/")
+def get_code_structure(path: str = None, max_depth: int = None, max_entries: int = None) -> str:
+    if path and not utils.is_path_safe(path):
+        return f"Error: Path {path} is unsafe or outside project root."
+    try:
+        return structure.code_structure(utils.get_project_root(), path, max_depth, max_entries)
+    except Exception as e:
+        return f"Error getting code structure: {e}"
 
-        indent = "  " * (rel_path.count(os.sep) + 1)
-        for f in filenames:
-            if f.endswith(('.py', '.js', '.ts', '.java', '.cpp', '.h', '.c', '.md', '.txt')):
-                output.append(f"{indent}{f}")
+def _lookup_symbols(repo, lookup):
+    """
+    Runs lookup(symbol_index) in every namespace repo selects (see
+    indexer.resolve_namespaces) and returns (prefix, item) pairs, where prefix
+    names the repository of the item when more than one is searched.
+    """
+    namespaces = indexer.resolve_namespaces(repo)
+    return [
+        (f"[{namespace}] " if len(namespaces) > 1 else "", item)
+        for namespace in namespaces
+        for item in lookup(indexer.get_symbol_index(namespace))
+    ]
+
+def find_definition(name: str, repo: str = None) -> str:
+    try:
+        definitions = _lookup_symbols(repo, lambda index: index.find_definition(name))
+    except Exception as e:
+        return f"Error looking up definition of {name}: {e}"
+    if not definitions:
+        return f"No definition of {name} found in the index."
+    return "\n".join(
+        f"{prefix}{d['file_path']}:{d['start_line'] + 1}-{d['end_line'] + 1} {d['kind']} {d['qualname']}"
+        for prefix, d in definitions
+    )
+
+def find_references(name: str, repo: str = None) -> str:
+    try:
+        references = _lookup_symbols(repo, lambda index: index.find_references(name))
+    except Exception as e:
+        return f"Error looking up references to {name}: {e}"
+    if not references:
+        return f"No references to {name} found in the index."
+    return "\n".join(f"{prefix}{r['file_path']}:{r['line'] + 1}: {r['text']}" for prefix, r in references)
 
-    return "\n".join(output)
+def callers_of(name: str, repo: str = None) -> str:
+    try:
+        callers = _lookup_symbols(repo, lambda index: index.callers_of(name))
+    except Exception as e:
+        return f"Error looking up callers of {name}: {e}"
+    if not callers:
+        return f"No callers of {name} found in the index."
+    return "\n".join(f"{prefix}{c['caller']} ({c['file_path']}:{c['line'] + 1})" for prefix, c in callers)
 
 def ask_user(question: str) -> str:
+    if not config.INTERACTIVE:
+        return "The user cannot be asked questions in server mode; continue with your best judgement and state your assumptions."
     print(f"Agent asks: {question}")
     return input("Your answer: ")
 
@@ -159,6 +208,9 @@ TOOL_FUNCTIONS = {
     "run_command": run_command,
     "list_directory": list_directory,
     "get_code_structure": get_code_structure,
+    "find_definition": find_definition,
+    "find_references": find_references,
+    "callers_of": callers_of,
     "ask_user": ask_user,
     "ask_orchestrator": ask_orchestrator
 }
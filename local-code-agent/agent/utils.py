@@ -21,6 +21,14 @@ def is_path_safe(requested_path, base_dir=None):
     # Check if requested path is inside base_dir
     return os.path.commonpath([base_dir, requested_path]) == base_dir
 
+def estimate_tokens(text):
+    """
+    Cheap token estimate (roughly 4 characters per token) used for budgeting.
+    """
+    if not text:
+        return 0
+    return len(text) // 4 + 1
+
 def extract_json_from_text(text):
     """
     Robustly extracts JSON from text, handling markdown code blocks and mixed content.
@@ -0,0 +1,722 @@
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import threading
+import numpy as np
+import config
+
+"""
+Vector store backends.
+The indexer talks to a store through the small interface of VectorStore, which
+mirrors the part of a Chroma collection it uses: upsert, delete, query, count
+and flush. ChromaVectorStore wraps a Chroma collection. LocalVectorStore keeps
+vectors in memory-mapped .npy matrices with an IVF (inverted file) index for
+approximate top-k search, and chunk ids, documents and metadata in a columnar
+sidecar, so opening it only maps files and takes milliseconds. A sorted index
+of id hashes finds the row of an id without reading the ids column. Small updates go
+to an append-only delta segment and a tombstone mask instead of rewriting the
+store. Optionally it also keeps int8 or binary codes of the vectors: the first
+pass scores the codes and only a shortlist is rescored against the
+full-precision vectors on disk.
+"""
+
+DEFAULT_COLLECTION = "code_chunks"
+QUANTIZATIONS = ("none", "int8", "binary")
+# Number of set bits of every byte value, for Hamming distances on packed codes
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+# Rows copied at a time when the local store compacts its base segment
+COMPACT_BLOCK_ROWS = 65536
+
+class VectorStore:
+    def upsert(self, ids, documents, metadatas, embeddings):
+        raise NotImplementedError
+
+    def delete(self, ids):
+        raise NotImplementedError
+
+    def get(self, ids):
+        """
+        Returns a Chroma-style dict with the ids, documents and metadatas of the
+        given chunks that exist, in no particular order.
+        """
+        raise NotImplementedError
+
+    def query(self, query_embeddings, n_results=10):
+        """
+        Returns a Chroma-style dict of lists per query: ids, documents, metadatas
+        and distances (cosine distance for the local store).
+        """
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+    def flush(self):
+        """
+        Persists pending changes. Called once at the end of an indexing run.
+        """
+
+# One Chroma client per database directory, shared by the collections of all namespaces
+_chroma_clients = {}
+_chroma_clients_lock = threading.Lock()
+
+def _chroma_client(path):
+    with _chroma_clients_lock:
+        if path not in _chroma_clients:
+            import chromadb
+            _chroma_clients[path] = chromadb.PersistentClient(path=path)
+        return _chroma_clients[path]
+
+class ChromaVectorStore(VectorStore):
+    def __init__(self, path, name=DEFAULT_COLLECTION):
+        self.client = _chroma_client(path)
+        self.collection = self.client.get_or_create_collection(name=name)
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        self.collection.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+    def delete(self, ids):
+        self.collection.delete(ids=ids)
+
+    def get(self, ids):
+        return self.collection.get(ids=ids)
+
+    def query(self, query_embeddings, n_results=10):
+        return self.collection.query(query_embeddings=query_embeddings, n_results=n_results)
+
+    def count(self):
+        return self.collection.count()
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def quantize_int8(vectors):
+    """
+    Scalar-quantizes vectors to int8 with one scale per dimension.
+    Returns (codes, scale); codes * scale approximates the vectors.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scale = np.abs(vectors).max(axis=0) / 127.0 if len(vectors) else np.ones(vectors.shape[1], dtype=np.float32)
+    scale[scale == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scale), -127, 127).astype(np.int8)
+    return codes, scale.astype(np.float32)
+
+def quantize_binary(vectors):
+    """
+    Keeps the sign of every dimension, packed 8 dimensions per byte.
+    """
+    return np.packbits(np.asarray(vectors) > 0, axis=-1)
+
+def hash_ids(ids):
+    """
+    Stable 64-bit hashes of chunk ids, the keys of the local store's id index.
+    """
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(doc_id.encode("utf-8"), digest_size=8).digest(), "little") for doc_id in ids),
+        dtype=np.uint64
+    )
+
+def _write_npy(path, array):
+    tmp_path = f"{path}.tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+class StringColumn:
+    """
+    Strings stored as one UTF-8 blob plus an offsets array, both memory-mapped,
+    so reading a few rows does not load the whole column.
+    """
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def load(cls, prefix):
+        offsets = np.load(f"{prefix}.offsets.npy", mmap_mode="r")
+        if offsets[-1] == 0:
+            return cls(b"", offsets)
+        return cls(np.memmap(f"{prefix}.bin", dtype=np.uint8, mode="r"), offsets)
+
+    @staticmethod
+    def save(prefix, values):
+        # values may be any iterable; strings are written one by one
+        lengths = []
+        tmp_path = f"{prefix}.bin.tmp"
+        with open(tmp_path, "wb") as f:
+            for value in values:
+                encoded = value.encode("utf-8")
+                f.write(encoded)
+                lengths.append(len(encoded))
+        os.replace(tmp_path, f"{prefix}.bin")
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(lengths)
+        _write_npy(f"{prefix}.offsets.npy", offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    def to_list(self):
+        return [self[i] for i in range(len(self))]
+
+class MetadataColumns:
+    """
+    Columnar metadata: integer fields as int64 arrays, other fields dictionary
+    encoded (a list of distinct values plus an int32 code per row, -1 for missing).
+    """
+    def __init__(self, columns):
+        # key -> ("int", array) or ("dict", values, codes)
+        self.columns = columns
+
+    @classmethod
+    def load(cls, directory, schema):
+        columns = {}
+        for key, kind in schema.items():
+            path = os.path.join(directory, f"meta_{key}")
+            if kind == "int":
+                columns[key] = ("int", np.load(f"{path}.npy", mmap_mode="r"))
+            else:
+                with open(f"{path}.values.json", "r", encoding="utf-8") as f:
+                    values = json.load(f)
+                columns[key] = ("dict", values, np.load(f"{path}.codes.npy", mmap_mode="r"))
+        return cls(columns)
+
+    @staticmethod
+    def save(directory, rows):
+        """
+        Writes a list of metadata dicts and returns the schema {key: "int" | "dict"}.
+        """
+        keys = sorted({key for row in rows for key in row})
+        schema = {}
+        for key in keys:
+            path = os.path.join(directory, f"meta_{key}")
+            values = [row.get(key) for row in rows]
+            if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+                schema[key] = "int"
+                _write_npy(f"{path}.npy", np.array(values, dtype=np.int64))
+            else:
+                schema[key] = "dict"
+                distinct = {}
+                codes = np.array(
+                    [-1 if v is None else distinct.setdefault(v, len(distinct)) for v in values],
+                    dtype=np.int32
+                )
+                _write_json(f"{path}.values.json", list(distinct))
+                _write_npy(f"{path}.codes.npy", codes)
+        return schema
+
+    def row(self, i):
+        result = {}
+        for key, column in self.columns.items():
+            if column[0] == "int":
+                result[key] = int(column[1][i])
+            else:
+                code = int(column[2][i])
+                if code >= 0:
+                    result[key] = column[1][code]
+        return result
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store.
+    On disk: header.json, which names the current generation, and one directory
+    per generation (gen-<n>) holding a base segment of vectors.npy (float32 or float16,
+    L2-normalized rows), ids/documents as StringColumns, metadata as MetadataColumns
+    the IVF index over those rows (centroids, row ids grouped by list, list
+    offsets) and the id index (id hashes in sorted order and the row of each,
+    looked up by binary search), all memory-mapped on open and never written in place. Rows added
+    since the base was written live in a small delta segment (delta-<v>.json and
+    delta-<v>.npy) that is searched exhaustively, and deleted or replaced rows
+    of either segment are marked in a tombstone mask (tombstones-<v>.npy). flush()
+    only writes a new version of the delta and the mask until they hold more than
+    a tenth of the store; then it compacts everything into the base of a new
+    generation and rebuilds the IVF index. Either way the new files are complete
+    before os.replace swaps in a header naming them, so an interrupted flush
+    leaves the previous state readable.
+    With quantization "int8" or "binary", the base also has codes.npy (4x or 32x
+    smaller than float32 vectors); searches score the codes and rerank the best
+    n_results * rerank_factor rows on the full-precision vectors.
+    """
+    def __init__(self, directory, dtype="float32", ivf_min_rows=20_000, nprobe=8,
+                 quantization="none", rerank_factor=4):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization} (expected one of {', '.join(QUANTIZATIONS)})")
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self.ivf_min_rows = ivf_min_rows
+        self.nprobe = nprobe
+        self.quantization = quantization
+        self.rerank_factor = rerank_factor
+        self._lock = threading.RLock()
+        self._load()
+
+    def _generation_dir(self, generation):
+        return os.path.join(self.directory, f"gen-{generation}")
+
+    def _path(self, name, generation=None):
+        """
+        Path of a file of the given generation, by default the open one.
+        """
+        return os.path.join(self._generation_dir(self._generation if generation is None else generation), name)
+
+    def _load(self):
+        self._header = None
+        self._generation = 0
+        self._dirty = False
+        # Live delta row of each id in the delta; base rows are found by _base_rows
+        self._delta_row_of = {}
+        self._deleted = set()
+        self._vectors = None
+        self._ids = StringColumn(b"", np.zeros(1, dtype=np.int64))
+        self._documents = self._ids
+        self._meta_columns = None
+        self._id_hashes = np.zeros(0, dtype=np.uint64)
+        self._id_rows = np.zeros(0, dtype=np.int64)
+        self._centroids = None
+        self._ivf_rows = None
+        self._ivf_offsets = None
+        self._ivf_size = 0
+        self._codes = None
+        self._codes_kind = "none"
+        self._scale = None
+        self._delta_ids = []
+        self._delta_documents = []
+        self._delta_metadatas = []
+        # Delta vectors as a list of blocks, concatenated on the first search
+        self._delta_vectors = []
+
+        header_path = os.path.join(self.directory, "header.json")
+        if not os.path.exists(header_path):
+            return
+
+        with open(header_path, "r", encoding="utf-8") as f:
+            header = json.load(f)
+        self._header = header
+        self._generation = header["generation"]
+        self._vectors = np.load(self._path("vectors.npy"), mmap_mode="r") if header["count"] else None
+        self._ids = StringColumn.load(self._path("ids"))
+        self._documents = StringColumn.load(self._path("documents"))
+        self._meta_columns = MetadataColumns.load(self._generation_dir(self._generation), header["metadata_schema"])
+        self._id_hashes = np.load(self._path("id_hashes.npy"), mmap_mode="r")
+        self._id_rows = np.load(self._path("id_rows.npy"), mmap_mode="r")
+        if header.get("ivf_size"):
+            self._centroids = np.load(self._path("ivf_centroids.npy"), mmap_mode="r")
+            self._ivf_rows = np.load(self._path("ivf_rows.npy"), mmap_mode="r")
+            self._ivf_offsets = np.load(self._path("ivf_offsets.npy"), mmap_mode="r")
+            self._ivf_size = header["ivf_size"]
+        if header.get("quantization", "none") != "none" and header["count"]:
+            self._codes_kind = header["quantization"]
+            self._codes = np.load(self._path("codes.npy"), mmap_mode="r")
+            if self._codes_kind == "int8":
+                self._scale = np.load(self._path("codes_scale.npy"))
+
+        version = header["delta_version"]
+        if header["delta_count"]:
+            with open(self._path(f"delta-{version}.json"), "r", encoding="utf-8") as f:
+                delta = json.load(f)
+            self._delta_ids = delta["ids"]
+            self._delta_documents = delta["documents"]
+            self._delta_metadatas = delta["metadatas"]
+            self._delta_vectors = [np.load(self._path(f"delta-{version}.npy"))]
+        if header["deleted"]:
+            mask = np.load(self._path(f"tombstones-{version}.npy"))
+            self._deleted = set(np.flatnonzero(mask).tolist())
+        base = len(self._ids)
+        self._delta_row_of = {doc_id: base + i for i, doc_id in enumerate(self._delta_ids)
+                              if base + i not in self._deleted}
+
+    def _delta(self):
+        if len(self._delta_vectors) > 1:
+            self._delta_vectors = [np.concatenate(self._delta_vectors)]
+        return self._delta_vectors[0] if self._delta_vectors else None
+
+    def _base_rows(self, ids):
+        """
+        Returns the base row of each id, or -1, from a binary search of the id
+        index. Rows whose hash matches are checked against the ids column.
+        """
+        hashes = hash_ids(ids)
+        positions = np.searchsorted(self._id_hashes, hashes)
+        rows = []
+        for doc_id, key, position in zip(ids, hashes, positions.tolist()):
+            row = -1
+            while position < len(self._id_hashes) and self._id_hashes[position] == key:
+                candidate = int(self._id_rows[position])
+                if self._ids[candidate] == doc_id:
+                    row = candidate
+                    break
+                position += 1
+            rows.append(row)
+        return rows
+
+    def _rows(self, ids):
+        """
+        Returns {id: live row} for the given ids that exist.
+        """
+        found = {}
+        pending = []
+        for doc_id in ids:
+            row = self._delta_row_of.get(doc_id)
+            if row is not None:
+                found[doc_id] = row
+            else:
+                pending.append(doc_id)
+        if pending and len(self._id_hashes):
+            for doc_id, row in zip(pending, self._base_rows(pending)):
+                if row >= 0 and row not in self._deleted:
+                    found[doc_id] = row
+        return found
+
+    def _id(self, row):
+        base = len(self._ids)
+        return self._ids[row] if row < base else self._delta_ids[row - base]
+
+    def _document(self, row):
+        base = len(self._ids)
+        return self._documents[row] if row < base else self._delta_documents[row - base]
+
+    def _metadata(self, row):
+        base = len(self._ids)
+        return self._meta_columns.row(row) if row < base else self._delta_metadatas[row - base]
+
+    def count(self):
+        with self._lock:
+            return len(self._ids) + len(self._delta_ids) - len(self._deleted)
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        vectors = _normalize(embeddings).astype(self.dtype)
+        with self._lock:
+            rows = self._rows(ids)
+            total = len(self._ids) + len(self._delta_ids)
+            for offset, doc_id in enumerate(ids):
+                row = rows.get(doc_id)
+                if row is not None:
+                    # The old version is tombstoned rather than overwritten, so the
+                    # memory-mapped base and its IVF lists stay valid
+                    self._deleted.add(row)
+                rows[doc_id] = self._delta_row_of[doc_id] = total + offset
+            self._delta_ids.extend(ids)
+            self._delta_documents.extend(documents)
+            self._delta_metadatas.extend(dict(metadata) for metadata in metadatas)
+            self._delta_vectors.append(vectors)
+            self._dirty = True
+
+    def delete(self, ids):
+        with self._lock:
+            for doc_id, row in self._rows(ids).items():
+                self._delta_row_of.pop(doc_id, None)
+                self._deleted.add(row)
+                self._dirty = True
+
+    def get(self, ids):
+        with self._lock:
+            found = list(self._rows(ids).values())
+            return {
+                "ids": [self._id(r) for r in found],
+                "documents": [self._document(r) for r in found],
+                "metadatas": [self._metadata(r) for r in found],
+            }
+
+    def _candidates(self, query):
+        """
+        Base rows to score for one normalized query: the rows of the nprobe
+        nearest IVF lists, or None for all of them.
+        """
+        if self._centroids is None:
+            return None
+        lists = np.argsort(-(np.asarray(self._centroids) @ query))[:self.nprobe]
+        parts = [self._ivf_rows[self._ivf_offsets[l]:self._ivf_offsets[l + 1]] for l in lists]
+        if self._ivf_size < len(self._vectors):
+            parts.append(np.arange(self._ivf_size, len(self._vectors)))
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def _approximate_scores(self, rows, query):
+        if self._codes_kind == "int8":
+            # codes * scale . query == codes . (scale * query)
+            return np.asarray(self._codes[rows], dtype=np.float32) @ (self._scale * query)
+        # Binary: fewer differing sign bits means a closer vector
+        bits = quantize_binary(query)
+        return -POPCOUNT[np.bitwise_xor(self._codes[rows], bits)].sum(axis=1, dtype=np.int32)
+
+    def _score_base(self, query, n_results):
+        if self._vectors is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        base = len(self._vectors)
+        candidates = self._candidates(query)
+        deleted = np.fromiter((r for r in self._deleted if r < base), dtype=np.int64)
+        if len(deleted):
+            if candidates is None:
+                candidates = np.arange(base)
+            candidates = candidates[~np.isin(candidates, deleted)]
+
+        shortlist = n_results * self.rerank_factor
+        if self._codes is not None:
+            if candidates is None:
+                candidates = np.arange(base)
+            if len(candidates) > shortlist:
+                approximate = self._approximate_scores(candidates, query)
+                top = np.argpartition(-approximate, shortlist - 1)[:shortlist]
+                # Sorted rows read the memory-mapped full vectors in file order
+                candidates = np.sort(candidates[top])
+
+        if candidates is None:
+            return np.arange(base), np.asarray(self._vectors, dtype=np.float32) @ query
+        return candidates, np.asarray(self._vectors[candidates], dtype=np.float32) @ query
+
+    def _live_delta_rows(self):
+        base = len(self._ids)
+        return np.array([i for i in range(len(self._delta_ids)) if base + i not in self._deleted], dtype=np.int64)
+
+    def _search(self, query, n_results):
+        rows, scores = self._score_base(query, n_results)
+        delta = self._delta()
+        if delta is not None:
+            live = self._live_delta_rows()
+            rows = np.concatenate([rows, live + len(self._ids)])
+            scores = np.concatenate([scores, np.asarray(delta[live], dtype=np.float32) @ query])
+        if not len(scores):
+            return [], []
+        k = min(n_results, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return rows[top].tolist(), (1.0 - scores[top]).tolist()
+
+    def _live_vectors(self):
+        """
+        Returns (rows, float32 vectors) of every live row.
+        """
+        base = len(self._ids)
+        rows = np.array([r for r in range(base) if r not in self._deleted], dtype=np.int64)
+        vectors = [np.asarray(self._vectors[rows], dtype=np.float32)] if len(rows) else []
+        delta = self._delta()
+        if delta is not None:
+            live = self._live_delta_rows()
+            rows = np.concatenate([rows, live + base])
+            vectors.append(np.asarray(delta[live], dtype=np.float32))
+        return rows, np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    def query(self, query_embeddings, n_results=10):
+        queries = _normalize(query_embeddings)
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        with self._lock:
+            for query in queries:
+                rows, distances = self._search(query, n_results)
+                result["ids"].append([self._id(r) for r in rows])
+                result["documents"].append([self._document(r) for r in rows])
+                result["metadatas"].append([self._metadata(r) for r in rows])
+                result["distances"].append(distances)
+        return result
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            base = len(self._ids)
+            live = base + len(self._delta_ids) - len(self._deleted)
+            # Delta rows are searched exhaustively and tombstoned base rows still sit in
+            # the IVF lists. Compact once they are a tenth of the store, or as soon as
+            # the store is large enough for its first IVF build.
+            tail = len(self._delta_ids) + sum(1 for r in self._deleted if r < base)
+            compact = (self._header is None or tail > live // 10
+                       or (live >= self.ivf_min_rows and not self._ivf_size))
+            os.makedirs(self.directory, exist_ok=True)
+            if compact:
+                self._compact()
+            else:
+                self._write_delta()
+            self._load()
+
+    def _write_header(self, header):
+        # The single atomic step of a flush: files the header does not name are ignored
+        _write_json(os.path.join(self.directory, "header.json"), header)
+
+    def _write_delta(self):
+        previous = self._header["delta_version"]
+        version = previous + 1
+        delta = self._delta()
+        _write_json(self._path(f"delta-{version}.json"), {
+            "ids": self._delta_ids,
+            "documents": self._delta_documents,
+            "metadatas": self._delta_metadatas,
+        })
+        if delta is not None:
+            _write_npy(self._path(f"delta-{version}.npy"), delta)
+        mask = np.zeros(len(self._ids) + len(self._delta_ids), dtype=bool)
+        mask[np.fromiter(self._deleted, dtype=np.int64)] = True
+        _write_npy(self._path(f"tombstones-{version}.npy"), mask)
+        self._write_header(dict(
+            self._header, delta_version=version, delta_count=len(self._delta_ids), deleted=len(self._deleted)
+        ))
+        for name in (f"delta-{previous}.json", f"delta-{previous}.npy", f"tombstones-{previous}.npy"):
+            if os.path.exists(self._path(name)):
+                os.remove(self._path(name))
+
+    def _compact(self):
+        """
+        Writes the live rows as the base of a new generation, then swaps it in.
+        """
+        generation = self._generation + 1
+        target = self._generation_dir(generation)
+        # Left over by an interrupted compaction; the header never named it
+        shutil.rmtree(target, ignore_errors=True)
+        os.makedirs(target)
+
+        def path(name):
+            return os.path.join(target, name)
+
+        base = len(self._ids)
+        base_rows = np.array([r for r in range(base) if r not in self._deleted], dtype=np.int64)
+        delta_rows = self._live_delta_rows()
+        delta = self._delta()
+        count = len(base_rows) + len(delta_rows)
+
+        StringColumn.save(path("ids"), itertools.chain(
+            (self._ids[r] for r in base_rows), (self._delta_ids[i] for i in delta_rows)))
+        StringColumn.save(path("documents"), itertools.chain(
+            (self._documents[r] for r in base_rows), (self._delta_documents[i] for i in delta_rows)))
+        schema = MetadataColumns.save(target, [self._meta_columns.row(r) for r in base_rows]
+                                      + [self._delta_metadatas[i] for i in delta_rows])
+        ids = StringColumn.load(path("ids"))
+        hashes = hash_ids(ids[i] for i in range(len(ids)))
+        order = np.argsort(hashes, kind="stable")
+        _write_npy(path("id_hashes.npy"), hashes[order])
+        _write_npy(path("id_rows.npy"), order.astype(np.int64))
+
+        vectors = None
+        if count:
+            dim = self._vectors.shape[1] if self._vectors is not None else delta.shape[1]
+            # Copied block by block so the old base is never loaded into memory as a whole
+            out = np.lib.format.open_memmap(path("vectors.npy"), mode="w+", dtype=self.dtype, shape=(count, dim))
+            for start in range(0, len(base_rows), COMPACT_BLOCK_ROWS):
+                block = base_rows[start:start + COMPACT_BLOCK_ROWS]
+                out[start:start + len(block)] = self._vectors[block]
+            if len(delta_rows):
+                out[len(base_rows):] = delta[delta_rows]
+            out.flush()
+            del out
+            vectors = np.load(path("vectors.npy"), mmap_mode="r")
+
+        ivf_size = 0
+        if count >= self.ivf_min_rows:
+            centroids, rows, offsets = build_ivf(vectors)
+            _write_npy(path("ivf_centroids.npy"), centroids)
+            _write_npy(path("ivf_rows.npy"), rows)
+            _write_npy(path("ivf_offsets.npy"), offsets)
+            ivf_size = count
+        quantization = self.quantization if count else "none"
+        if quantization == "int8":
+            codes, scale = quantize_int8(vectors)
+            _write_npy(path("codes.npy"), codes)
+            _write_npy(path("codes_scale.npy"), scale)
+        elif quantization == "binary":
+            _write_npy(path("codes.npy"), quantize_binary(vectors))
+        self._write_header({
+            "version": 2,
+            "generation": generation,
+            "count": count,
+            "dtype": self.dtype.name,
+            "metadata_schema": schema,
+            "ivf_size": ivf_size,
+            "quantization": quantization,
+            "delta_version": 0,
+            "delta_count": 0,
+            "deleted": 0,
+        })
+        # Old generations stay readable through open memory maps on POSIX; elsewhere
+        # a directory still in use is left behind and removed by a later compaction
+        for name in os.listdir(self.directory):
+            if name.startswith("gen-") and name != f"gen-{generation}":
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def compression_ratio(self):
+        """
+        Size of float32 vectors relative to the codes used for the first pass
+        (1.0 without quantization).
+        """
+        with self._lock:
+            if self._codes is None or not len(self._codes):
+                return 1.0
+            return self._vectors.shape[0] * self._vectors.shape[1] * 4 / self._codes.nbytes
+
+def measure_recall(store, query_embeddings, n_results=10):
+    """
+    Compares store.query with an exhaustive search over the store's full-precision
+    vectors and returns the mean recall@n_results and the compression ratio.
+    Use it to choose quantization, nprobe and rerank_factor for a codebase, e.g.
+    with held-out chunk embeddings as queries.
+    """
+    queries = _normalize(query_embeddings)
+    approximate = store.query(query_embeddings=queries.tolist(), n_results=n_results)["ids"]
+    with store._lock:
+        live, vectors = store._live_vectors()
+        found = 0
+        expected = 0
+        for query, result in zip(queries, approximate):
+            exact = live[np.argsort(-(vectors @ query))[:n_results]] if len(live) else []
+            exact_ids = {store._id(i) for i in exact}
+            found += len(exact_ids & set(result))
+            expected += len(exact_ids)
+    return {
+        "recall": found / expected if expected else 1.0,
+        "compression": store.compression_ratio(),
+    }
+
+def build_ivf(vectors, n_lists=None, iterations=10, sample_size=64, seed=0):
+    """
+    Clusters normalized vectors with spherical k-means and returns
+    (centroids, row ids sorted by list, list offsets).
+    """
+    count = len(vectors)
+    if n_lists is None:
+        n_lists = int(min(4096, max(1, np.sqrt(count))))
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(count, size=min(count, n_lists * sample_size), replace=False)]
+    sample = np.asarray(sample, dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)]
+
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for l in range(n_lists):
+            members = sample[assignment == l]
+            if len(members):
+                centroids[l] = members.sum(axis=0)
+        centroids = _normalize(centroids)
+
+    # Assign all rows in blocks to bound the size of the similarity matrix
+    assignment = np.empty(count, dtype=np.int32)
+    for start in range(0, count, 65536):
+        block = np.asarray(vectors[start:start + 65536], dtype=np.float32)
+        assignment[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+    rows = np.argsort(assignment, kind="stable").astype(np.int64)
+    offsets = np.zeros(n_lists + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(assignment, minlength=n_lists))
+    return centroids, rows, offsets
+
+def open_vector_store(kind, path, name=DEFAULT_COLLECTION):
+    if kind == "chroma":
+        return ChromaVectorStore(path, name)
+    if kind == "local":
+        directory = os.path.join(path, "local_store") if name == DEFAULT_COLLECTION else os.path.join(path, "local_stores", name)
+        return LocalVectorStore(
+            directory,
+            dtype=config.LOCAL_VECTOR_DTYPE,
+            ivf_min_rows=config.LOCAL_VECTOR_IVF_MIN_ROWS,
+            nprobe=config.LOCAL_VECTOR_NPROBE,
+            quantization=config.LOCAL_VECTOR_QUANTIZATION,
+            rerank_factor=config.LOCAL_VECTOR_RERANK_FACTOR
+        )
+    raise ValueError(f"Unknown vector store: {kind} (expected 'chroma' or 'local')")
@@ -0,0 +1,298 @@
+import os
+import re
+import threading
+import config
+
+"""
+Directory walker shared by the indexer and the tools.
+Built on os.scandir; skips hidden and well-known dependency directories and
+honours .gitignore files (at every level), .git/info/exclude and the project
+ignore file (config.IGNORE_FILE, gitignore syntax, at the project root).
+Ignored directories are pruned, never listed. Directory listings, parsed ignore
+files and binary sniffing results are cached and revalidated by mtime, so
+repeated walks of an unchanged tree only stat directories.
+"""
+
+IGNORED_DIRS = ['venv', '__pycache__', 'chroma_db', 'site-packages', 'node_modules']
+# Ignore rules of the repository at the walk root that git keeps inside .git
+GIT_EXCLUDE_FILE = os.path.join(".git", "info", "exclude")
+
+_cache_lock = threading.Lock()
+_listings = {}
+_rule_files = {}
+_binary_files = {}
+
+def is_ignored_dir(name):
+    # Ignore hidden directories, virtualenvs and installed dependencies
+    return name.startswith('.') or name in IGNORED_DIRS
+
+def _translate(pattern):
+    """
+    Converts a gitignore glob to a regular expression matching relative paths.
+    """
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern[i:i + 3] == "**/":
+                # Zero or more directories
+                out.append("(?:.*/)?")
+                i += 3
+                continue
+            if pattern[i:i + 2] == "**":
+                out.append(".*")
+                i += 2
+                continue
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end].replace("\\", "\\\\")
+                if body[0] in "!^":
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end + 1
+                continue
+        elif c == "\\" and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+            continue
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+def parse_ignore_lines(lines):
+    """
+    Parses gitignore lines into (regex, negated, directory_only) rules.
+    """
+    rules = []
+    for line in lines:
+        line = line.rstrip("\n").rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negated = line.startswith("!")
+        if negated:
+            line = line[1:]
+        directory_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        # A slash anywhere but at the end anchors the pattern to the ignore file's directory
+        anchored = "/" in line
+        pattern = _translate(line.lstrip("/"))
+        if not anchored:
+            pattern = "(?:.*/)?" + pattern
+        rules.append((re.compile(pattern + r"\Z"), negated, directory_only))
+    return rules
+
+def _read_rules(path):
+    """
+    Returns the parsed rules of an ignore file, or [] if it does not exist.
+    Cached until the file's mtime or size changes.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return []
+    key = (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        cached = _rule_files.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            rules = parse_ignore_lines(f)
+    except OSError:
+        return []
+    with _cache_lock:
+        _rule_files[path] = (key, rules)
+    return rules
+
+def _list_dir(path):
+    """
+    Returns sorted (name, is_dir) entries of a directory. The listing is cached
+    and reused while the directory's mtime is unchanged.
+    """
+    mtime = os.stat(path).st_mtime_ns
+    with _cache_lock:
+        cached = _listings.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                # Symlinked directories are not followed, as with os.walk
+                if entry.is_dir(follow_symlinks=False):
+                    entries.append((entry.name, True))
+                elif entry.is_file():
+                    entries.append((entry.name, False))
+            except OSError:
+                continue
+    entries.sort()
+    with _cache_lock:
+        _listings[path] = (mtime, entries)
+    return entries
+
+def looks_binary(data):
+    return b"\0" in data[:config.BINARY_SNIFF_BYTES]
+
+def is_binary(path):
+    """
+    Sniffs the start of a file for NUL bytes. Cached by mtime and size.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    key = (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        cached = _binary_files.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    try:
+        with open(path, "rb") as f:
+            result = looks_binary(f.read(config.BINARY_SNIFF_BYTES))
+    except OSError:
+        return False
+    with _cache_lock:
+        _binary_files[path] = (key, result)
+    return result
+
+def clear_cache():
+    with _cache_lock:
+        _listings.clear()
+        _rule_files.clear()
+        _binary_files.clear()
+
+class Walker:
+    """
+    Walks the tree under root. Rules from an ignore file in directory d apply to
+    paths below d; later (deeper) rules take precedence, and `!pattern` re-includes.
+    """
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def _relative(self, path):
+        relative = os.path.relpath(os.path.abspath(path), self.root)
+        if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+            return None
+        return "" if relative == os.curdir else relative.replace(os.sep, "/")
+
+    def _root_rules(self):
+        rules = []
+        for name in (GIT_EXCLUDE_FILE, ".gitignore", config.IGNORE_FILE):
+            rules.extend(("", rule) for rule in _read_rules(os.path.join(self.root, name)))
+        return rules
+
+    def _dir_rules(self, relative):
+        path = os.path.join(self.root, relative, ".gitignore")
+        return [(relative, rule) for rule in _read_rules(path)]
+
+    def _matches(self, rules, relative, is_dir):
+        if is_dir and is_ignored_dir(relative.rsplit("/", 1)[-1]):
+            return True
+        ignored = False
+        for base, (regex, negated, directory_only) in rules:
+            if directory_only and not is_dir:
+                continue
+            if base:
+                if not relative.startswith(base + "/"):
+                    continue
+                target = relative[len(base) + 1:]
+            else:
+                target = relative
+            if regex.match(target):
+                ignored = not negated
+        return ignored
+
+    def _rules_for(self, relative):
+        """
+        Returns the rules that apply inside the directory at relative, or None if
+        the directory itself (or one of its parents) is ignored.
+        """
+        rules = self._root_rules()
+        if not relative:
+            return rules
+        parts = relative.split("/")
+        for i in range(len(parts)):
+            current = "/".join(parts[:i + 1])
+            if self._matches(rules, current, True):
+                return None
+            rules = rules + self._dir_rules(current)
+        return rules
+
+    def is_ignored(self, path):
+        """
+        Returns True if path is outside root or would be skipped by walk().
+        """
+        relative = self._relative(path)
+        if relative is None:
+            return True
+        if not relative:
+            return False
+        parent, _, name = relative.rpartition("/")
+        rules = self._rules_for(parent)
+        return rules is None or self._matches(rules, relative, os.path.isdir(path))
+
+    def walk(self, directory=None):
+        """
+        Yields (dirpath, dirnames, filenames) top-down like os.walk, without
+        ignored entries. Removing names from dirnames prunes the walk.
+        """
+        directory = os.path.abspath(directory or self.root)
+        relative = self._relative(directory)
+        rules = None if relative is None else self._rules_for(relative)
+        if rules is None or not os.path.isdir(directory):
+            return
+        stack = [(directory, relative, rules)]
+        while stack:
+            dirpath, relative, rules = stack.pop()
+            try:
+                entries = _list_dir(dirpath)
+            except OSError:
+                continue
+            dirnames = []
+            filenames = []
+            for name, is_dir in entries:
+                child = f"{relative}/{name}" if relative else name
+                if not self._matches(rules, child, is_dir):
+                    (dirnames if is_dir else filenames).append(name)
+            yield dirpath, dirnames, filenames
+            for name in reversed(dirnames):
+                child = f"{relative}/{name}" if relative else name
+                stack.append((os.path.join(dirpath, name), child, rules + self._dir_rules(child)))
+
+    def files(self, directory=None, extensions=None, skip_binary=True):
+        """
+        Yields the paths of files under directory (default: root) that are not
+        ignored, optionally limited to extensions, skipping binary files.
+        """
+        for dirpath, _, filenames in self.walk(directory):
+            for name in filenames:
+                if extensions and not name.endswith(extensions):
+                    continue
+                path = os.path.join(dirpath, name)
+                if skip_binary and is_binary(path):
+                    continue
+                yield path
+
+def is_ignore_file(path):
+    """
+    Returns True for files whose change alters what the walker yields.
+    """
+    return os.path.basename(path) in (".gitignore", config.IGNORE_FILE) or path.endswith(os.sep + GIT_EXCLUDE_FILE)
+
+def ignore_file_scope(path):
+    """
+    Returns the directory whose tree the rules of an ignore file apply to.
+    """
+    if path.endswith(os.sep + GIT_EXCLUDE_FILE):
+        return path[:-len(os.sep + GIT_EXCLUDE_FILE)]
+    return os.path.dirname(path)
@@ -0,0 +1,268 @@
+import ctypes
+import ctypes.util
+import errno
+import itertools
+import os
+import select
+import struct
+import sys
+import threading
+import time
+import config
+from agent.walker import GIT_EXCLUDE_FILE, Walker, is_ignore_file
+
+"""
+Keeps the code index live while files change.
+A watcher reports changed paths: InotifyWatcher uses Linux inotify through
+ctypes (no extra dependency), PollingWatcher compares mtimes and sizes and is
+used elsewhere or when inotify is unavailable. A Debouncer groups bursts of
+events (an editor save, a `git checkout`) and each group is handed to
+index_codebase(paths=...), which re-chunks and re-embeds only those files and
+deletes the chunks of files that vanished.
+"""
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+class InotifyWatcher:
+    """
+    Watches a directory tree with one inotify watch per directory, skipping
+    what the shared Walker skips. Directories created later are watched as they
+    appear; ignore(path) filters their events. .git/info is watched too, for
+    changes of the exclude file.
+    """
+    def __init__(self, root, ignore=None):
+        self.root = os.path.abspath(root)
+        self.ignore = ignore or (lambda path: False)
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, f"inotify_init1 failed: {os.strerror(code)}")
+        self._dirs = {}
+        self._walker = Walker(self.root)
+        self._add_tree(self.root)
+        self._git_info = os.path.dirname(os.path.join(self.root, GIT_EXCLUDE_FILE))
+        if os.path.isdir(self._git_info):
+            self._add_watch(self._git_info)
+
+    def _add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            code = ctypes.get_errno()
+            if code == errno.ENOSPC:
+                print(f"Warning: Out of inotify watches, {path} is not watched "
+                      "(raise fs.inotify.max_user_watches)")
+            return
+        self._dirs[wd] = path
+
+    def _add_tree(self, path):
+        for dirpath, _, _ in self._walker.walk(path):
+            self._add_watch(dirpath)
+
+    def _read(self):
+        chunks = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            chunks.append(data)
+        return b"".join(chunks)
+
+    def poll(self, timeout):
+        """
+        Waits up to timeout seconds and returns the set of changed paths.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        data = self._read()
+        changed = set()
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped: report the root so the whole tree is rescanned
+                changed.add(self.root)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self._dirs[wd]
+                continue
+            path = os.path.join(directory, os.fsdecode(name)) if name else directory
+            if directory == self._git_info and not is_ignore_file(path):
+                continue
+            if mask & IN_ISDIR and self.ignore(path):
+                continue
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_tree(path)
+            changed.add(path)
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+class PollingWatcher:
+    """
+    Rescans list_files(root) and .git/info/exclude every `interval` seconds and
+    reports files whose mtime or size changed, that appeared or that disappeared.
+    """
+    def __init__(self, root, list_files, interval=1.0):
+        self.root = os.path.abspath(root)
+        self.list_files = list_files
+        self.interval = interval
+        self._snapshot = self._scan()
+        self._next_scan = time.monotonic() + interval
+
+    def _scan(self):
+        snapshot = {}
+        for path in itertools.chain(self.list_files(self.root), [os.path.join(self.root, GIT_EXCLUDE_FILE)]):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def poll(self, timeout):
+        wait = self._next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(0.0, wait))
+        self._next_scan = time.monotonic() + self.interval
+
+        snapshot = self._scan()
+        changed = {p for p in snapshot.keys() | self._snapshot.keys() if snapshot.get(p) != self._snapshot.get(p)}
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+class Debouncer:
+    """
+    Collects changed paths until no change arrived for `quiet` seconds, or until
+    `max_delay` seconds after the first one so a long burst is still indexed.
+    """
+    def __init__(self, quiet, max_delay, clock=time.monotonic):
+        self.quiet = quiet
+        self.max_delay = max_delay
+        self.clock = clock
+        self.pending = set()
+        self._first = None
+        self._last = None
+
+    def add(self, paths):
+        if not paths:
+            return
+        now = self.clock()
+        if not self.pending:
+            self._first = now
+        self._last = now
+        self.pending.update(paths)
+
+    def ready(self):
+        if not self.pending:
+            return False
+        now = self.clock()
+        return now - self._last >= self.quiet or now - self._first >= self.max_delay
+
+    def drain(self):
+        paths = self.pending
+        self.pending = set()
+        return paths
+
+def open_watcher(root, polling=False):
+    """
+    Returns an InotifyWatcher on Linux, or a PollingWatcher if polling is requested
+    or inotify cannot be used.
+    """
+    from agent import indexer
+
+    root = os.path.abspath(root)
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, ignore=lambda path: indexer.is_ignored(path, root))
+        except (OSError, AttributeError) as e:
+            print(f"Warning: inotify unavailable ({e}), falling back to polling.")
+    return PollingWatcher(root, indexer.iter_source_files, interval=config.WATCH_POLL_INTERVAL)
+
+def watch(directory, namespace=None, stop_event=None, polling=False, on_update=None, watcher=None):
+    """
+    Updates the index of directory whenever files change, until stop_event is set
+    (or forever). on_update(stats) is called after each incremental update.
+    Paths of a failed update are kept and retried with exponential backoff.
+    The cached tree of get_code_structure is invalidated for the same paths.
+    """
+    from agent import indexer, structure
+
+    directory = os.path.abspath(directory)
+    if watcher is None:
+        watcher = open_watcher(directory, polling=polling)
+    debouncer = Debouncer(config.WATCH_DEBOUNCE, config.WATCH_MAX_DELAY)
+    failures = 0
+    retry_at = 0.0
+    print(f"Watching {directory} for changes ({type(watcher).__name__})...")
+    try:
+        while stop_event is None or not stop_event.is_set():
+            debouncer.add(watcher.poll(config.WATCH_DEBOUNCE / 2))
+            if not debouncer.ready() or time.monotonic() < retry_at:
+                continue
+            paths = debouncer.drain()
+            structure.invalidate(paths)
+            try:
+                stats = indexer.index_codebase(directory, namespace=namespace, paths=paths, workers=1)
+            except Exception as e:
+                # Keep the paths so they are indexed once the cause (e.g. the embedding API) recovers
+                failures += 1
+                delay = min(config.WATCH_RETRY_DELAY * 2 ** (failures - 1), config.WATCH_RETRY_MAX_DELAY)
+                print(f"Error updating the index for {len(paths)} changed path(s): {e}; retrying in {delay:.0f}s")
+                debouncer.add(paths)
+                retry_at = time.monotonic() + delay
+                continue
+            failures = 0
+            retry_at = 0.0
+            if on_update is not None:
+                on_update(stats)
+    finally:
+        watcher.close()
+
+def start_watching(directory, namespace=None, polling=False, on_update=None):
+    """
+    Runs watch() in a daemon thread. Returns (thread, stop_event). Changes made
+    after this returns are picked up.
+    """
+    stop_event = threading.Event()
+    watcher = open_watcher(directory, polling=polling)
+    thread = threading.Thread(
+        target=watch,
+        args=(directory,),
+        kwargs={"namespace": namespace, "stop_event": stop_event, "on_update": on_update, "watcher": watcher},
+        name="index-watcher",
+        daemon=True
+    )
+    thread.start()
+    return thread, stop_event
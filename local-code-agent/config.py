@@ -2,8 +2,126 @@ import os
 
 PROJECT_ROOT = os.environ.get("PROJECT_ROOT", os.path.abspath("."))
 CHROMA_PERSIST_DIR = "./chroma_db"
+# Other repositories served by the same process, as {namespace: project root}. PROJECT_ROOT
+# is the "default" namespace; every namespace has its own collection, manifest, lexical and
+# symbol index (under CHROMA_PERSIST_DIR/namespaces/<name>) but shares the embedding model.
+# Also read from INDEX_NAMESPACES="name=/path/to/repo,other=/path/to/other".
+INDEX_NAMESPACES = dict(
+    entry.strip().split("=", 1) for entry in os.environ.get("INDEX_NAMESPACES", "").split(",") if "=" in entry
+)
+# Vector store backend: "chroma" or "local" (memory-mapped matrices with an IVF
+# index, stored under CHROMA_PERSIST_DIR/local_store)
+VECTOR_STORE = os.environ.get("VECTOR_STORE", "chroma")
+# Storage type of local vectors ("float32" or "float16"); below LOCAL_VECTOR_IVF_MIN_ROWS
+# chunks the local store searches exhaustively, above it probes LOCAL_VECTOR_NPROBE IVF lists
+LOCAL_VECTOR_DTYPE = "float32"
+LOCAL_VECTOR_IVF_MIN_ROWS = 20_000
+LOCAL_VECTOR_NPROBE = 8
+# First-pass codes of the local store: "none", "int8" (4x smaller) or "binary" (32x
+# smaller). The best n_results * LOCAL_VECTOR_RERANK_FACTOR rows are rescored on the
+# full-precision vectors, which stay on disk.
+LOCAL_VECTOR_QUANTIZATION = os.environ.get("LOCAL_VECTOR_QUANTIZATION", "none")
+LOCAL_VECTOR_RERANK_FACTOR = 4
+INDEX_MANIFEST_PATH = os.path.join(CHROMA_PERSIST_DIR, "index_manifest.json")
 EMBEDDING_MODEL = "models/text-embedding-004"
+# In-memory LRU of query embeddings, so repeated searches in a session skip the embedding call
+QUERY_EMBEDDING_CACHE_SIZE = 256
+# BM25 index over identifiers, built alongside the vector index and fused with it at search time.
+# Only postings are stored; chunk texts are read back from the vector store.
+LEXICAL_INDEX_PATH = os.path.join(CHROMA_PERSIST_DIR, "lexical_index.sqlite3")
+# Definitions, references, imports and call edges extracted from the tree-sitter parse
+SYMBOL_INDEX_PATH = os.path.join(CHROMA_PERSIST_DIR, "symbols.sqlite3")
+# On-disk embedding cache keyed by (model, task type, text hash). Set to None to disable.
+EMBEDDING_CACHE_PATH = os.path.join(CHROMA_PERSIST_DIR, "embedding_cache.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = 500_000
 MAX_FILE_SIZE = 1 * 1024 * 1024  # 1MB
+# Project-level ignore file (gitignore syntax) read from the project root, in addition
+# to .gitignore files and .git/info/exclude
+IGNORE_FILE = os.environ.get("AGENT_IGNORE_FILE", ".agentignore")
+# Bytes read from a file to decide whether it is binary (a NUL byte means binary, as in git)
+BINARY_SNIFF_BYTES = 8000
+# get_code_structure: directories deeper than STRUCTURE_MAX_DEPTH are collapsed to a file
+# count, and a directory with more than STRUCTURE_DIR_FILE_LIMIT files is summarized by
+# extension. If the tree does not fit in STRUCTURE_MAX_ENTRIES lines the depth is reduced.
+STRUCTURE_MAX_DEPTH = 3
+STRUCTURE_MAX_ENTRIES = 200
+STRUCTURE_DIR_FILE_LIMIT = 25
+# Number of processes used to parse files while indexing (1 = parse in the main process)
+INDEX_WORKERS = int(os.environ.get("INDEX_WORKERS", "1"))
+# Threads embedding and upserting batches concurrently with parsing, and the
+# number of batches that may wait between two pipeline stages
+EMBED_WORKERS = int(os.environ.get("EMBED_WORKERS", "2"))
+UPSERT_WORKERS = int(os.environ.get("UPSERT_WORKERS", "1"))
+INDEX_QUEUE_SIZE = 8
+# Embedding batches are built across files and directories up to these limits
+# per request, then flushed; a partial batch is flushed after EMBED_BATCH_MAX_WAIT seconds.
+EMBED_BATCH_LIMITS = {
+    # batchEmbedContents accepts at most 100 texts per request
+    "gemini": {"max_items": 100, "max_tokens": 20_000},
+    # Local model: larger batches amortize per-call overhead, bounded by memory
+    "sentence_transformer": {"max_items": 256, "max_tokens": 64_000},
+}
+EMBED_BATCH_MAX_WAIT = 2.0
+# Watch mode (python -m agent.indexer <dir> --watch, python run.py --serve --watch): changes
+# are indexed once no event arrived for WATCH_DEBOUNCE seconds, or WATCH_MAX_DELAY seconds
+# after the first one during a long burst. The polling fallback rescans every WATCH_POLL_INTERVAL.
+# A failed update is retried after WATCH_RETRY_DELAY seconds, doubling up to WATCH_RETRY_MAX_DELAY.
+WATCH_DEBOUNCE = 0.5
+WATCH_MAX_DELAY = 5.0
+WATCH_POLL_INTERVAL = 1.0
+WATCH_RETRY_DELAY = 2.0
+WATCH_RETRY_MAX_DELAY = 60.0
+# Gemini embeddings go through an asyncio REST client with concurrency, rate
+# limits and retries. GEMINI_API_BASE_URL can point at a local fake server.
+GEMINI_EMBED_ASYNC = True
+GEMINI_API_BASE_URL = os.environ.get("GEMINI_API_BASE_URL", "https://generativelanguage.googleapis.com")
+GEMINI_EMBED_CONCURRENCY = 8
+GEMINI_EMBED_RPM = 1500
+GEMINI_EMBED_TPM = 1_000_000
+GEMINI_EMBED_MAX_RETRIES = 6
+
+# Maximum number of independent plan steps the orchestrator runs at the same time
+ORCHESTRATOR_MAX_WORKERS = 4
+# Search the index for every plan step in one batched call before running the plan
+ORCHESTRATOR_PREFETCH = True
+# Token budget for previous step results passed to a step, in total and per step
+CONTEXT_TOKEN_BUDGET = 8000
+CONTEXT_STEP_TOKEN_BUDGET = 3000
+# Token budget for each agent loop request: the system prompt and task message,
+# and the conversation history in what they leave. The most recent entries are
+# never shrunk to stubs, but no single tool result or message in the history is
+# sent with more than HISTORY_RESULT_MAX_TOKENS.
+HISTORY_TOKEN_BUDGET = 30000
+HISTORY_KEEP_RECENT = 4
+HISTORY_STUB_TOKENS = 64
+HISTORY_RESULT_MAX_TOKENS = 8000
+# Register each agent's static prompt prefix (system prompt, tool declarations and,
+# for the single agent, the initial search context) as Gemini cached content.
+# Prefixes below PROMPT_CACHE_MIN_TOKENS are sent in full; None uses the smallest
+# cached content the API accepts for GEMINI_MODEL (32,768 tokens for 1.5 models).
+# Cached models are re-created PROMPT_CACHE_REFRESH_MARGIN seconds before the ttl ends.
+PROMPT_CACHE_ENABLED = os.environ.get("PROMPT_CACHE", "0") == "1"
+PROMPT_CACHE_TTL = 3600
+PROMPT_CACHE_REFRESH_MARGIN = 60
+PROMPT_CACHE_MIN_TOKENS = None
+# Cache of model responses: "off", "record" (reuse cached responses, store new ones)
+# or "replay" (cached responses only, fully offline)
+RESPONSE_CACHE_MODE = os.environ.get("RESPONSE_CACHE", "off")
+RESPONSE_CACHE_DIR = os.environ.get("RESPONSE_CACHE_DIR", "./.agent_cache/responses")
+# Agent server (python run.py --serve): keeps the index and models loaded between queries.
+# It listens on the Unix socket SERVER_SOCKET, or on http://SERVER_HOST:SERVER_PORT when
+# SERVER_SOCKET is empty or the platform has no Unix sockets. Idle sessions expire after
+# SERVER_SESSION_TTL seconds.
+SERVER_SOCKET = os.environ.get("AGENT_SERVER_SOCKET", "./.agent_cache/agent.sock")
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = int(os.environ.get("AGENT_SERVER_PORT", "8765"))
+SERVER_SESSION_TTL = 3600
+# Whether tools may prompt on the terminal (write/command confirmations, ask_user).
+# The agent server turns this off: it has no terminal to ask on, so those tools
+# refuse with an explanation instead of blocking the session.
+INTERACTIVE = True
+# Maximum number of read-only tool calls from one model turn executed concurrently
+MAX_PARALLEL_TOOL_CALLS = 4
 
 _GEMINI_API_KEY = None
 
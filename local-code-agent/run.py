@@ -7,6 +7,17 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Local Code Agent")
     parser.add_argument("query", nargs="*", help="The query to ask the agent")
     parser.add_argument("--root", "-r", help="The root directory of the project to analyze", default=None)
+    parser.add_argument("--no-stream", action="store_true", help="Print the answer only once it is complete instead of streaming it")
+    parser.add_argument("--record", action="store_true", help="Reuse recorded model responses and record new ones")
+    parser.add_argument("--replay", action="store_true", help="Use only recorded model responses (offline); fail on anything not recorded")
+    parser.add_argument("--response-cache-dir", help="Directory of recorded model responses", default=None)
+    parser.add_argument("--warm-up", action="store_true", help="Load the index and models in the background while the query is being entered")
+    parser.add_argument("--serve", action="store_true", help="Run a server that keeps the index and models loaded and answers queries from --client")
+    parser.add_argument("--watch", action="store_true", help="With --serve, keep the index of the project up to date as files change")
+    parser.add_argument("--client", action="store_true", help="Send the query to a running server (see --serve)")
+    parser.add_argument("--session", help="Server session to continue (printed after each --client answer)", default=None)
+    parser.add_argument("--socket", help="Unix socket of the server (default: config.SERVER_SOCKET)", default=None)
+    parser.add_argument("--port", type=int, help="Use HTTP on this localhost port instead of a Unix socket", default=None)
 
     args = parser.parse_args()
 
@@ -19,6 +30,35 @@ if __name__ == "__main__":
         config.PROJECT_ROOT = project_root
         print(f"Project root set to: {config.PROJECT_ROOT}")
 
+    if args.record and args.replay:
+        print("Error: --record and --replay cannot be combined.")
+        sys.exit(1)
+    if args.record:
+        config.RESPONSE_CACHE_MODE = "record"
+    elif args.replay:
+        config.RESPONSE_CACHE_MODE = "replay"
+    if args.response_cache_dir:
+        config.RESPONSE_CACHE_DIR = args.response_cache_dir
+
+    if args.serve or args.client:
+        from agent.server import default_address
+        if args.port is not None:
+            address = {"host": config.SERVER_HOST, "port": args.port}
+        elif args.socket:
+            address = {"socket_path": args.socket}
+        else:
+            address = default_address()
+
+    if args.serve:
+        from agent.server import serve
+        serve(watch=args.watch, **address)
+        sys.exit(0)
+
+    if args.warm_up:
+        from agent import agents, indexer
+        agents.warm_up(background=True)
+        indexer.warm_up(background=True)
+
     if args.query:
         query = " ".join(args.query)
     else:
@@ -26,9 +66,29 @@ if __name__ == "__main__":
 
     print(f"Query: {query}")
 
+    if args.client:
+        from agent.server import AgentClient, ServerError
+        client = AgentClient(**address)
+        on_text = None if args.no_stream else (lambda text: print(text, end="", flush=True))
+        try:
+            result = client.query(query, session_id=args.session, on_text=on_text)
+        except ServerError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        except OSError as e:
+            print(f"Error: Could not reach the agent server ({e}). Start it with: python run.py --serve")
+            sys.exit(1)
+        if args.no_stream:
+            print("\n=== Agent Answer ===\n")
+            print(result["answer"])
+        print(f"\n(session {result['session_id']}, {result['elapsed']:.1f}s)")
+        sys.exit(0)
+
     from agent.orchestrator import Orchestrator
-    orchestrator = Orchestrator()
+    orchestrator = Orchestrator(stream=not args.no_stream)
     answer = orchestrator.run(query)
 
-    print("\n=== Agent Answer ===\n")
-    print(answer)
+    # When streaming, every step's answer has already been printed as it was generated
+    if args.no_stream:
+        print("\n=== Agent Answer ===\n")
+        print(answer)
@@ -0,0 +1,62 @@
+import os
+import sys
+
+"""
+Scoped replacement of modules in sys.modules for the test files.
+pytest imports every test file before it runs any test, so a mock assigned to
+sys.modules at import time leaks into every file imported after it (which then
+gets a MagicMock numpy, or an agent.tools bound to another file's mocks).
+ModuleMocks installs the mocks, with fresh imports of the project's modules,
+only while a test file imports the code under test (`with mocks:`) and again
+while its tests run (start() in setUpModule, stop() in tearDownModule).
+"""
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTS_DIR = os.path.join(PROJECT_ROOT, "tests")
+
+def is_project_module(module):
+    path = getattr(module, "__file__", None)
+    if not isinstance(path, str):
+        return False
+    path = os.path.abspath(path)
+    return path.startswith(PROJECT_ROOT + os.sep) and not path.startswith(TESTS_DIR + os.sep)
+
+class ModuleMocks:
+    def __init__(self, mocks):
+        self.mocks = dict(mocks)
+        # The mocks plus the project modules imported under them, captured on exit
+        self.modules = dict(self.mocks)
+        self._saved = None
+
+    def _scoped(self, name, module):
+        return name in self.mocks or is_project_module(module)
+
+    def _install(self, modules):
+        self._saved = dict(sys.modules)
+        for name, module in self._saved.items():
+            if self._scoped(name, module):
+                del sys.modules[name]
+        sys.modules.update(modules)
+
+    def _uninstall(self):
+        # Returns the scoped modules that were installed, and puts back the previous ones
+        installed = {name: module for name, module in sys.modules.items() if self._scoped(name, module)}
+        for name in installed:
+            del sys.modules[name]
+        for name, module in self._saved.items():
+            if self._scoped(name, module):
+                sys.modules[name] = module
+        return installed
+
+    def __enter__(self):
+        self._install(self.mocks)
+        return self
+
+    def __exit__(self, *exc):
+        self.modules = self._uninstall()
+
+    def start(self):
+        self._install(self.modules)
+
+    def stop(self):
+        self._uninstall()
@@ -28,10 +28,6 @@ mock_generativelanguage.Part = MockPart
 mock_generativelanguage.FunctionResponse = MockFunctionResponse
 mock_generativelanguage.Content = MockContent
 
-sys.modules["google"] = mock_google
-sys.modules["google.ai"] = mock_genai
-sys.modules["google.ai.generativelanguage"] = mock_generativelanguage
-
 # Add local-code-agent to path
 import os
 # Set dummy API key for testing
@@ -41,7 +37,24 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, '..'))
 sys.path.insert(0, project_root)
 
-from agent.execution import execute_agent_loop
+from module_mocks import ModuleMocks
+
+mocks = ModuleMocks({
+    "google": mock_google,
+    "google.ai": mock_genai,
+    "google.ai.generativelanguage": mock_generativelanguage,
+})
+with mocks:
+    from agent.execution import execute_agent_loop, run_tool_calls
+    from agent.history import HistoryPolicy
+
+def setUpModule():
+    mocks.start()
+
+def tearDownModule():
+    mocks.stop()
+import threading
+import time
 
 class TestExecuteAgentLoop(unittest.TestCase):
     def setUp(self):
@@ -144,5 +157,236 @@ class TestExecuteAgentLoop(unittest.TestCase):
 
         self.assertTrue("Error calling agent: API Error" in result)
 
+    def test_streaming_forwards_text_chunks(self):
+        chunks = [MagicMock(parts=[MockPart(text="Hel")]), MagicMock(parts=[MockPart(text="lo")])]
+        mock_response = MagicMock()
+        mock_response.__iter__.return_value = iter(chunks)
+        # After consumption the streamed response exposes the aggregated parts
+        mock_response.parts = [MockPart(text="Hello")]
+        mock_response.candidates = [MagicMock(content="Hello content")]
+        self.mock_response_fn.return_value = mock_response
+        streamed = []
+
+        result = execute_agent_loop(
+            self.mock_response_fn,
+            self.history,
+            self.mock_tool_executor,
+            max_iterations=1,
+            on_text=streamed.append
+        )
+
+        self.assertEqual(streamed, ["Hel", "lo"])
+        self.assertEqual(result, "Hello")
+
+    def test_streaming_detects_function_calls(self):
+        mock_fc = MagicMock()
+        mock_fc.name = "my_tool"
+        mock_fc.args = {"arg": "val"}
+        call_response = MagicMock()
+        call_response.__iter__.return_value = iter([MagicMock(parts=[MockPart(function_call=mock_fc)])])
+        call_response.parts = [MockPart(function_call=mock_fc)]
+        call_response.candidates = [MagicMock(content="Tool Call Content")]
+
+        text_response = MagicMock()
+        text_response.__iter__.return_value = iter([MagicMock(parts=[MockPart(text="Done")])])
+        text_response.parts = [MockPart(text="Done")]
+        text_response.candidates = [MagicMock(content="Done content")]
+
+        self.mock_response_fn.side_effect = [call_response, text_response]
+        self.mock_tool_executor.return_value = "Tool Output"
+        streamed = []
+
+        result = execute_agent_loop(
+            self.mock_response_fn,
+            self.history,
+            self.mock_tool_executor,
+            max_iterations=5,
+            on_text=streamed.append
+        )
+
+        self.assertEqual(result, "Done")
+        self.assertEqual(streamed, ["Done"])
+        self.mock_tool_executor.assert_called_with("my_tool", {"arg": "val"})
+
+    def test_all_function_calls_in_one_turn_are_executed(self):
+        fcs = []
+        for path in ["a.py", "b.py", "c.py"]:
+            fc = MagicMock()
+            fc.name = "read_file"
+            fc.args = {"path": path}
+            fcs.append(fc)
+        call_response = MagicMock()
+        call_response.parts = [MockPart(function_call=fc) for fc in fcs]
+        call_response.candidates = [MagicMock(content="Tool Calls Content")]
+
+        text_response = MagicMock()
+        text_response.parts = [MockPart(text="Done")]
+        text_response.candidates = [MagicMock(content="Done content")]
+
+        self.mock_response_fn.side_effect = [call_response, text_response]
+        self.mock_tool_executor.side_effect = lambda name, args: f"content of {args['path']}"
+
+        result = execute_agent_loop(
+            self.mock_response_fn,
+            self.history,
+            self.mock_tool_executor,
+            max_iterations=5
+        )
+
+        self.assertEqual(result, "Done")
+        self.assertEqual(self.mock_tool_executor.call_count, 3)
+        # All three responses go back in a single Content, in call order
+        self.assertEqual(len(self.history), 3)
+        responses = [p.function_response.response["result"] for p in self.history[1].parts]
+        self.assertEqual(responses, ["content of a.py", "content of b.py", "content of c.py"])
+
+    def test_history_policy_limits_prompt_but_keeps_history(self):
+        big = "x" * 40000
+        responses = []
+        for i in range(3):
+            fc = MagicMock()
+            fc.name = "read_file"
+            fc.args = {"path": f"f{i}.py"}
+            response = MagicMock()
+            response.parts = [MockPart(function_call=fc)]
+            response.candidates = [MagicMock(content=MockContent(role="model", parts=[MockPart(function_call=fc)]))]
+            responses.append(response)
+        final = MagicMock()
+        final.parts = [MockPart(text="Done")]
+        final.candidates = [MagicMock(content="Done content")]
+        sent = []
+        remaining = responses + [final]
+
+        def response_fn(hist):
+            sent.append(list(hist))
+            return remaining.pop(0)
+
+        self.mock_tool_executor.return_value = big
+        policy = HistoryPolicy(max_tokens=12000, keep_recent=2, stub_tokens=50)
+        result = execute_agent_loop(response_fn, self.history, self.mock_tool_executor,
+                                    max_iterations=5, history_policy=policy)
+
+        self.assertEqual(result, "Done")
+        # The stored history keeps every full result
+        self.assertEqual(self.history[1].parts[0].function_response.response["result"], big)
+        # The last prompt shrank the old results but kept the newest one intact
+        last = sent[-1]
+        self.assertLess(len(last[1].parts[0].function_response.response["result"]), 1000)
+        self.assertEqual(last[5].parts[0].function_response.response["result"], big)
+        self.assertGreater(policy.tokens_saved, 0)
+        self.assertEqual(len(policy.turns), 4)
+
+class TestHistoryPolicy(unittest.TestCase):
+    def read_turn(self, path, content):
+        fc = MagicMock()
+        fc.name = "read_file"
+        fc.args = {"path": path}
+        call = MockContent(role="model", parts=[MockPart(function_call=fc)])
+        result = MockContent(role="function", parts=[
+            MockPart(function_response=MockFunctionResponse("read_file", {"result": content}))
+        ])
+        return [call, result]
+
+    def result_of(self, entry):
+        return entry.parts[0].function_response.response["result"]
+
+    def test_under_budget_history_is_unchanged(self):
+        history = [{"role": "user", "parts": ["context"]}] + self.read_turn("a.py", "small")
+        policy = HistoryPolicy(max_tokens=1000, keep_recent=0)
+
+        self.assertIs(policy.apply(history), history)
+        self.assertEqual(policy.turns[-1]["saved"], 0)
+
+    def test_repeated_reads_are_deduplicated(self):
+        history = self.read_turn("a.py", "v1" * 500) + self.read_turn("b.py", "b") + self.read_turn("a.py", "v2" * 500)
+        policy = HistoryPolicy(max_tokens=100000, keep_recent=0)
+
+        compacted = policy.apply(history)
+
+        self.assertIn("Superseded: a.py", self.result_of(compacted[1]))
+        self.assertEqual(self.result_of(compacted[3]), "b")
+        self.assertEqual(self.result_of(compacted[5]), "v2" * 500)
+        self.assertEqual(policy.turns[-1]["deduplicated"], 1)
+        # The original history is not modified
+        self.assertEqual(self.result_of(history[1]), "v1" * 500)
+
+    def test_recent_entries_are_pinned(self):
+        history = self.read_turn("a.py", "a" * 8000) + self.read_turn("b.py", "b" * 8000)
+        policy = HistoryPolicy(max_tokens=100, keep_recent=2, stub_tokens=20)
+
+        compacted = policy.apply(history)
+
+        self.assertLess(len(self.result_of(compacted[1])), 200)
+        self.assertEqual(self.result_of(compacted[3]), "b" * 8000)
+        self.assertEqual(policy.turns[-1]["shrunk"], 1)
+
+    def test_pinned_results_and_messages_are_capped(self):
+        history = [{"role": "user", "parts": ["c" * 40000]}] + self.read_turn("a.py", "a" * 40000)
+        policy = HistoryPolicy(max_tokens=100000, keep_recent=3, max_result_tokens=1000)
+
+        compacted = policy.apply(history)
+
+        self.assertLess(len(compacted[0]["parts"][0]), 5000)
+        self.assertLess(len(self.result_of(compacted[2])), 5000)
+        self.assertTrue(self.result_of(compacted[2]).startswith("a" * 1000))
+        self.assertEqual(policy.turns[-1]["capped"], 2)
+        self.assertEqual(self.result_of(history[2]), "a" * 40000)
+
+    def test_fixed_prompt_counts_against_budget(self):
+        history = self.read_turn("a.py", "a" * 8000) + self.read_turn("b.py", "b" * 8000)
+        policy = HistoryPolicy(max_tokens=5000, keep_recent=2, stub_tokens=20)
+
+        self.assertIs(policy.apply(history), history)
+        compacted = policy.apply(history, fixed_tokens=2000)
+
+        self.assertLess(len(self.result_of(compacted[1])), 200)
+        self.assertEqual(self.result_of(compacted[3]), "b" * 8000)
+
+class TestRunToolCalls(unittest.TestCase):
+    def test_read_only_calls_run_concurrently(self):
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def executor(name, args):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.pop()
+            return args["path"]
+
+        calls = [("read_file", {"path": str(i)}) for i in range(3)]
+        results = run_tool_calls(calls, executor, max_workers=3)
+
+        self.assertEqual(results, ["0", "1", "2"])
+        self.assertEqual(max(peak), 3)
+
+    def test_side_effect_tools_act_as_barriers(self):
+        order = []
+
+        def executor(name, args):
+            order.append((name, args["id"]))
+            return name
+
+        calls = [
+            ("read_file", {"id": 1}),
+            ("write_file", {"id": 2}),
+            ("read_file", {"id": 3}),
+        ]
+        results = run_tool_calls(calls, executor, max_workers=4)
+
+        self.assertEqual(results, ["read_file", "write_file", "read_file"])
+        self.assertEqual(order, [("read_file", 1), ("write_file", 2), ("read_file", 3)])
+
+    def test_tool_exceptions_become_error_results(self):
+        def executor(name, args):
+            raise RuntimeError("boom")
+
+        results = run_tool_calls([("read_file", {}), ("search_code", {})], executor)
+
+        self.assertEqual(results, ["Error executing tool read_file: boom", "Error executing tool search_code: boom"])
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,55 @@
+import sys
+import os
+import unittest
+
+# Add local-code-agent to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from agent.context import ContextBuilder, truncate_to_tokens
+from agent.utils import estimate_tokens
+
+class TestTruncateToTokens(unittest.TestCase):
+    def test_short_text_unchanged(self):
+        self.assertEqual(truncate_to_tokens("hello", 10), "hello")
+
+    def test_keeps_head_and_tail(self):
+        text = "HEAD" + "x" * 4000 + "TAIL"
+        result = truncate_to_tokens(text, 100)
+
+        self.assertTrue(result.startswith("HEAD"))
+        self.assertTrue(result.endswith("TAIL"))
+        self.assertIn("tokens omitted", result)
+        self.assertLess(estimate_tokens(result), 120)
+
+class TestContextBuilder(unittest.TestCase):
+    def test_small_results_kept_in_full(self):
+        builder = ContextBuilder(total_budget=1000, step_budget=500)
+        context, report = builder.build({"a": "alpha", "b": "beta"})
+
+        self.assertEqual(context, "Result from a:\nalpha\n\nResult from b:\nbeta\n")
+        self.assertEqual({r["mode"] for r in report.values()}, {"full"})
+
+    def test_newest_results_funded_first(self):
+        builder = ContextBuilder(total_budget=400, step_budget=300, min_step_tokens=64)
+        results = {"old": "o" * 4000, "mid": "m" * 4000, "new": "n" * 4000}
+
+        context, report = builder.build(results)
+
+        self.assertEqual(report["new"]["mode"], "truncated")
+        self.assertEqual(report["old"]["mode"], "stub")
+        self.assertLess(report["old"]["tokens"], 30)
+        # Plan order is kept in the output
+        self.assertLess(context.index("Result from old"), context.index("Result from new"))
+
+    def test_custom_summarizer(self):
+        builder = ContextBuilder(total_budget=100, step_budget=100, summarize=lambda text, n: "summary")
+        context, report = builder.build({"a": "z" * 4000})
+
+        self.assertIn("summary", context)
+        self.assertEqual(report["a"]["tokens"], estimate_tokens("summary"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,12 +2,6 @@ import sys
 from unittest.mock import MagicMock
 import unittest
 
-# Mock google
-sys.modules["google"] = MagicMock()
-sys.modules["google.generativeai"] = MagicMock()
-sys.modules["google.ai"] = MagicMock()
-sys.modules["google.ai.generativelanguage"] = MagicMock()
-
 import os
 # Set dummy API key for testing
 os.environ["GEMINI_API_KEY"] = "fake_key_for_test"
@@ -17,27 +11,46 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, '..'))
 sys.path.insert(0, project_root)
 
-# Mock config
-import config
-config.GEMINI_API_KEY = "fake_key"
-config.GEMINI_MODEL = "gemini-pro"
+from module_mocks import ModuleMocks
 
 # Mock tools
-sys.modules["agent.tools"] = MagicMock()
-sys.modules["agent.tools"].search_code = MagicMock(return_value="def foo(): pass")
-sys.modules["agent.tools"].execute_tool = MagicMock()
+mock_tools = MagicMock()
+mock_tools.search_code = MagicMock(return_value="def foo(): pass")
+mock_tools.execute_tool = MagicMock()
 
 # Mock execution
-sys.modules["agent.execution"] = MagicMock()
+mock_execution = MagicMock()
 mock_execute_loop = MagicMock(return_value="Agent Result")
-sys.modules["agent.execution"].execute_agent_loop = mock_execute_loop
+mock_execution.execute_agent_loop = mock_execute_loop
 
 # Mock agent.agents
-sys.modules["agent.agents"] = MagicMock()
+mock_agents = MagicMock()
 mock_agent_instance = MagicMock(return_value="Model Response")
-sys.modules["agent.agents"].create_agent = MagicMock(return_value=mock_agent_instance)
+mock_agents.create_agent = MagicMock(return_value=mock_agent_instance)
+
+mocks = ModuleMocks({
+    # Mock google
+    "google": MagicMock(),
+    "google.generativeai": MagicMock(),
+    "google.ai": MagicMock(),
+    "google.ai.generativelanguage": MagicMock(),
+    "agent.tools": mock_tools,
+    "agent.execution": mock_execution,
+    "agent.agents": mock_agents,
+})
+with mocks:
+    # Mock config
+    import config
+    config.GEMINI_API_KEY = "fake_key"
+    config.GEMINI_MODEL = "gemini-pro"
+
+    from agent.core import run_agent
+
+def setUpModule():
+    mocks.start()
 
-from agent.core import run_agent
+def tearDownModule():
+    mocks.stop()
 
 class TestCore(unittest.TestCase):
     def test_run_agent(self):
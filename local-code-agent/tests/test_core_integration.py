@@ -27,19 +27,13 @@ mock_generativelanguage.Part = MockPart
 mock_generativelanguage.FunctionResponse = MockFunctionResponse
 mock_generativelanguage.Content = MockContent
 
-sys.modules["google"] = mock_google
-sys.modules["google.ai"] = mock_genai
-sys.modules["google.ai.generativelanguage"] = mock_generativelanguage
-
 # 2. Mock agent.tools BEFORE importing agent.core
 mock_tools = MagicMock()
 mock_tools.search_code = MagicMock(return_value="def foo(): pass")
 mock_tools.execute_tool = MagicMock(return_value="Tool Output")
-sys.modules["agent.tools"] = mock_tools
 
 # 3. Mock agent.agents BEFORE importing agent.core
 mock_agents = MagicMock()
-sys.modules["agent.agents"] = mock_agents
 
 # Add project root to path
 import os
@@ -50,10 +44,27 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, '..'))
 sys.path.insert(0, project_root)
 
+from module_mocks import ModuleMocks
+
+mocks = ModuleMocks({
+    "google": mock_google,
+    "google.ai": mock_genai,
+    "google.ai.generativelanguage": mock_generativelanguage,
+    "agent.tools": mock_tools,
+    "agent.agents": mock_agents,
+})
+
 # 4. Import modules
 # We want to test agent.core using the REAL agent.execution (but mocked google deps)
 # So we do NOT mock agent.execution here.
-from agent.core import run_agent
+with mocks:
+    from agent.core import run_agent
+
+def setUpModule():
+    mocks.start()
+
+def tearDownModule():
+    mocks.stop()
 
 class TestCoreIntegration(unittest.TestCase):
     def setUp(self):
@@ -4,21 +4,17 @@ import sys
 
 # Mock numpy
 mock_np = MagicMock()
-sys.modules["numpy"] = mock_np
 
 # Mock google
 mock_google = MagicMock()
-sys.modules["google"] = mock_google
 
 # Mock google.generativeai
 mock_genai = MagicMock()
-sys.modules["google.generativeai"] = mock_genai
 # Ensure mock_google.generativeai points to the same mock
 mock_google.generativeai = mock_genai
 
 # Mock sentence_transformers
 mock_sentence_transformers = MagicMock()
-sys.modules["sentence_transformers"] = mock_sentence_transformers
 
 # Add local-code-agent to path
 import os
@@ -29,7 +25,22 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, '..'))
 sys.path.insert(0, project_root)
 
-from agent.embedding import get_embedding_model, GeminiEmbedder, SentenceTransformerEmbedder
+from module_mocks import ModuleMocks
+
+mocks = ModuleMocks({
+    "numpy": mock_np,
+    "google": mock_google,
+    "google.generativeai": mock_genai,
+    "sentence_transformers": mock_sentence_transformers,
+})
+with mocks:
+    from agent.embedding import get_embedding_model, GeminiEmbedder, SentenceTransformerEmbedder
+
+def setUpModule():
+    mocks.start()
+
+def tearDownModule():
+    mocks.stop()
 
 class TestEmbedding(unittest.TestCase):
     def setUp(self):
@@ -43,6 +54,12 @@ class TestEmbedding(unittest.TestCase):
         # Mock np.array_equal to compare lists
         mock_np.array_equal.side_effect = lambda x, y: x == y
 
+    def test_importing_the_module_loads_no_embedding_sdk(self):
+        # None in sys.modules makes any import of these names fail
+        with ModuleMocks({"google": None, "google.generativeai": None, "sentence_transformers": None}):
+            import agent.embedding
+            self.assertTrue(callable(agent.embedding.get_embedding_model))
+
     def test_get_embedding_model_gemini(self):
         model = get_embedding_model("models/text-embedding-004")
         self.assertIsInstance(model, GeminiEmbedder)
@@ -0,0 +1,117 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+import shutil
+import tempfile
+
+# Set dummy API key for testing
+os.environ["GEMINI_API_KEY"] = "fake_key_for_test"
+
+# Add local-code-agent to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.insert(0, project_root)
+
+from module_mocks import ModuleMocks
+
+mocks = ModuleMocks({
+    # Mock google
+    "google": MagicMock(),
+    "google.generativeai": MagicMock(),
+    # Mock sentence_transformers
+    "sentence_transformers": MagicMock(),
+})
+with mocks:
+    from agent.embedding import CachedEmbedder
+    from agent.embedding_cache import EmbeddingCache, LRUCache
+
+def setUpModule():
+    mocks.start()
+
+def tearDownModule():
+    mocks.stop()
+
+class FakeEmbedder:
+    def __init__(self):
+        self.model_name = "fake-model"
+        self.calls = []
+
+    def encode(self, content, task_type="retrieval_document"):
+        self.calls.append(list(content))
+        return [[float(len(text)), 1.0] for text in content]
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.test_dir, "cache.sqlite3")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_key_depends_on_model_task_and_text(self):
+        base = EmbeddingCache.key("m", "retrieval_document", "text")
+        self.assertEqual(base, EmbeddingCache.key("m", "retrieval_document", "text"))
+        self.assertNotEqual(base, EmbeddingCache.key("other", "retrieval_document", "text"))
+        self.assertNotEqual(base, EmbeddingCache.key("m", "retrieval_query", "text"))
+        self.assertNotEqual(base, EmbeddingCache.key("m", "retrieval_document", "text2"))
+
+    def test_round_trip_persists_across_instances(self):
+        cache = EmbeddingCache(self.cache_path)
+        cache.put_many({"k1": [0.5, 0.25]})
+        cache.close()
+
+        reopened = EmbeddingCache(self.cache_path)
+        self.assertEqual(reopened.get_many(["k1", "k2"]), {"k1": [0.5, 0.25]})
+        reopened.close()
+
+    def test_lru_eviction(self):
+        cache = EmbeddingCache(self.cache_path, max_entries=10)
+        cache.put_many({f"k{i}": [float(i)] for i in range(10)})
+        # Touch k0 so it becomes the most recently used entry
+        cache.get_many(["k0"])
+        cache.put_many({"new": [1.0]})
+
+        self.assertLessEqual(len(cache), 10)
+        self.assertIn("k0", cache.get_many(["k0"]))
+        self.assertIn("new", cache.get_many(["new"]))
+        self.assertEqual(cache.get_many(["k1"]), {})
+        cache.close()
+
+    def test_cached_embedder_only_embeds_misses(self):
+        inner = FakeEmbedder()
+        embedder = CachedEmbedder(inner, EmbeddingCache(self.cache_path))
+
+        first = embedder.encode(["aa", "bbb"])
+        second = embedder.encode(["bbb", "cccc", "cccc"])
+
+        self.assertEqual(first.tolist(), [[2.0, 1.0], [3.0, 1.0]])
+        self.assertEqual(second.tolist(), [[3.0, 1.0], [4.0, 1.0], [4.0, 1.0]])
+        self.assertEqual(inner.calls, [["aa", "bbb"], ["cccc"]])
+        self.assertEqual(embedder.hits, 1)
+        self.assertEqual(embedder.misses, 3)
+
+    def test_cached_embedder_separates_task_types(self):
+        inner = FakeEmbedder()
+        embedder = CachedEmbedder(inner, EmbeddingCache(self.cache_path))
+
+        embedder.encode("query", task_type="retrieval_query")
+        embedder.encode("query", task_type="retrieval_document")
+
+        self.assertEqual(len(inner.calls), 2)
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_entries=2)
+        cache.put("a", [1.0])
+        cache.put("b", [2.0])
+        cache.get("a")
+        cache.put("c", [3.0])
+
+        self.assertEqual(cache.get("a"), [1.0])
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add local-code-agent to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from agent.gemini_client import (
+    AsyncEmbeddingClient, EmbeddingAPIError, GeminiRestTransport, RateLimiter, run_sync
+)
+
+class FakeEmbeddingServer:
+    """
+    Local stand-in for the batchEmbedContents endpoint.
+    Each text embeds to [len(text), 1.0]. It can be told to answer the next N
+    requests with 429 and to reject batches above a size limit.
+    """
+    def __init__(self, fail_next=0, max_batch=None, delay=0.0):
+        self.fail_next = fail_next
+        self.max_batch = max_batch
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                texts = [r["content"]["parts"][0]["text"] for r in body["requests"]]
+                with server.lock:
+                    server.requests.append((self.path, self.headers.get("x-goog-api-key"), texts))
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                    fail = server.fail_next > 0
+                    if fail:
+                        server.fail_next -= 1
+                try:
+                    time.sleep(server.delay)
+                    if fail:
+                        self.reply(429, {"error": {"message": "Resource has been exhausted"}}, {"Retry-After": "0"})
+                    elif server.max_batch and len(texts) > server.max_batch:
+                        self.reply(400, {"error": {"message": f"at most {server.max_batch} requests can be in one batch"}})
+                    else:
+                        self.reply(200, {"embeddings": [{"values": [float(len(t)), 1.0]} for t in texts]})
+                finally:
+                    with server.lock:
+                        server.in_flight -= 1
+
+            def reply(self, status, payload, headers=None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def make_client(server, **options):
+    options.setdefault("backoff_base", 0.01)
+    transport = GeminiRestTransport("test-key", base_url=server.url, timeout=5)
+    return AsyncEmbeddingClient(transport, "models/fake", **options)
+
+class TestAsyncEmbeddingClient(unittest.TestCase):
+    def test_embeds_in_order_and_splits_to_batch_limit(self):
+        texts = [("x" * i) for i in range(1, 26)]
+        with FakeEmbeddingServer() as server:
+            client = make_client(server, max_batch_items=10)
+            vectors = run_sync(client.embed(texts))
+
+        self.assertEqual([v[0] for v in vectors], [float(i) for i in range(1, 26)])
+        self.assertEqual(len(server.requests), 3)
+        path, api_key, _ = server.requests[0]
+        self.assertEqual(path, "/v1beta/models/fake:batchEmbedContents")
+        self.assertEqual(api_key, "test-key")
+
+    def test_requests_run_concurrently_up_to_limit(self):
+        with FakeEmbeddingServer(delay=0.05) as server:
+            client = make_client(server, max_batch_items=1, concurrency=3)
+            run_sync(client.embed([f"t{i}" for i in range(9)]))
+
+        self.assertEqual(server.max_in_flight, 3)
+
+    def test_concurrency_limit_is_shared_across_threads(self):
+        with FakeEmbeddingServer(delay=0.05) as server:
+            client = make_client(server, max_batch_items=1, concurrency=2)
+            threads = [
+                threading.Thread(target=run_sync, args=(client.embed([f"t{i}{j}" for j in range(4)]),))
+                for i in range(3)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(server.requests), 12)
+        self.assertEqual(server.max_in_flight, 2)
+
+    def test_cancelled_wait_for_a_slot_gives_it_back(self):
+        client = AsyncEmbeddingClient(None, "models/fake", concurrency=1)
+
+        async def use_slot():
+            async with client._slot():
+                pass
+
+        async def scenario():
+            client._slots.acquire()
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(use_slot(), 0.05)
+            client._slots.release()
+
+        asyncio.run(scenario())
+
+        # The waiting thread took the freed slot after the cancellation and released it
+        self.assertTrue(client._slots.acquire(timeout=1))
+        client._slots.release()
+        run_sync(use_slot())
+
+    def test_retries_rate_limited_requests(self):
+        with FakeEmbeddingServer(fail_next=2) as server:
+            client = make_client(server)
+            vectors = run_sync(client.embed(["abc"]))
+
+        self.assertEqual(vectors, [[3.0, 1.0]])
+        self.assertEqual(client.retries, 2)
+
+    def test_gives_up_after_max_retries(self):
+        with FakeEmbeddingServer(fail_next=10) as server:
+            client = make_client(server, max_retries=1)
+            with self.assertRaises(EmbeddingAPIError) as ctx:
+                run_sync(client.embed(["abc"]))
+
+        self.assertEqual(ctx.exception.status, 429)
+
+    def test_splits_batches_rejected_as_too_large(self):
+        with FakeEmbeddingServer(max_batch=2) as server:
+            client = make_client(server, max_batch_items=8)
+            vectors = run_sync(client.embed(["a", "bb", "ccc", "dddd", "eeeee"]))
+
+        self.assertEqual([v[0] for v in vectors], [1.0, 2.0, 3.0, 4.0, 5.0])
+        self.assertGreater(client.splits, 0)
+
+    def test_run_sync_inside_running_loop(self):
+        async def outer():
+            async def inner():
+                return 42
+            return run_sync(inner())
+
+        self.assertEqual(asyncio.run(outer()), 42)
+
+class TestRateLimiter(unittest.TestCase):
+    def test_requests_per_period(self):
+        limiter = RateLimiter(requests_per_period=2, tokens_per_period=1000, period=0.2)
+
+        async def take(n):
+            for _ in range(n):
+                await limiter.acquire(1)
+
+        started = time.monotonic()
+        asyncio.run(take(3))
+        self.assertGreaterEqual(time.monotonic() - started, 0.18)
+
+    def test_tokens_per_period(self):
+        limiter = RateLimiter(requests_per_period=100, tokens_per_period=10, period=0.2)
+        self.assertEqual(limiter._reserve(8), 0.0)
+        self.assertGreater(limiter._reserve(8), 0.0)
+
+if __name__ == "__main__":
+    unittest.main()
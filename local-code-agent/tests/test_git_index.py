@@ -0,0 +1,167 @@
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import shutil
+import subprocess
+import tempfile
+
+mock_embedding_model = MagicMock()
+
+# Add local-code-agent to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from module_mocks import ModuleMocks
+
+mocks = ModuleMocks({
+    # Mock dependencies before they are imported by agent.indexer
+    "chromadb": MagicMock(),
+    "tree_sitter_languages": MagicMock(),
+    "agent.embedding": MagicMock(
+        get_embedding_model=MagicMock(return_value=mock_embedding_model),
+        embedding_backend=MagicMock(return_value="gemini")
+    ),
+})
+with mocks:
+    from agent import indexer
+    from agent.git_index import diff_name_status, index_commit, list_tree
+    from agent.manifest import IndexManifest, hash_file
+    from agent.lexical import LexicalIndex
+    from agent.symbols import SymbolIndex
+
+def setUpModule():
+    mocks.start()
+
+def tearDownModule():
+    mocks.stop()
+
+parsed = []
+
+def fake_chunks_from_source(file_path, content, symbols=None, root=None):
+    parsed.append(os.path.relpath(file_path, root))
+    return [{
+        "id": indexer.chunk_id(file_path, 0, root),
+        "text": content,
+        "metadata": {"file_path": file_path, "start_line": 0, "end_line": 1, "type": "file"}
+    }]
+
+@patch("agent.indexer.chunks_from_source", side_effect=fake_chunks_from_source)
+class TestGitIndex(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = os.path.realpath(tempfile.mkdtemp())
+        self.repo = os.path.join(self.test_dir, "repo")
+        os.makedirs(self.repo)
+        self.git("init", "-q")
+        self.write("a.py", "def a(): pass")
+        self.write("b.py", "def b(): pass")
+        self.write("notes.txt", "not source")
+        self.first = self.commit("first")
+
+        self.manifest_path = os.path.join(self.test_dir, "db", "manifest.json")
+        self.collection = MagicMock()
+        self.lexical = LexicalIndex(os.path.join(self.test_dir, "db", "lexical_index.sqlite3"))
+        self.symbols = SymbolIndex(os.path.join(self.test_dir, "db", "symbols.sqlite3"))
+        self.patchers = [
+            patch("agent.indexer._collection", self.collection),
+            patch("agent.indexer._lexical_index", self.lexical),
+            patch("agent.indexer._symbol_index", self.symbols),
+            patch("config.PROJECT_ROOT", self.repo),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        mock_embedding_model.encode.return_value.tolist.return_value = [[0.0]]
+        parsed.clear()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        self.symbols.close()
+        self.lexical.close()
+        shutil.rmtree(self.test_dir)
+
+    def git(self, *args):
+        env = dict(os.environ, GIT_AUTHOR_NAME="test", GIT_AUTHOR_EMAIL="test@example.com",
+                   GIT_COMMITTER_NAME="test", GIT_COMMITTER_EMAIL="test@example.com")
+        return subprocess.run(["git", "-C", self.repo, *args], check=True, capture_output=True, env=env).stdout.decode().strip()
+
+    def write(self, relative, content):
+        path = os.path.join(self.repo, relative)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def commit(self, message):
+        self.git("add", "-A")
+        self.git("commit", "-q", "-m", message)
+        return self.git("rev-parse", "HEAD")
+
+    def index(self, rev="HEAD"):
+        return index_commit(self.repo, rev, manifest=IndexManifest(self.manifest_path))
+
+    def test_first_index_reads_blobs(self, mock_chunks):
+        stats = self.index()
+
+        self.assertEqual(stats["updated"], 2)
+        self.assertEqual(sorted(parsed), ["a.py", "b.py"])
+        manifest = IndexManifest(self.manifest_path)
+        self.assertEqual(manifest.commit, self.first)
+        entry = manifest.get(os.path.join(self.repo, "a.py"))
+        self.assertEqual(entry["hash"], self.git("rev-parse", "HEAD:a.py"))
+        self.assertEqual(entry["chunk_ids"], ["a.py:0"])
+
+    def test_only_the_diff_is_reindexed(self, mock_chunks):
+        self.index()
+        self.write("a.py", "def a(): return 1")
+        os.remove(os.path.join(self.repo, "b.py"))
+        self.write("c.py", "def c(): pass")
+        second = self.commit("second")
+        parsed.clear()
+
+        stats = self.index()
+
+        self.assertEqual(sorted(parsed), ["a.py", "c.py"])
+        self.assertEqual((stats["updated"], stats["removed"]), (2, 1))
+        self.assertEqual(stats["commit"], second)
+        deleted = [i for call in self.collection.delete.call_args_list for i in call.kwargs["ids"]]
+        self.assertIn("b.py:0", deleted)
+        self.assertIsNone(IndexManifest(self.manifest_path).get(os.path.join(self.repo, "b.py")))
+
+    def test_indexes_other_commit_without_checkout(self, mock_chunks):
+        self.write("a.py", "def a(): return 2")
+        self.commit("second")
+        self.index()
+        parsed.clear()
+
+        stats = self.index(self.first)
+
+        self.assertEqual(parsed, ["a.py"])
+        self.assertEqual(stats["commit"], self.first)
+        # The working tree still has the second version
+        with open(os.path.join(self.repo, "a.py"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), "def a(): return 2")
+        self.assertEqual(self.collection.upsert.call_args.kwargs["documents"], ["def a(): pass"])
+
+    def test_same_commit_is_a_no_op(self, mock_chunks):
+        self.index()
+        parsed.clear()
+
+        stats = self.index()
+
+        self.assertEqual(parsed, [])
+        self.assertEqual(stats["updated"], 0)
+
+    def test_tree_listing_and_diff(self, mock_chunks):
+        self.git("mv", "b.py", "renamed.py")
+        second = self.commit("rename")
+
+        self.assertEqual(sorted(list_tree(self.repo, self.first)), ["a.py", "b.py"])
+        self.assertEqual(diff_name_status(self.repo, self.first, second), ({"renamed.py"}, {"b.py"}))
+
+    def test_hash_file_matches_git(self, mock_chunks):
+        path = os.path.join(self.repo, "a.py")
+        self.assertEqual(hash_file(path), self.git("hash-object", path))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,480 @@
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import json
+import shutil
+import tempfile
+
+# Mock dependencies before they are imported by agent.indexer
+mock_chromadb = MagicMock()
+
+mock_tsl = MagicMock()
+
+# Mock embedding model
+mock_embedding_model = MagicMock()
+mock_get_embedding_model = MagicMock(return_value=mock_embedding_model)
+
+# Set dummy API key for testing
+os.environ["GEMINI_API_KEY"] = "fake_key_for_test"
+
+# Add local-code-agent to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from module_mocks import ModuleMocks
+
+mocks = ModuleMocks({
+    "chromadb": mock_chromadb,
+    "tree_sitter_languages": mock_tsl,
+    "agent.embedding": MagicMock(
+        get_embedding_model=mock_get_embedding_model,
+        embedding_backend=MagicMock(return_value="gemini")
+    ),
+})
+with mocks:
+    from agent import indexer
+    from agent.manifest import IndexManifest
+    from agent.lexical import LexicalIndex
+    from agent.symbols import SymbolIndex
+
+def setUpModule():
+    mocks.start()
+
+def tearDownModule():
+    mocks.stop()
+
+def fake_extract_chunks(file_path, symbols=None, root=None):
+    with open(file_path, "r", encoding="utf-8") as f:
+        content = f.read()
+    if symbols is not None:
+        # "def name(): ..." defines name on line 0
+        name = content.split("(")[0].replace("def ", "")
+        symbols.update({"definitions": [(name, name, "function", 0, 0)]})
+    return [{
+        "id": indexer.chunk_id(file_path, 0, root),
+        "text": content,
+        "metadata": {"file_path": file_path, "start_line": 0, "end_line": 1, "type": "file"}
+    }]
+
+def stored_collection():
+    """
+    A mock collection whose get() returns the chunks last upserted into it, as the
+    lexical index reads texts back from the vector store.
+    """
+    collection = MagicMock()
+    def get(ids):
+        chunks = {}
+        for call in collection.upsert.call_args_list:
+            chunks.update(zip(call.kwargs["ids"], zip(call.kwargs["documents"], call.kwargs["metadatas"])))
+        found = [doc_id for doc_id in ids if doc_id in chunks]
+        return {"ids": found, "documents": [chunks[d][0] for d in found], "metadatas": [chunks[d][1] for d in found]}
+    collection.get.side_effect = get
+    return collection
+
+@patch("agent.indexer.extract_chunks", side_effect=fake_extract_chunks)
+class TestIncrementalIndexing(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.src_dir = os.path.join(self.test_dir, "src")
+        os.makedirs(self.src_dir)
+        self.manifest_path = os.path.join(self.test_dir, "db", "manifest.json")
+
+        self.file_a = os.path.join(self.src_dir, "a.py")
+        self.file_b = os.path.join(self.src_dir, "b.py")
+        self.write(self.file_a, "def a(): pass")
+        self.write(self.file_b, "def b(): pass")
+
+        self.collection = stored_collection()
+        self.collection_patcher = patch("agent.indexer._collection", self.collection)
+        self.collection_patcher.start()
+        self.lexical = LexicalIndex(os.path.join(self.test_dir, "db", "lexical_index.sqlite3"))
+        self.lexical_patcher = patch("agent.indexer._lexical_index", self.lexical)
+        self.lexical_patcher.start()
+        self.symbols = SymbolIndex(os.path.join(self.test_dir, "db", "symbols.sqlite3"))
+        self.symbols_patcher = patch("agent.indexer._symbol_index", self.symbols)
+        self.symbols_patcher.start()
+        # Chunk ids are relative to the default namespace's root
+        self.root_patcher = patch("config.PROJECT_ROOT", self.src_dir)
+        self.root_patcher.start()
+        mock_embedding_model.encode.return_value.tolist.return_value = [[0.0]]
+
+    def tearDown(self):
+        self.root_patcher.stop()
+        self.collection_patcher.stop()
+        self.lexical_patcher.stop()
+        self.symbols_patcher.stop()
+        self.symbols.close()
+        self.lexical.close()
+        shutil.rmtree(self.test_dir)
+
+    def write(self, path, content):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def run_index(self):
+        return indexer.index_codebase(self.src_dir, manifest=IndexManifest(self.manifest_path))
+
+    def counts(self, stats):
+        return {key: stats[key] for key in ("skipped", "updated", "removed")}
+
+    def upserted_ids(self):
+        ids = []
+        for call in self.collection.upsert.call_args_list:
+            ids.extend(call.kwargs["ids"])
+        return ids
+
+    def deleted_ids(self):
+        ids = []
+        for call in self.collection.delete.call_args_list:
+            ids.extend(call.kwargs["ids"])
+        return ids
+
+    def test_first_run_indexes_everything(self, mock_extract):
+        stats = self.run_index()
+
+        self.assertEqual(self.counts(stats), {"skipped": 0, "updated": 2, "removed": 0})
+        self.assertCountEqual(self.upserted_ids(), ["a.py:0", "b.py:0"])
+        self.assertTrue(os.path.exists(self.manifest_path))
+
+    def test_second_run_skips_unchanged_files(self, mock_extract):
+        self.run_index()
+        self.collection.reset_mock()
+        mock_extract.reset_mock()
+
+        stats = self.run_index()
+
+        self.assertEqual(self.counts(stats), {"skipped": 2, "updated": 0, "removed": 0})
+        mock_extract.assert_not_called()
+        self.collection.upsert.assert_not_called()
+
+    def test_touched_but_identical_file_is_skipped(self, mock_extract):
+        self.run_index()
+        self.collection.reset_mock()
+        st = os.stat(self.file_a)
+        os.utime(self.file_a, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+        stats = self.run_index()
+
+        self.assertEqual(stats["skipped"], 2)
+        self.collection.upsert.assert_not_called()
+
+    def test_only_changed_file_is_reindexed(self, mock_extract):
+        self.run_index()
+        self.collection.reset_mock()
+        self.write(self.file_a, "def a():\n    return 1")
+
+        stats = self.run_index()
+
+        self.assertEqual(self.counts(stats), {"skipped": 1, "updated": 1, "removed": 0})
+        self.assertEqual(self.upserted_ids(), ["a.py:0"])
+
+    def test_parallel_mode_matches_serial_mode(self, mock_extract):
+        for i in range(20):
+            self.write(os.path.join(self.src_dir, f"mod_{i}.py"), f"def f{i}(): pass")
+
+        stats = indexer.index_codebase(self.src_dir, manifest=IndexManifest(self.manifest_path), workers=2)
+
+        self.assertEqual(self.counts(stats), {"skipped": 0, "updated": 22, "removed": 0})
+        self.assertEqual(len(set(self.upserted_ids())), 22)
+
+        self.collection.reset_mock()
+        stats = self.run_index()
+        self.assertEqual(stats["skipped"], 22)
+        self.collection.upsert.assert_not_called()
+
+    def test_batches_span_directories(self, mock_extract):
+        for i in range(30):
+            sub_dir = os.path.join(self.src_dir, f"pkg_{i}")
+            os.makedirs(sub_dir)
+            self.write(os.path.join(sub_dir, "mod.py"), f"def f{i}(): pass")
+
+        stats = self.run_index()
+
+        self.assertEqual(stats["updated"], 32)
+        # 32 tiny chunks from 31 directories fit in a single embedding request
+        self.assertEqual(self.collection.upsert.call_count, 1)
+        self.assertEqual(len(self.upserted_ids()), 32)
+
+    def test_deleted_file_chunks_are_removed(self, mock_extract):
+        self.run_index()
+        self.collection.reset_mock()
+        os.remove(self.file_b)
+
+        stats = self.run_index()
+
+        self.assertEqual(self.counts(stats), {"skipped": 1, "updated": 0, "removed": 1})
+        self.assertEqual(self.deleted_ids(), ["b.py:0"])
+        self.assertIsNone(IndexManifest(self.manifest_path).get(self.file_b))
+        self.assertNotIn("b.py:0", self.lexical)
+        self.assertEqual(self.symbols.find_definition("b"), [])
+
+    def test_changed_paths_update_only_those_files(self, mock_extract):
+        self.run_index()
+        self.collection.reset_mock()
+        file_c = os.path.join(self.src_dir, "pkg", "c.py")
+        os.makedirs(os.path.dirname(file_c))
+        self.write(file_c, "def c(): pass")
+        self.write(self.file_a, "def a():\n    return 2")
+        os.remove(self.file_b)
+        hidden = os.path.join(self.src_dir, ".git", "hook.py")
+        os.makedirs(os.path.dirname(hidden))
+        self.write(hidden, "def hook(): pass")
+
+        stats = indexer.index_codebase(
+            self.src_dir, manifest=IndexManifest(self.manifest_path),
+            paths={os.path.dirname(file_c), self.file_a, self.file_b, hidden}
+        )
+
+        self.assertEqual(self.counts(stats), {"skipped": 0, "updated": 2, "removed": 1})
+        self.assertCountEqual(self.upserted_ids(), ["a.py:0", "pkg/c.py:0"])
+        self.assertEqual(self.deleted_ids(), ["b.py:0"])
+        self.assertNotIn("b.py:0", self.lexical)
+
+    def test_unreadable_file_keeps_previous_chunks(self, mock_extract):
+        self.run_index()
+        entry = IndexManifest(self.manifest_path).get(self.file_a)
+        self.collection.reset_mock()
+        with open(self.file_a, "wb") as f:
+            f.write(b"def a(): return '\xff'")
+
+        stats = self.run_index()
+
+        self.assertEqual(self.counts(stats), {"skipped": 1, "updated": 0, "removed": 0})
+        self.assertEqual(self.deleted_ids(), [])
+        self.assertEqual(IndexManifest(self.manifest_path).get(self.file_a), entry)
+        self.assertEqual(self.lexical.lookup_symbol("a"), ["a.py:0"])
+
+    def test_failed_run_keeps_indexes_consistent_with_manifest(self, mock_extract):
+        self.run_index()
+        self.lexical.save()
+        self.write(self.file_a, "def renamed(): pass")
+        mock_embedding_model.encode.side_effect = RuntimeError("embedding quota exhausted")
+        try:
+            with self.assertRaises(RuntimeError):
+                self.run_index()
+        finally:
+            mock_embedding_model.encode.side_effect = None
+
+        # Nothing of the failed run is kept, so the retry sees file a as changed again
+        self.assertEqual(self.lexical.lookup_symbol("a"), ["a.py:0"])
+        self.assertEqual(self.symbols.find_definition("renamed"), [])
+        self.assertEqual(self.counts(self.run_index()), {"skipped": 1, "updated": 1, "removed": 0})
+        self.assertEqual(len(self.symbols.find_definition("renamed")), 1)
+
+    def test_gitignore_change_drops_newly_ignored_files(self, mock_extract):
+        self.run_index()
+        self.collection.reset_mock()
+        gitignore = os.path.join(self.src_dir, ".gitignore")
+        self.write(gitignore, "b.py\n")
+
+        stats = indexer.index_codebase(
+            self.src_dir, manifest=IndexManifest(self.manifest_path), paths={gitignore}
+        )
+
+        self.assertEqual(self.counts(stats), {"skipped": 1, "updated": 0, "removed": 1})
+        self.assertEqual(self.deleted_ids(), ["b.py:0"])
+
+    def test_directories_outside_the_root_keep_absolute_ids(self, mock_extract):
+        other = os.path.join(self.test_dir, "other")
+        os.makedirs(other)
+        other_a = os.path.join(other, "a.py")
+        self.write(other_a, "def a(): return 'other'")
+        self.run_index()
+
+        indexer.index_codebase(other, manifest=IndexManifest(self.manifest_path))
+
+        self.assertIn(f"{other_a}:0", self.upserted_ids())
+        self.assertEqual(self.upserted_ids().count("a.py:0"), 1)
+
+    def test_version_1_manifest_ids_are_replaced(self, mock_extract):
+        self.run_index()
+        manifest = IndexManifest(self.manifest_path)
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            files = {path: dict(entry, chunk_ids=[f"{path}:0"]) for path, entry in manifest.files.items()}
+            json.dump({"version": 1, "files": files}, f)
+        self.collection.reset_mock()
+
+        stats = self.run_index()
+
+        self.assertEqual(stats["updated"], 2)
+        self.assertCountEqual(self.deleted_ids(), [f"{self.file_a}:0", f"{self.file_b}:0"])
+        self.assertCountEqual(self.upserted_ids(), ["a.py:0", "b.py:0"])
+
+    def test_symbol_index_follows_changes(self, mock_extract):
+        for i in range(6):
+            self.write(os.path.join(self.src_dir, f"mod_{i}.py"), f"def f{i}(): pass")
+        indexer.index_codebase(self.src_dir, manifest=IndexManifest(self.manifest_path), workers=2)
+
+        self.assertEqual(self.symbols.find_definition("f3")[0]["file_path"], os.path.join(self.src_dir, "mod_3.py"))
+        self.assertEqual(self.symbols.find_definition("a")[0]["file_path"], self.file_a)
+
+        self.write(self.file_a, "def renamed(): pass")
+        self.run_index()
+
+        self.assertEqual(self.symbols.find_definition("a"), [])
+        self.assertEqual(len(self.symbols.find_definition("renamed")), 1)
+
+    def test_lexical_index_follows_changes(self, mock_extract):
+        self.run_index()
+        self.write(self.file_a, "def renamed(): pass")
+        self.run_index()
+
+        self.assertEqual(self.lexical.lookup_symbol("renamed"), ["a.py:0"])
+        self.assertEqual(self.lexical.lookup_symbol("a"), [])
+        # Saved next to the manifest and reloaded on the next start
+        reloaded = LexicalIndex(self.lexical.path)
+        self.assertEqual(len(reloaded), 2)
+
+    def test_symbol_query_skips_embedding(self, mock_extract):
+        self.run_index()
+        mock_embedding_model.encode.reset_mock()
+
+        result = indexer.search_code("b")
+
+        self.assertIn(f"File: {self.file_b}", result)
+        mock_embedding_model.encode.assert_not_called()
+        self.collection.query.assert_not_called()
+
+    def test_mentioned_symbol_still_uses_vector_search(self, mock_extract):
+        self.run_index()
+        self.collection.query.return_value = {"ids": [[]], "documents": [[]], "metadatas": [[]]}
+
+        # Every chunk mentions "pass" but none defines it
+        indexer.search_code("pass")
+
+        self.collection.query.assert_called_once()
+
+    def test_batch_search_uses_one_embedding_and_query_call(self, mock_extract):
+        self.run_index()
+        self.collection.query.return_value = {
+            "ids": [["a.py:0"], ["b.py:0"]],
+            "documents": [["def a(): pass"], ["def b(): pass"]],
+            "metadatas": [[{"file_path": self.file_a, "start_line": 0, "end_line": 1}],
+                          [{"file_path": self.file_b, "start_line": 0, "end_line": 1}]],
+        }
+        mock_embedding_model.encode.reset_mock()
+        mock_embedding_model.encode.return_value.tolist.return_value = [[0.1], [0.2]]
+
+        results = indexer.search_code_batch(["first question here", "second question here", "a"])
+
+        mock_embedding_model.encode.assert_called_once_with(
+            ["first question here", "second question here"], task_type="retrieval_query"
+        )
+        self.assertEqual(self.collection.query.call_args.kwargs["query_embeddings"], [[0.1], [0.2]])
+        self.assertIn(f"File: {self.file_a}", results[0])
+        self.assertIn(f"File: {self.file_b}", results[1])
+        self.assertIn(f"File: {self.file_a}", results[2])
+
+        # Repeated queries (up to whitespace) are served from the query embedding LRU
+        mock_embedding_model.encode.reset_mock()
+        indexer.search_code_batch(["first  question here", "second question here"])
+        mock_embedding_model.encode.assert_not_called()
+
+    def test_natural_language_query_fuses_rankings(self, mock_extract):
+        self.run_index()
+        self.collection.query.return_value = {
+            "ids": [["a.py:0"]],
+            "documents": [["def a(): pass"]],
+            "metadatas": [[{"file_path": self.file_a, "start_line": 0, "end_line": 1}]],
+        }
+
+        result = indexer.search_code("where is b defined", n_results=2)
+
+        mock_embedding_model.encode.assert_called()
+        self.assertIn(f"File: {self.file_a}", result)
+        self.assertIn(f"File: {self.file_b}", result)
+
+@patch("agent.indexer.extract_chunks", side_effect=fake_extract_chunks)
+class TestNamespaces(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db_dir = os.path.join(self.test_dir, "db")
+        self.repos = {}
+        self.resources = {}
+        for name, function in (("default", "alpha"), ("other", "beta")):
+            repo = os.path.join(self.test_dir, name)
+            os.makedirs(os.path.join(repo, "pkg"))
+            with open(os.path.join(repo, "pkg", "mod.py"), "w", encoding="utf-8") as f:
+                f.write(f"def {function}(): pass")
+            self.repos[name] = repo
+            self.resources[name] = {
+                "collection": stored_collection(),
+                "lexical": LexicalIndex(),
+                "symbols": SymbolIndex(":memory:"),
+            }
+
+        default = self.resources["default"]
+        self.patchers = [
+            patch("config.CHROMA_PERSIST_DIR", self.db_dir),
+            patch("config.INDEX_MANIFEST_PATH", os.path.join(self.db_dir, "index_manifest.json")),
+            patch("config.PROJECT_ROOT", self.repos["default"]),
+            patch("agent.indexer._collection", default["collection"]),
+            patch("agent.indexer._lexical_index", default["lexical"]),
+            patch("agent.indexer._symbol_index", default["symbols"]),
+            patch.dict("agent.indexer._namespace_resources", {"other": self.resources["other"]}, clear=True),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        mock_embedding_model.encode.return_value.tolist.return_value = [[0.0]]
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        shutil.rmtree(self.test_dir)
+
+    def index(self, name):
+        namespace = None if name == "default" else name
+        return indexer.index_codebase(self.repos[name], namespace=namespace)
+
+    def test_namespace_has_its_own_resources_and_relative_ids(self, mock_extract):
+        self.index("other")
+
+        other = self.resources["other"]
+        self.assertEqual(other["collection"].upsert.call_args.kwargs["ids"], ["pkg/mod.py:0"])
+        self.resources["default"]["collection"].upsert.assert_not_called()
+        self.assertEqual(other["lexical"].lookup_symbol("beta"), ["pkg/mod.py:0"])
+        self.assertEqual(len(other["symbols"].find_definition("beta")), 1)
+        self.assertTrue(os.path.exists(os.path.join(self.db_dir, "namespaces", "other", "index_manifest.json")))
+        self.assertEqual(indexer.get_namespaces()["other"], self.repos["other"])
+
+    def test_search_targets_one_namespace_or_fans_out(self, mock_extract):
+        self.index("default")
+        self.index("other")
+
+        self.assertIn("def alpha", indexer.search_code("alpha"))
+        self.assertNotIn("Repository:", indexer.search_code("beta", repo="other"))
+        self.assertEqual(indexer.search_code("beta"), "")
+
+        both = indexer.search_code_batch(["alpha", "beta"], repo="*")
+        self.assertIn("Repository: default", both[0])
+        self.assertIn("Repository: other", both[1])
+
+    def test_fan_out_embeds_each_query_once(self, mock_extract):
+        self.index("default")
+        self.index("other")
+        for name, function in (("default", "alpha"), ("other", "beta")):
+            meta = {"file_path": os.path.join(self.repos[name], "pkg", "mod.py"), "start_line": 0, "end_line": 1}
+            self.resources[name]["collection"].query.return_value = {
+                "ids": [["pkg/mod.py:0"]], "documents": [[f"def {function}(): pass"]], "metadatas": [[meta]]
+            }
+        mock_embedding_model.encode.reset_mock()
+        mock_embedding_model.encode.return_value.tolist.return_value = [[0.3]]
+
+        result = indexer.search_code("which functions pass", repo="default,other")
+
+        mock_embedding_model.encode.assert_called_once()
+        self.assertIn("def alpha", result)
+        self.assertIn("def beta", result)
+        self.resources["other"]["collection"].query.assert_called_once()
+
+    def test_unknown_or_invalid_namespace(self, mock_extract):
+        with self.assertRaises(ValueError):
+            indexer.search_code("alpha", repo="missing")
+        with self.assertRaises(ValueError):
+            indexer.get_collection("../escape")
+
+if __name__ == "__main__":
+    unittest.main()
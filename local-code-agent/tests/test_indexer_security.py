@@ -6,15 +6,12 @@ import os
 
 # Mock dependencies before they are imported by agent.indexer
 mock_chromadb = MagicMock()
-sys.modules["chromadb"] = mock_chromadb
 
 mock_tsl = MagicMock()
-sys.modules["tree_sitter_languages"] = mock_tsl
 
 # Mock embedding model
 mock_embedding_model = MagicMock()
 mock_get_embedding_model = MagicMock(return_value=mock_embedding_model)
-sys.modules["agent.embedding"] = MagicMock(get_embedding_model=mock_get_embedding_model)
 
 # Set dummy API key for testing
 os.environ["GEMINI_API_KEY"] = "fake_key_for_test"
@@ -25,8 +22,22 @@ project_root = os.path.abspath(os.path.join(current_dir, '..'))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-import config
-from agent.indexer import extract_chunks
+from module_mocks import ModuleMocks
+
+mocks = ModuleMocks({
+    "chromadb": mock_chromadb,
+    "tree_sitter_languages": mock_tsl,
+    "agent.embedding": MagicMock(get_embedding_model=mock_get_embedding_model),
+})
+with mocks:
+    import config
+    from agent.indexer import extract_chunks
+
+def setUpModule():
+    mocks.start()
+
+def tearDownModule():
+    mocks.stop()
 
 class TestIndexerSecurity(unittest.TestCase):
     def setUp(self):
@@ -50,6 +61,18 @@ class TestIndexerSecurity(unittest.TestCase):
         # Verify it returns an empty list
         self.assertEqual(result, [])
 
+    @patch("agent.indexer.get_parser_for_file")
+    def test_extract_chunks_raises_read_errors(self, mock_get_parser):
+        mock_get_parser.return_value = (MagicMock(), MagicMock())
+        with open(self.test_file, "wb") as f:
+            f.write(b"x = '\xff'")
+
+        # Returning [] would record the file as having no chunks
+        with self.assertRaises(UnicodeDecodeError):
+            extract_chunks(self.test_file)
+        with self.assertRaises(FileNotFoundError):
+            extract_chunks("missing_test_file.py")
+
     @patch("agent.indexer.get_parser_for_file")
     def test_extract_chunks_reads_small_file(self, mock_get_parser):
         # Create a small file
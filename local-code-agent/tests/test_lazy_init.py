@@ -0,0 +1,91 @@
+import sys
+import unittest
+from unittest.mock import MagicMock
+import os
+
+# Mock dependencies before they are imported
+mock_chromadb = MagicMock()
+
+mock_genai = MagicMock()
+mock_google = MagicMock()
+mock_google.generativeai = mock_genai
+
+mock_embedding_model = MagicMock()
+mock_get_embedding_model = MagicMock(return_value=mock_embedding_model)
+
+# Set dummy API key for testing
+os.environ["GEMINI_API_KEY"] = "fake_key_for_test"
+
+# Add local-code-agent to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from module_mocks import ModuleMocks
+
+mocks = ModuleMocks({
+    "chromadb": mock_chromadb,
+    "tree_sitter_languages": MagicMock(),
+    "google": mock_google,
+    "google.generativeai": mock_genai,
+    "google.ai": MagicMock(),
+    "google.ai.generativelanguage": MagicMock(),
+    "agent.embedding": MagicMock(get_embedding_model=mock_get_embedding_model),
+})
+with mocks:
+    from agent import indexer, agents, vector_store
+
+def setUpModule():
+    mocks.start()
+
+def tearDownModule():
+    mocks.stop()
+
+# Record what happened during import, before any test triggers initialization
+calls_at_import = (
+    mock_chromadb.PersistentClient.call_count,
+    mock_get_embedding_model.call_count,
+    mock_genai.GenerativeModel.call_count,
+)
+
+class TestLazyInit(unittest.TestCase):
+    def setUp(self):
+        vector_store._chroma_clients.clear()
+        indexer._collection = None
+        indexer._embedding_model = None
+        mock_chromadb.reset_mock()
+        mock_get_embedding_model.reset_mock()
+
+    def test_import_does_not_open_chroma_or_load_model(self):
+        self.assertEqual(calls_at_import, (0, 0, 0))
+
+    def test_search_loads_resources_once(self):
+        mock_embedding_model.encode.return_value.tolist.return_value = [0.1]
+        collection = mock_chromadb.PersistentClient.return_value.get_or_create_collection.return_value
+        collection.query.return_value = {"documents": [], "metadatas": []}
+
+        indexer.search_code("query")
+        indexer.search_code("query")
+
+        self.assertEqual(mock_chromadb.PersistentClient.call_count, 1)
+        self.assertEqual(mock_get_embedding_model.call_count, 1)
+
+    def test_agent_model_built_on_first_call(self):
+        agent_fn = agents.create_agent("prompt", [])
+        mock_genai.GenerativeModel.reset_mock()
+
+        agent_fn("hello")
+        agent_fn("again")
+
+        self.assertEqual(mock_genai.GenerativeModel.call_count, 1)
+
+    def test_background_warm_up(self):
+        thread = indexer.warm_up(background=True)
+        thread.join(timeout=5)
+
+        self.assertIsNotNone(indexer._collection)
+        self.assertIsNotNone(indexer._embedding_model)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import sys
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+# Add local-code-agent to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from agent.lexical import (
+    LexicalIndex, defined_names, tokenize, split_identifier, is_symbol_query, reciprocal_rank_fusion
+)
+
+class TestTokenize(unittest.TestCase):
+    def test_splits_identifiers(self):
+        self.assertEqual(split_identifier("parseHTTPResponse"), ["parse", "http", "response"])
+        self.assertEqual(split_identifier("MAX_FILE_SIZE"), ["max", "file", "size"])
+
+    def test_keeps_whole_identifier_and_parts(self):
+        terms = tokenize("x = extract_json_from_text(text)")
+
+        self.assertIn("extract_json_from_text", terms)
+        self.assertIn("json", terms)
+        self.assertEqual(terms.count("x"), 1)
+
+    def test_symbol_query_detection(self):
+        self.assertTrue(is_symbol_query("extract_json_from_text"))
+        self.assertTrue(is_symbol_query("config.MAX_FILE_SIZE"))
+        self.assertFalse(is_symbol_query("how is json parsed"))
+
+class TestLexicalIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = LexicalIndex()
+        self.index.add("utils:0", "def extract_json_from_text(text):\n    return json.loads(text)")
+        self.index.add("planner:0", "def create_plan(query):\n    return extract_json_from_text(query)")
+        self.index.add("config:0", "MAX_FILE_SIZE = 1024")
+
+    def test_definition_ranks_first_for_symbol(self):
+        self.assertEqual(self.index.lookup_symbol("extract_json_from_text"), ["utils:0", "planner:0"])
+
+    def test_constant_lookup(self):
+        self.assertEqual(self.index.lookup_symbol("config.MAX_FILE_SIZE"), ["config:0"])
+        self.assertEqual(self.index.lookup_symbol("unknown_symbol"), [])
+
+    def test_mentioned_but_undefined_symbol_is_not_a_lookup(self):
+        # json only appears in a call, so the query goes to the hybrid search
+        self.assertEqual(self.index.lookup_symbol("json"), [])
+        self.assertEqual(defined_names("class A:\n    x = 1\n    y = 2\n    def m(self):\n        pass\nLIMIT: int = 3"),
+                         {"A", "LIMIT"})
+
+    def test_bm25_matches_identifier_parts(self):
+        results = self.index.search("extract json")
+
+        self.assertEqual({doc_id for doc_id, _ in results}, {"utils:0", "planner:0"})
+        # utils mentions json twice (json.loads and the name)
+        self.assertEqual(results[0][0], "utils:0")
+
+    def test_replace_and_remove(self):
+        self.index.add("config:0", "MIN_FILE_SIZE = 1")
+        self.assertEqual(self.index.lookup_symbol("MAX_FILE_SIZE"), [])
+        self.index.remove("config:0")
+
+        self.assertEqual(self.index.lookup_symbol("MIN_FILE_SIZE"), [])
+        self.assertEqual(len(self.index), 2)
+
+    def test_save_rollback_and_reopen(self):
+        directory = tempfile.mkdtemp()
+        try:
+            index = LexicalIndex(os.path.join(directory, "lexical.sqlite3"))
+            index.add("planner:0", "def create_plan(query): pass")
+            index.save()
+            index.add("other:0", "def other(): pass")
+            index.remove("planner:0")
+            index.rollback()
+            index.close()
+            loaded = LexicalIndex(index.path)
+            self.assertEqual(loaded.lookup_symbol("create_plan"), ["planner:0"])
+            self.assertNotIn("other:0", loaded)
+            loaded.close()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_symbol_lookup_is_fast(self):
+        for i in range(5000):
+            self.index.add(f"gen:{i}", f"def func_{i}(arg_{i}):\n    return helper_{i % 50}(arg_{i})")
+
+        started = time.perf_counter()
+        for _ in range(100):
+            self.index.lookup_symbol("extract_json_from_text")
+        self.assertLess((time.perf_counter() - started) / 100, 0.001)
+
+class TestReciprocalRankFusion(unittest.TestCase):
+    def test_items_in_both_lists_rise(self):
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]])
+
+        self.assertEqual(fused[0], "c")
+        self.assertEqual(set(fused), {"a", "b", "c", "d"})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,16 +3,8 @@ from unittest.mock import MagicMock, patch
 import json
 import sys
 import os
-
-# Mock dependencies before importing anything that might use them
-sys.modules["chromadb"] = MagicMock()
-sys.modules["tree_sitter_languages"] = MagicMock()
-sys.modules["google"] = MagicMock()
-sys.modules["google.generativeai"] = MagicMock()
-sys.modules["google.ai"] = MagicMock()
-sys.modules["google.ai.generativelanguage"] = MagicMock()
-sys.modules["numpy"] = MagicMock()
-sys.modules["sentence_transformers"] = MagicMock()
+import threading
+import time
 
 # Set dummy API key for testing
 os.environ["GEMINI_API_KEY"] = "fake_key_for_test"
@@ -22,11 +14,30 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, '..'))
 sys.path.insert(0, project_root)
 
-# Mock internal agent modules that are not needed for testing handle_orchestrator_request
-sys.modules["agent.agents"] = MagicMock()
-sys.modules["agent.execution"] = MagicMock()
+from module_mocks import ModuleMocks
+
+mocks = ModuleMocks({
+    # Mock dependencies before importing anything that might use them
+    "chromadb": MagicMock(),
+    "tree_sitter_languages": MagicMock(),
+    "google": MagicMock(),
+    "google.generativeai": MagicMock(),
+    "google.ai": MagicMock(),
+    "google.ai.generativelanguage": MagicMock(),
+    "numpy": MagicMock(),
+    "sentence_transformers": MagicMock(),
+    # Mock internal agent modules that are not needed for testing handle_orchestrator_request
+    "agent.agents": MagicMock(),
+    "agent.execution": MagicMock(),
+})
+with mocks:
+    from agent.orchestrator import Orchestrator
+
+def setUpModule():
+    mocks.start()
 
-from agent.orchestrator import Orchestrator
+def tearDownModule():
+    mocks.stop()
 
 class TestOrchestrator(unittest.TestCase):
     def setUp(self):
@@ -81,5 +92,176 @@ class TestOrchestrator(unittest.TestCase):
 
         self.assertEqual(result, "Unknown orchestrator action: invalid")
 
+class TestOrchestratorDAG(unittest.TestCase):
+    def setUp(self):
+        self.orchestrator = Orchestrator()
+        self.calls = {}
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def fake_call_agent(self, agent_name, task, context_ids=None, stream=None, step_id=None):
+        with self.lock:
+            self.calls[task] = context_ids
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        return f"result of {task}"
+
+    def run_plan(self, plan, max_workers=4):
+        self.orchestrator.state["plan"] = plan
+        with patch.object(self.orchestrator, "call_agent", side_effect=self.fake_call_agent):
+            self.orchestrator.execute_plan(plan, max_workers=max_workers)
+
+    def test_independent_steps_run_concurrently(self):
+        plan = [
+            {"id": "a", "agent": "reader", "task": "A", "depends_on": []},
+            {"id": "b", "agent": "reader", "task": "B", "depends_on": []},
+            {"id": "c", "agent": "reader", "task": "C", "depends_on": ["a", "b"]},
+        ]
+        started = time.perf_counter()
+        self.run_plan(plan)
+
+        # a and b overlap, c waits for both: two rounds instead of three
+        self.assertLess(time.perf_counter() - started, 0.14)
+        self.assertEqual(self.peak, 2)
+        self.assertEqual(self.calls["A"], [])
+        self.assertEqual(sorted(self.calls["C"]), ["a", "b"])
+        self.assertEqual(list(self.orchestrator.state["results"]), ["a", "b", "c"])
+
+    def test_plan_without_dependencies_runs_sequentially(self):
+        plan = [
+            {"agent": "reader", "task": "A"},
+            {"agent": "reader", "task": "B"},
+        ]
+        self.run_plan(plan)
+
+        self.assertEqual(self.peak, 1)
+        self.assertEqual(self.calls["B"], ["step_1"])
+
+    def test_worker_limit(self):
+        plan = [{"id": str(i), "agent": "reader", "task": str(i), "depends_on": []} for i in range(6)]
+        self.run_plan(plan, max_workers=2)
+
+        self.assertEqual(self.peak, 2)
+        self.assertEqual(len(self.orchestrator.state["results"]), 6)
+
+    def test_exclusive_agents_run_alone(self):
+        plan = [
+            {"id": "a", "agent": "reader", "task": "A", "depends_on": []},
+            {"id": "w", "agent": "writer", "task": "W", "depends_on": []},
+            {"id": "b", "agent": "reader", "task": "B", "depends_on": []},
+        ]
+        self.run_plan(plan)
+
+        self.assertEqual(self.peak, 1)
+        self.assertEqual(len(self.orchestrator.state["results"]), 3)
+
+    def test_debugger_runs_alone(self):
+        plan = [
+            {"id": "a", "agent": "reader", "task": "A", "depends_on": []},
+            {"id": "d", "agent": "debugger", "task": "D", "depends_on": []},
+        ]
+        self.run_plan(plan)
+
+        self.assertEqual(self.peak, 1)
+
+    def test_parallel_step_results_reach_streaming_caller(self):
+        texts = []
+        self.orchestrator = Orchestrator(stream=True, on_text=texts.append)
+        plan = [
+            {"id": "a", "agent": "reader", "task": "A", "depends_on": []},
+            {"id": "b", "agent": "reader", "task": "B", "depends_on": []},
+        ]
+        self.run_plan(plan)
+
+        self.assertEqual(self.peak, 2)
+        self.assertEqual(sorted(texts), ["=== Step a ===\nresult of A\n", "=== Step b ===\nresult of B\n"])
+
+    def test_cycle_does_not_hang(self):
+        plan = [
+            {"id": "a", "agent": "reader", "task": "A", "depends_on": ["b"]},
+            {"id": "b", "agent": "reader", "task": "B", "depends_on": ["a"]},
+        ]
+        self.run_plan(plan)
+
+        self.assertEqual(len(self.orchestrator.state["results"]), 2)
+
+    def test_context_limited_to_dependencies(self):
+        self.orchestrator.state["results"] = {"a": "alpha", "b": "beta"}
+
+        context = self.orchestrator.get_context_string(["b"])
+
+        self.assertIn("beta", context)
+        self.assertNotIn("alpha", context)
+
+    @patch("agent.orchestrator.search_code_batch")
+    def test_prefetch_searches_all_steps_at_once(self, mock_batch):
+        mock_batch.return_value = ["code for A", "code for W"]
+        plan = [
+            {"id": "a", "agent": "reader", "task": "A"},
+            {"id": "t", "agent": "tester", "task": "T"},
+            {"id": "w", "agent": "writer", "task": "W"},
+        ]
+
+        self.orchestrator.prefetch_context(plan)
+
+        mock_batch.assert_called_once_with(["A", "W"])
+        self.assertEqual(self.orchestrator.state["context"], {"a": "code for A", "w": "code for W"})
+
+    @patch("agent.orchestrator.search_code_batch", return_value=["code for A"])
+    def test_queries_on_one_orchestrator_start_with_fresh_state(self, mock_batch):
+        # A server session reuses its Orchestrator for every query
+        plans = [
+            [{"agent": "reader", "task": "A"}],
+            [{"agent": "tester", "task": "T"}],
+        ]
+        seen_context = {}
+
+        def call_agent(agent_name, task, context_ids=None, stream=None, step_id=None):
+            seen_context[task] = dict(self.orchestrator.state["context"])
+            return f"result of {task}"
+
+        with patch.object(self.orchestrator, "create_plan", side_effect=plans), \
+                patch.object(self.orchestrator, "call_agent", side_effect=call_agent), \
+                patch("agent.orchestrator.config.ORCHESTRATOR_PREFETCH", True):
+            first = self.orchestrator.run("first query")
+            second = self.orchestrator.run("second query")
+
+        self.assertEqual(seen_context["A"], {"step_1": "code for A"})
+        self.assertEqual(seen_context["T"], {})
+        self.assertIn("result of A", first)
+        self.assertNotIn("result of A", second)
+        self.assertEqual(self.orchestrator.state["results"], {"step_1": "result of T"})
+        self.assertEqual(list(self.orchestrator.state["token_usage"]), ["step_1"])
+
+    @patch("agent.orchestrator.execute_agent_loop", return_value="done")
+    def test_prefetched_context_starts_step_history(self, mock_loop):
+        self.orchestrator.state["context"]["a"] = "def prefetched(): pass"
+
+        self.orchestrator.run_agent_loop(MagicMock(), "A", step_id="a")
+
+        history = mock_loop.call_args[0][1]
+        self.assertIn("def prefetched(): pass", history[0]["parts"][0])
+
+    def test_result_tokens_recorded(self):
+        plan = [{"id": "a", "agent": "reader", "task": "A"}]
+        self.run_plan(plan)
+
+        self.assertGreater(self.orchestrator.state["token_usage"]["a"]["result_tokens"], 0)
+
+    def test_context_is_compacted_to_budget(self):
+        from agent.context import ContextBuilder
+        self.orchestrator.context_builder = ContextBuilder(total_budget=500, step_budget=300)
+        self.orchestrator.state["results"] = {"a": "x" * 20000, "b": "y" * 20000}
+
+        context, report = self.orchestrator.build_context(["a", "b"])
+
+        self.assertLess(len(context), 3000)
+        self.assertEqual(report["b"]["mode"], "truncated")
+        self.assertLessEqual(sum(r["tokens"] for r in report.values()), 520)
+
 if __name__ == "__main__":
     unittest.main()
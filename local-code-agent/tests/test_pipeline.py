@@ -0,0 +1,108 @@
+import sys
+import os
+import threading
+import time
+import unittest
+
+# Add local-code-agent to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from agent.pipeline import Pipeline, Batcher, StageStats, format_report
+
+class TestPipeline(unittest.TestCase):
+    def test_items_flow_through_all_stages(self):
+        results = []
+        lock = threading.Lock()
+
+        def sink(item):
+            with lock:
+                results.append(item)
+
+        pipeline = Pipeline(queue_size=2)
+        pipeline.add_stage("double", lambda batch: [x * 2 for x in batch], workers=3)
+        pipeline.add_stage("sink", sink, workers=2)
+        pipeline.start()
+        for i in range(10):
+            pipeline.put([i, i])
+        pipeline.close()
+
+        self.assertCountEqual(results, [[i * 2, i * 2] for i in range(10)])
+        double_stats, sink_stats = pipeline.stats
+        self.assertEqual(double_stats.items, 10)
+        self.assertEqual(double_stats.units, 20)
+        self.assertEqual(sink_stats.items, 10)
+
+    def test_stages_overlap(self):
+        # Two slow stages of 5 x 20ms each should overlap, not add up to 200ms
+        pipeline = Pipeline(queue_size=2)
+        pipeline.add_stage("a", lambda item: time.sleep(0.02) or item, units=lambda item: 1)
+        pipeline.add_stage("b", lambda item: time.sleep(0.02), units=lambda item: 1)
+        started = time.perf_counter()
+        pipeline.start()
+        for i in range(5):
+            pipeline.put(i)
+        pipeline.close()
+
+        self.assertLess(time.perf_counter() - started, 0.18)
+
+    def test_stage_error_is_raised(self):
+        def boom(item):
+            raise RuntimeError("embed failed")
+
+        pipeline = Pipeline(queue_size=1)
+        pipeline.add_stage("embed", boom)
+        pipeline.start()
+
+        with self.assertRaises(RuntimeError):
+            for i in range(20):
+                pipeline.put([i])
+            pipeline.close()
+
+    def test_report_names_bottleneck(self):
+        fast = StageStats("fast", 1)
+        slow = StageStats("slow", 1)
+        fast.started, fast.finished, fast.items, fast.busy = 0.0, 1.0, 1, 0.1
+        slow.started, slow.finished, slow.items, slow.busy = 0.0, 1.0, 1, 0.9
+
+        report = format_report([fast, slow])
+
+        self.assertIn("Bottleneck: slow", report)
+
+class TestBatcher(unittest.TestCase):
+    def test_flushes_on_item_count(self):
+        batcher = Batcher(max_items=3, max_size=1000)
+        ready = []
+        for i in range(7):
+            ready.extend(batcher.add("x"))
+
+        self.assertEqual(ready, [["x"] * 3, ["x"] * 3])
+        self.assertEqual(batcher.flush(), ["x"])
+
+    def test_flushes_before_exceeding_size_budget(self):
+        batcher = Batcher(max_items=100, max_size=10)
+
+        self.assertEqual(batcher.add("aaaa"), [])
+        self.assertEqual(batcher.add("bbbb"), [])
+        self.assertEqual(batcher.add("cccc"), [["aaaa", "bbbb"]])
+        self.assertEqual(batcher.flush(), ["cccc"])
+
+    def test_oversize_item_is_its_own_batch(self):
+        batcher = Batcher(max_items=100, max_size=10)
+        batcher.add("a")
+
+        self.assertEqual(batcher.add("b" * 50), [["a"], ["b" * 50]])
+        self.assertEqual(len(batcher), 0)
+
+    def test_due_after_max_wait(self):
+        batcher = Batcher(max_items=100, max_size=1000, max_wait=0.01)
+        self.assertFalse(batcher.due())
+        batcher.add("a")
+        time.sleep(0.02)
+
+        self.assertTrue(batcher.due())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Set dummy API key for testing
+os.environ["GEMINI_API_KEY"] = "fake_key_for_test"
+
+# Add local-code-agent to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from module_mocks import ModuleMocks
+
+mocks = ModuleMocks({
+    # Mock the Gemini SDK; the prompt cache is tested against the in-memory backend
+    "google": MagicMock(),
+    "google.generativeai": MagicMock(),
+    "google.ai": MagicMock(),
+    "google.ai.generativelanguage": MagicMock(),
+})
+with mocks:
+    from agent.agents import create_agent
+    from agent import prompt_cache
+    from agent.prompt_cache import InMemoryCacheBackend, PromptCache, GeminiCacheBackend
+    import config
+
+def setUpModule():
+    mocks.start()
+
+def tearDownModule():
+    mocks.stop()
+
+class TestPromptCache(unittest.TestCase):
+    def setUp(self):
+        self.base_model = MagicMock()
+        self.backend = InMemoryCacheBackend(lambda tool_names: self.base_model)
+        self.cache = PromptCache(self.backend)
+
+    def sent_messages(self):
+        return self.base_model.generate_content.call_args[0][0]
+
+    def test_prefix_is_created_once_and_reused(self):
+        agent = create_agent("SYSTEM", ["read_file"], prompt_cache=self.cache,
+                             prefix=[{"role": "user", "parts": ["CONTEXT"]}])
+
+        agent("first", [])
+        agent("second", [{"role": "model", "parts": ["earlier"]}])
+
+        self.assertEqual(len(self.backend.created), 1)
+        self.assertEqual(self.cache.hits, 1)
+        # The model receives the same prompt as without caching
+        self.assertEqual(self.sent_messages(), [
+            {"role": "user", "parts": ["SYSTEM"]},
+            {"role": "user", "parts": ["CONTEXT"]},
+            {"role": "model", "parts": ["earlier"]},
+            {"role": "user", "parts": ["second"]},
+        ])
+
+    def test_cached_model_receives_only_the_delta(self):
+        cached_model = MagicMock()
+        backend = MagicMock()
+        backend.create.return_value = cached_model
+        agent = create_agent("SYSTEM", [], prompt_cache=PromptCache(backend))
+
+        agent("question", [])
+
+        cached_model.generate_content.assert_called_once_with(
+            [{"role": "user", "parts": ["question"]}], stream=False
+        )
+
+    def test_different_prefixes_are_cached_separately(self):
+        self.cache.get_model("SYSTEM", [], [{"role": "user", "parts": ["a"]}])
+        self.cache.get_model("SYSTEM", [], [{"role": "user", "parts": ["b"]}])
+
+        self.assertEqual(len(self.backend.created), 2)
+
+    def test_small_prefix_is_not_cached(self):
+        cache = PromptCache(self.backend, min_tokens=1000)
+
+        self.assertIsNone(cache.get_model("SYSTEM", []))
+        self.assertEqual(self.backend.created, [])
+
+    def test_backend_failure_falls_back_to_full_prompt(self):
+        backend = MagicMock()
+        backend.create.side_effect = RuntimeError("cached content too small")
+        cache = PromptCache(backend)
+
+        self.assertIsNone(cache.get_model("SYSTEM", []))
+        self.assertIsNone(cache.get_model("SYSTEM", []))
+        self.assertEqual(backend.create.call_count, 1)
+
+    def test_model_is_recreated_before_its_cached_content_expires(self):
+        cache = PromptCache(self.backend, ttl=100, refresh_margin=10)
+        with patch("agent.prompt_cache.time") as clock:
+            clock.monotonic.side_effect = [0, 50, 95, 95]
+            first = cache.get_model("SYSTEM", [])
+            self.assertIs(cache.get_model("SYSTEM", []), first)
+            self.assertIsNot(cache.get_model("SYSTEM", []), first)
+
+        self.assertEqual(len(self.backend.created), 2)
+
+    def test_missing_cached_content_is_created_again(self):
+        class NotFound(Exception):
+            code = 404
+
+        expired_model, fresh_model = MagicMock(), MagicMock()
+        expired_model.generate_content.side_effect = NotFound("CachedContent not found (or permission denied)")
+        fresh_model.generate_content.return_value = "answer"
+        backend = MagicMock()
+        backend.create.side_effect = [expired_model, fresh_model]
+        agent = create_agent("SYSTEM", [], prompt_cache=PromptCache(backend))
+
+        self.assertEqual(agent("question", []), "answer")
+        self.assertEqual(backend.create.call_count, 2)
+
+    def test_other_errors_of_cached_model_are_raised(self):
+        cached_model = MagicMock()
+        cached_model.generate_content.side_effect = RuntimeError("quota exceeded")
+        backend = MagicMock()
+        backend.create.return_value = cached_model
+        agent = create_agent("SYSTEM", [], prompt_cache=PromptCache(backend))
+
+        with self.assertRaises(RuntimeError):
+            agent("question", [])
+        self.assertEqual(backend.create.call_count, 1)
+
+class FakeCachedContent:
+    """
+    Stands in for google.generativeai.caching.CachedContent and, like the API,
+    rejects contents below the model's minimum size.
+    """
+    created = []
+
+    @classmethod
+    def create(cls, model, system_instruction=None, contents=None, tools=None, ttl=None):
+        texts = [system_instruction] + ["".join(m["parts"]) for m in contents or []]
+        tokens = sum(len(text) // 4 for text in texts)
+        minimum = prompt_cache.CACHED_CONTENT_MIN_TOKENS[model.split("/")[-1]]
+        if tokens < minimum:
+            raise ValueError(f"400 Cached content is too small. total_token_count={tokens}, min_total_token_count={minimum}")
+        cls.created.append(model)
+        return MagicMock()
+
+class TestGeminiCacheBackend(unittest.TestCase):
+    def setUp(self):
+        FakeCachedContent.created = []
+        sys.modules["google.generativeai"].caching.CachedContent = FakeCachedContent
+        with patch.object(config, "PROMPT_CACHE_ENABLED", True), patch.object(prompt_cache, "_prompt_cache", None):
+            self.cache = prompt_cache.get_prompt_cache()
+
+    def test_default_minimum_is_the_models(self):
+        self.assertIsInstance(self.cache.backend, GeminiCacheBackend)
+        self.assertEqual(self.cache.min_tokens, 32768)
+
+    def test_prefix_below_the_api_minimum_is_sent_in_full(self):
+        # Large enough for the old 1024-token default, still rejected by the API
+        prefix = [{"role": "user", "parts": ["x" * 4 * 5000]}]
+
+        self.assertIsNone(self.cache.get_model("SYSTEM", [], prefix))
+        self.assertEqual(FakeCachedContent.created, [])
+        self.assertEqual(self.cache.misses, 0)
+
+    def test_prefix_above_the_api_minimum_is_cached(self):
+        prefix = [{"role": "user", "parts": ["x" * 4 * 33000]}]
+
+        self.assertIsNotNone(self.cache.get_model("SYSTEM", [], prefix))
+        self.assertIsNotNone(self.cache.get_model("SYSTEM", [], prefix))
+        self.assertEqual(FakeCachedContent.created, [f"models/{config.GEMINI_MODEL}"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,19 +4,6 @@ import unittest
 from unittest.mock import MagicMock
 import os
 
-# Mock chromadb
-sys.modules["chromadb"] = MagicMock()
-# Mock tree_sitter_languages
-sys.modules["tree_sitter_languages"] = MagicMock()
-# Mock google
-sys.modules["google"] = MagicMock()
-# Mock google.generativeai
-sys.modules["google.generativeai"] = MagicMock()
-# Mock numpy
-sys.modules["numpy"] = MagicMock()
-# Mock sentence_transformers
-sys.modules["sentence_transformers"] = MagicMock()
-
 # Set dummy API key for testing
 os.environ["GEMINI_API_KEY"] = "fake_key_for_test"
 
@@ -26,8 +13,31 @@ project_root = os.path.abspath(os.path.join(current_dir, '..'))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from agent.tools import read_file
-import config
+from module_mocks import ModuleMocks
+
+mocks = ModuleMocks({
+    # Mock chromadb
+    "chromadb": MagicMock(),
+    # Mock tree_sitter_languages
+    "tree_sitter_languages": MagicMock(),
+    # Mock google
+    "google": MagicMock(),
+    # Mock google.generativeai
+    "google.generativeai": MagicMock(),
+    # Mock numpy
+    "numpy": MagicMock(),
+    # Mock sentence_transformers
+    "sentence_transformers": MagicMock(),
+})
+with mocks:
+    from agent.tools import read_file
+    import config
+
+def setUpModule():
+    mocks.start()
+
+def tearDownModule():
+    mocks.stop()
 
 class TestReadFileSecurity(unittest.TestCase):
     def setUp(self):
@@ -0,0 +1,157 @@
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+class MockPart:
+    def __init__(self, text=None, function_call=None, function_response=None):
+        self.text = text
+        self.function_call = function_call
+        self.function_response = function_response
+
+class MockFunctionCall:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+class MockFunctionResponse:
+    def __init__(self, name, response):
+        self.name = name
+        self.response = response
+
+class MockContent:
+    def __init__(self, role=None, parts=None):
+        self.role = role
+        self.parts = parts
+
+mock_generativelanguage = MagicMock()
+mock_generativelanguage.Part = MockPart
+mock_generativelanguage.FunctionCall = MockFunctionCall
+mock_generativelanguage.FunctionResponse = MockFunctionResponse
+mock_generativelanguage.Content = MockContent
+
+# Set dummy API key for testing
+os.environ["GEMINI_API_KEY"] = "fake_key_for_test"
+
+# Add local-code-agent to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from module_mocks import ModuleMocks
+
+mocks = ModuleMocks({
+    "google": MagicMock(),
+    "google.generativeai": MagicMock(),
+    "google.ai": MagicMock(),
+    "google.ai.generativelanguage": mock_generativelanguage,
+})
+with mocks:
+    from agent.agents import create_agent
+    from agent.execution import execute_agent_loop
+    from agent.response_cache import ResponseCache, ResponseCacheMiss, request_key
+
+def setUpModule():
+    mocks.start()
+
+def tearDownModule():
+    mocks.stop()
+
+class FakeResponse:
+    def __init__(self, *parts):
+        self.parts = list(parts)
+        self.candidates = [MagicMock(content=MockContent(role="model", parts=list(parts)))]
+
+    @property
+    def text(self):
+        return "".join(p.text for p in self.parts if p.text)
+
+    def __iter__(self):
+        yield self
+
+class FakeModel:
+    """
+    Asks for one read_file call, then answers with text.
+    """
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, messages, stream=False):
+        self.calls += 1
+        if self.calls == 1:
+            return FakeResponse(MockPart(function_call=MockFunctionCall("read_file", {"path": "a.py"})))
+        return FakeResponse(MockPart(text="a.py defines main"))
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_loop(self, cache, model):
+        agent_fn = create_agent("SYSTEM", ["read_file"], response_cache=cache)
+        with patch("agent.agents._build_model", return_value=model):
+            return execute_agent_loop(
+                lambda hist: agent_fn("What is in a.py?", hist),
+                [],
+                lambda name, args: f"def main(): pass  # {args['path']}",
+                max_iterations=5
+            )
+
+    def test_record_then_replay_offline(self):
+        model = FakeModel()
+        recorded = self.run_loop(ResponseCache(self.directory, "record"), model)
+        self.assertEqual(model.calls, 2)
+
+        offline = MagicMock()
+        offline.generate_content.side_effect = AssertionError("network call in replay")
+        replay_cache = ResponseCache(self.directory, "replay")
+        replayed = self.run_loop(replay_cache, offline)
+
+        self.assertEqual(replayed, recorded)
+        self.assertEqual(replay_cache.hits, 2)
+        self.assertEqual(replay_cache.misses, 0)
+
+    def test_record_mode_reuses_cached_responses(self):
+        cache = ResponseCache(self.directory, "record")
+        self.run_loop(cache, FakeModel())
+        model = FakeModel()
+        self.run_loop(cache, model)
+
+        self.assertEqual(model.calls, 0)
+
+    def test_replay_miss_raises(self):
+        cache = ResponseCache(self.directory, "replay")
+
+        with self.assertRaises(ResponseCacheMiss):
+            cache.generate("model", [], [{"role": "user", "parts": ["hi"]}], lambda: None)
+
+    def test_streamed_response_is_recorded_after_consumption(self):
+        cache = ResponseCache(self.directory, "record")
+        messages = [{"role": "user", "parts": ["hi"]}]
+        stream = cache.generate("model", [], messages, lambda: FakeResponse(MockPart(text="hello")), stream=True)
+
+        self.assertIsNone(cache.load(request_key("model", [], messages)))
+        self.assertEqual([chunk.text for chunk in stream], ["hello"])
+        self.assertEqual(stream.parts[0].text, "hello")
+        self.assertIsNotNone(cache.load(request_key("model", [], messages)))
+
+    def test_key_depends_on_model_tools_and_messages(self):
+        messages = [{"role": "user", "parts": ["hi"]}]
+        key = request_key("model", ["read_file"], messages)
+
+        self.assertEqual(key, request_key("model", ["read_file"], [{"role": "user", "parts": ["hi"]}]))
+        self.assertNotEqual(key, request_key("other", ["read_file"], messages))
+        self.assertNotEqual(key, request_key("model", [], messages))
+        self.assertNotEqual(key, request_key("model", ["read_file"], [{"role": "user", "parts": ["bye"]}]))
+
+    def test_unknown_mode_rejected(self):
+        with self.assertRaises(ValueError):
+            ResponseCache(self.directory, "sometimes")
+
+if __name__ == "__main__":
+    unittest.main()
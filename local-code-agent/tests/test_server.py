@@ -0,0 +1,158 @@
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+# Add local-code-agent to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from agent.server import AgentServer, AgentClient, LatencyStats, ServerError
+
+class FakeOrchestrator:
+    """
+    Answers with the query and the number of queries seen by this instance, so
+    tests can tell sessions apart. Queries starting with "wait" block on `gate`.
+    """
+    gate = None
+
+    def __init__(self):
+        self.stream = False
+        self.on_text = None
+        self.history = []
+
+    def run(self, query):
+        if query.startswith("wait") and self.gate is not None:
+            self.gate.wait(timeout=5)
+        if query == "fail":
+            raise RuntimeError("model unavailable")
+        self.history.append(query)
+        if self.stream:
+            self.on_text("chunk 1 ")
+            self.on_text("chunk 2")
+        return f"{query} #{len(self.history)}"
+
+class ServerTestMixin:
+    def start(self, **address):
+        self.agent = AgentServer(orchestrator_factory=FakeOrchestrator)
+        self.server = self.agent.make_server(**address)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join(timeout=5)
+
+class TestUnixSocketServer(ServerTestMixin, unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.test_dir, "agent.sock")
+        self.start(socket_path=self.socket_path)
+        self.client = AgentClient(socket_path=self.socket_path, timeout=10)
+
+    def tearDown(self):
+        FakeOrchestrator.gate = None
+        self.stop()
+        shutil.rmtree(self.test_dir)
+
+    def test_query_creates_session_and_keeps_its_state(self):
+        first = self.client.query("hello")
+        second = self.client.query("again", session_id=first["session_id"])
+        other = self.client.query("hello")
+
+        self.assertEqual(first["answer"], "hello #1")
+        self.assertEqual(second["answer"], "again #2")
+        self.assertEqual(other["answer"], "hello #1")
+        self.assertNotEqual(first["session_id"], other["session_id"])
+
+    def test_streamed_query(self):
+        chunks = []
+
+        result = self.client.query("stream me", on_text=chunks.append)
+
+        self.assertEqual(chunks, ["chunk 1 ", "chunk 2"])
+        self.assertEqual(result["answer"], "stream me #1")
+
+    def test_health_and_latency(self):
+        self.client.query("hello")
+
+        health = self.client.health()
+        latency = self.client.latency()
+
+        self.assertEqual(health["status"], "ok")
+        self.assertEqual(health["sessions"], 1)
+        self.assertEqual(latency["query"]["count"], 1)
+        self.assertIn("p95_ms", latency["query"])
+
+    def test_sessions_run_concurrently(self):
+        FakeOrchestrator.gate = threading.Event()
+        blocked = {}
+        thread = threading.Thread(target=lambda: blocked.update(self.client.query("wait for me")))
+        thread.start()
+
+        # A second session is answered while the first one is still running
+        self.assertEqual(self.client.query("quick")["answer"], "quick #1")
+        self.assertEqual(blocked, {})
+
+        FakeOrchestrator.gate.set()
+        thread.join(timeout=5)
+        self.assertEqual(blocked["answer"], "wait for me #1")
+
+    def test_errors(self):
+        with self.assertRaises(ServerError):
+            self.client.query("hello", session_id="missing")
+        with self.assertRaises(ServerError):
+            self.client.query("fail")
+        with self.assertRaises(ServerError):
+            self.client.query("fail", on_text=lambda text: None)
+
+        session_id = self.client.create_session()
+        self.assertTrue(self.client.close_session(session_id))
+        with self.assertRaises(ServerError):
+            self.client.close_session(session_id)
+
+    def test_refuses_socket_of_running_server(self):
+        with self.assertRaises(ServerError):
+            AgentServer(orchestrator_factory=FakeOrchestrator).make_server(socket_path=self.socket_path)
+
+class TestHttpServer(ServerTestMixin, unittest.TestCase):
+    def setUp(self):
+        self.start(host="127.0.0.1", port=0)
+        self.client = AgentClient(host="127.0.0.1", port=self.server.server_address[1], timeout=10)
+
+    def tearDown(self):
+        self.stop()
+
+    def test_query_over_http(self):
+        self.assertEqual(self.client.query("hello")["answer"], "hello #1")
+        self.assertEqual(self.client.health()["status"], "ok")
+
+class TestSessions(unittest.TestCase):
+    def test_idle_sessions_expire(self):
+        agent = AgentServer(orchestrator_factory=FakeOrchestrator, session_ttl=60)
+        session = agent.create_session()
+        session.last_used -= 120
+
+        agent.expire_sessions()
+
+        self.assertIsNone(agent.get_session(session.id))
+
+    def test_latency_percentiles(self):
+        stats = LatencyStats()
+        for ms in range(1, 101):
+            stats.record("query", ms / 1000)
+
+        summary = stats.summary()["query"]
+
+        self.assertEqual(summary["count"], 100)
+        self.assertEqual(summary["p50_ms"], 51.0)
+        self.assertEqual(summary["p95_ms"], 96.0)
+        self.assertEqual(summary["max_ms"], 100.0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import sys
+import unittest
+from unittest.mock import patch
+import os
+import shutil
+import tempfile
+
+# Add local-code-agent to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from agent import structure, walker
+from agent.structure import code_structure
+
+class TestCodeStructure(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = os.path.join(os.path.realpath(tempfile.mkdtemp()), "proj")
+        os.makedirs(self.test_dir)
+        structure.invalidate()
+        walker.clear_cache()
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.test_dir))
+
+    def write(self, relative, content="x = 1"):
+        path = os.path.join(self.test_dir, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def touch_dir(self, relative=""):
+        # Make sure the directory's mtime moves even on coarse-grained filesystems
+        path = os.path.join(self.test_dir, relative)
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+
+    def test_tree_with_counts_and_collapsed_depth(self):
+        self.write("main.py")
+        self.write("README.md")
+        self.write("image.png")
+        self.write("pkg/a.py")
+        self.write("pkg/sub/b.py")
+        self.write("pkg/sub/deep/c.py")
+
+        self.assertEqual(code_structure(self.test_dir, max_depth=2).splitlines(), [
+            "proj/ (5 files)",
+            "  pkg/ (3 files)",
+            "    sub/ (2 files in 1 subdirectory)",
+            "    a.py",
+            "  README.md",
+            "  main.py",
+        ])
+
+    def test_large_directories_are_summarized(self):
+        for i in range(30):
+            self.write(f"gen/m{i}.py")
+        self.write("gen/notes.md")
+
+        output = code_structure(self.test_dir)
+
+        self.assertIn("gen/ (31 files)", output)
+        self.assertIn("... 31 files (.py: 30, .md: 1)", output)
+        self.assertNotIn("m0.py", output)
+
+    def test_depth_shrinks_to_fit_max_entries(self):
+        for name in ("a", "b", "c"):
+            self.write(f"{name}/x/y.py")
+
+        lines = code_structure(self.test_dir, max_depth=3, max_entries=4).splitlines()
+
+        self.assertEqual(lines[:4], ["proj/ (3 files)", "  a/ (1 file in 1 subdirectory)",
+                                     "  b/ (1 file in 1 subdirectory)", "  c/ (1 file in 1 subdirectory)"])
+        self.assertIn("depth reduced from 3 to 1", lines[-1])
+
+    def test_path_argument_and_errors(self):
+        self.write("pkg/a.py")
+        self.write("node_modules/lib.js")
+
+        self.assertEqual(code_structure(self.test_dir, path="pkg"), "pkg/ (1 file)\n  a.py")
+        self.assertTrue(code_structure(self.test_dir, path="missing").startswith("Error"))
+        self.assertTrue(code_structure(self.test_dir, path="node_modules").startswith("Error"))
+
+    def test_cache_is_refreshed_by_mtime_and_invalidation(self):
+        self.write("a.py")
+        code_structure(self.test_dir)
+
+        with patch("agent.walker.Walker.walk", side_effect=AssertionError("tree should be cached")):
+            self.assertIn("a.py", code_structure(self.test_dir))
+
+        self.write("b.py")
+        self.touch_dir()
+        self.assertIn("b.py", code_structure(self.test_dir))
+
+        # Editing .gitignore in place does not change the directory's mtime
+        gitignore = self.write(".gitignore", "")
+        self.touch_dir()
+        code_structure(self.test_dir)
+        with open(gitignore, "w", encoding="utf-8") as f:
+            f.write("b.py\n")
+        structure.invalidate([gitignore])
+        self.assertNotIn("b.py", code_structure(self.test_dir))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import sys
+import os
+import unittest
+
+# Add local-code-agent to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from agent.symbols import SymbolIndex, extract_symbols
+
+class FakeNode:
+    """
+    Minimal stand-in for a tree-sitter node: type, byte range, start/end points,
+    children and named fields.
+    """
+    def __init__(self, source, type, text, start=0, children=(), fields=None, occurrence=0):
+        self.type = type
+        self.start_byte = _find(source, text, start, occurrence)
+        self.end_byte = self.start_byte + len(text.encode("utf-8"))
+        self.start_point = (source[:self.start_byte].count(b"\n"), 0)
+        self.end_point = (source[:self.end_byte].count(b"\n"), 0)
+        self.children = list(children)
+        self.fields = fields or {}
+
+    def child_by_field_name(self, name):
+        return self.fields.get(name)
+
+def _find(source, text, start, occurrence):
+    position = start
+    for _ in range(occurrence + 1):
+        position = source.index(text.encode("utf-8"), position) + (1 if _ < occurrence else 0)
+    return position
+
+SOURCE = b"""import os
+from agent.utils import estimate_tokens
+
+class Index:
+    def save(self):
+        return estimate_tokens(os.sep)
+
+def build():
+    Index().save()
+"""
+
+def build_tree():
+    s = SOURCE
+    n = lambda *args, **kwargs: FakeNode(s, *args, **kwargs)
+
+    # Like tree-sitter, dotted names wrap identifier nodes
+    import_os = n("import_statement", "import os",
+                  children=[n("dotted_name", "os", children=[n("identifier", "os")])])
+    module_name = n("dotted_name", "agent.utils")
+    import_from = n("import_from_statement", "from agent.utils import estimate_tokens",
+                    children=[module_name, n("dotted_name", "estimate_tokens", children=[n("identifier", "estimate_tokens")])],
+                    fields={"module_name": module_name})
+
+    save_name = n("identifier", "save")
+    estimate_call_fn = n("identifier", "estimate_tokens", occurrence=1)
+    estimate_call = n("call", "estimate_tokens(os.sep)",
+                      children=[estimate_call_fn, n("identifier", "os", occurrence=1)],
+                      fields={"function": estimate_call_fn})
+    save_def = n("function_definition", "def save(self):\n        return estimate_tokens(os.sep)",
+                 children=[save_name, n("identifier", "self"), estimate_call],
+                 fields={"name": save_name})
+    class_name = n("identifier", "Index")
+    class_def = n("class_definition", "class Index:\n    def save(self):\n        return estimate_tokens(os.sep)",
+                  children=[class_name, save_def], fields={"name": class_name})
+
+    build_name = n("identifier", "build")
+    index_fn = n("identifier", "Index", occurrence=1)
+    index_call = n("call", "Index()", children=[index_fn], fields={"function": index_fn})
+    save_attr = n("attribute", "Index().save", children=[index_call, n("identifier", "save", occurrence=1)])
+    save_call = n("call", "Index().save()", children=[save_attr], fields={"function": save_attr})
+    build_def = n("function_definition", "def build():\n    Index().save()",
+                  children=[build_name, save_call], fields={"name": build_name})
+
+    return n("module", SOURCE.decode("utf-8"), children=[import_os, import_from, class_def, build_def])
+
+class TestExtractSymbols(unittest.TestCase):
+    def setUp(self):
+        self.symbols = extract_symbols(build_tree(), SOURCE)
+
+    def test_definitions_with_scope(self):
+        self.assertEqual(
+            [(name, qualname, kind) for name, qualname, kind, _, _ in self.symbols["definitions"]],
+            [("Index", "Index", "class"), ("save", "Index.save", "method"), ("build", "build", "function")]
+        )
+
+    def test_call_edges(self):
+        self.assertEqual(self.symbols["calls"], [
+            ("Index.save", "estimate_tokens", 5),
+            ("build", "save", 8),
+            ("build", "Index", 8),
+        ])
+
+    def test_imports(self):
+        self.assertEqual(self.symbols["imports"], [
+            ("os", None, 0),
+            ("agent.utils", "estimate_tokens", 1),
+        ])
+
+    def test_references_exclude_definition_names(self):
+        names = {(name, line) for name, line, _ in self.symbols["references"]}
+
+        self.assertIn(("estimate_tokens", 5), names)
+        self.assertIn(("save", 8), names)
+        self.assertNotIn(("save", 4), names)
+        self.assertIn(("Index", 8, "Index().save()"), self.symbols["references"])
+
+class TestSymbolIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = SymbolIndex(":memory:")
+        self.index.replace_file("src/index.py", extract_symbols(build_tree(), SOURCE))
+
+    def test_find_definition_by_name_and_qualname(self):
+        self.assertEqual(self.index.find_definition("save")[0]["qualname"], "Index.save")
+        self.assertEqual(self.index.find_definition("Index.save")[0]["start_line"], 4)
+        self.assertEqual(self.index.find_definition("missing"), [])
+
+    def test_find_references(self):
+        lines = [r["line"] for r in self.index.find_references("estimate_tokens")]
+
+        self.assertEqual(lines, [1, 5])
+
+    def test_callers_of(self):
+        callers = self.index.callers_of("Index.save")
+
+        self.assertEqual([(c["caller"], c["line"]) for c in callers], [("build", 8)])
+
+    def test_replace_and_remove_file(self):
+        self.index.replace_file("src/index.py", {"definitions": [("other", "other", "function", 0, 1)]})
+        self.assertEqual(self.index.find_definition("save"), [])
+        self.assertEqual(len(self.index.find_definition("other")), 1)
+
+        self.index.remove_file("src/index.py")
+        self.assertEqual(self.index.find_definition("other"), [])
+
+if __name__ == "__main__":
+    unittest.main()
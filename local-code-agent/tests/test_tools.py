@@ -5,27 +5,21 @@ from unittest.mock import MagicMock
 
 # Mock chromadb
 mock_chromadb = MagicMock()
-sys.modules["chromadb"] = mock_chromadb
 
 # Mock tree_sitter_languages
 mock_tsl = MagicMock()
-sys.modules["tree_sitter_languages"] = mock_tsl
 
 # Mock google
 mock_google = MagicMock()
-sys.modules["google"] = mock_google
 
 # Mock google.generativeai
 mock_genai = MagicMock()
-sys.modules["google.generativeai"] = mock_genai
 
 # Mock numpy
 mock_np = MagicMock()
-sys.modules["numpy"] = mock_np
 
 # Mock sentence_transformers
 mock_st = MagicMock()
-sys.modules["sentence_transformers"] = mock_st
 
 import os
 # Set dummy API key for testing
@@ -36,7 +30,26 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, '..'))
 sys.path.insert(0, project_root)
 
-from agent.tools import ask_orchestrator, execute_tool
+from unittest.mock import patch
+from module_mocks import ModuleMocks
+
+mocks = ModuleMocks({
+    "chromadb": mock_chromadb,
+    "tree_sitter_languages": mock_tsl,
+    "google": mock_google,
+    "google.generativeai": mock_genai,
+    "numpy": mock_np,
+    "sentence_transformers": mock_st,
+})
+with mocks:
+    from agent.tools import ask_orchestrator, execute_tool
+    from agent.symbols import SymbolIndex
+
+def setUpModule():
+    mocks.start()
+
+def tearDownModule():
+    mocks.stop()
 
 class TestTools(unittest.TestCase):
     def test_ask_orchestrator_returns_error_string(self):
@@ -50,5 +63,65 @@ class TestTools(unittest.TestCase):
         # It should NOT start with "Error executing tool" because no exception was raised.
         self.assertEqual(result, "Error: This tool is only available when running under the Orchestrator.")
 
+class TestNonInteractiveTools(unittest.TestCase):
+    @patch("config.INTERACTIVE", False)
+    @patch("builtins.input", side_effect=AssertionError("must not prompt"))
+    def test_prompting_tools_refuse_without_terminal(self, mock_input):
+        written = execute_tool("write_file", {"path": "never_written.txt", "content": "x"})
+        ran = execute_tool("run_command", {"command": "git status"})
+        answered = execute_tool("ask_user", {"question": "Which file?"})
+
+        self.assertIn("server mode", written)
+        self.assertIn("server mode", ran)
+        self.assertIn("server mode", answered)
+        self.assertFalse(os.path.exists("never_written.txt"))
+
+class TestSymbolTools(unittest.TestCase):
+    def setUp(self):
+        self.index = SymbolIndex(":memory:")
+        self.index.replace_file("agent/core.py", {
+            "definitions": [("run_agent", "run_agent", "function", 26, 60)],
+            "references": [("search_code", 38, "context = search_code(user_query)")],
+            "calls": [("run_agent", "search_code", 38)],
+        })
+        self.patcher = patch("agent.indexer.get_symbol_index", return_value=self.index)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_find_definition(self):
+        result = execute_tool("find_definition", {"name": "run_agent"})
+        self.assertEqual(result, "agent/core.py:27-61 function run_agent")
+
+    def test_find_references(self):
+        result = execute_tool("find_references", {"name": "search_code"})
+        self.assertEqual(result, "agent/core.py:39: context = search_code(user_query)")
+
+    def test_callers_of(self):
+        self.assertEqual(execute_tool("callers_of", {"name": "search_code"}), "run_agent (agent/core.py:39)")
+        self.assertEqual(execute_tool("callers_of", {"name": "nothing"}), "No callers of nothing found in the index.")
+
+    def test_repo_selects_symbol_indexes(self):
+        other = SymbolIndex(":memory:")
+        other.replace_file("server.py", {
+            "definitions": [("handle", "handle", "function", 3, 9)],
+            "references": [("search_code", 5, "search_code(query)")],
+            "calls": [("handle", "search_code", 5)],
+        })
+        indexes = {"default": self.index, "other": other}
+        namespaces = {"default": "/repo", "other": "/other"}
+        with patch("agent.indexer.get_symbol_index", side_effect=indexes.get), \
+                patch("agent.indexer.get_namespaces", return_value=namespaces):
+            self.assertEqual(execute_tool("find_definition", {"name": "handle", "repo": "other"}),
+                             "server.py:4-10 function handle")
+            self.assertEqual(execute_tool("callers_of", {"name": "search_code", "repo": "*"}),
+                             "[default] run_agent (agent/core.py:39)\n[other] handle (server.py:6)")
+            self.assertEqual(execute_tool("find_references", {"name": "search_code", "repo": "default,other"}),
+                             "[default] agent/core.py:39: context = search_code(user_query)\n"
+                             "[other] server.py:6: search_code(query)")
+            self.assertIn("Unknown repository: missing",
+                          execute_tool("find_definition", {"name": "handle", "repo": "missing"}))
+
 if __name__ == "__main__":
     unittest.main()
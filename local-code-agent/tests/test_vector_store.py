@@ -0,0 +1,320 @@
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+
+# Add local-code-agent to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from agent.vector_store import (
+    LocalVectorStore, build_ivf, open_vector_store, measure_recall, quantize_int8, quantize_binary
+)
+
+def random_vectors(count, dim=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+
+class TestLocalVectorStore(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.store_dir = os.path.join(self.test_dir, "store")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def fill(self, store, vectors):
+        store.upsert(
+            ids=[f"chunk{i}" for i in range(len(vectors))],
+            documents=[f"doc {i}" for i in range(len(vectors))],
+            metadatas=[{"file_path": f"f{i % 3}.py", "start_line": i, "end_line": i + 1} for i in range(len(vectors))],
+            embeddings=vectors.tolist()
+        )
+
+    def test_query_returns_nearest_with_metadata(self):
+        vectors = random_vectors(50)
+        store = LocalVectorStore(self.store_dir)
+        self.fill(store, vectors)
+
+        result = store.query(query_embeddings=[vectors[7].tolist()], n_results=3)
+
+        self.assertEqual(result["ids"][0][0], "chunk7")
+        self.assertEqual(result["documents"][0][0], "doc 7")
+        self.assertEqual(result["metadatas"][0][0], {"file_path": "f1.py", "start_line": 7, "end_line": 8})
+        self.assertAlmostEqual(result["distances"][0][0], 0.0, places=5)
+        self.assertEqual(len(result["ids"][0]), 3)
+
+    def test_flush_persists_and_reopens_memory_mapped(self):
+        vectors = random_vectors(30)
+        store = LocalVectorStore(self.store_dir)
+        self.fill(store, vectors)
+        store.flush()
+
+        reopened = LocalVectorStore(self.store_dir)
+        result = reopened.query(query_embeddings=[vectors[12].tolist()], n_results=1)
+
+        self.assertEqual(reopened.count(), 30)
+        self.assertIsInstance(reopened._vectors, np.memmap)
+        self.assertEqual(result["ids"][0], ["chunk12"])
+        self.assertEqual(result["metadatas"][0][0]["start_line"], 12)
+
+    def test_delete_and_replace(self):
+        vectors = random_vectors(10)
+        store = LocalVectorStore(self.store_dir)
+        self.fill(store, vectors)
+        store.flush()
+
+        store.delete(ids=["chunk3"])
+        store.upsert(ids=["chunk4"], documents=["new doc"], metadatas=[{"file_path": "g.py"}],
+                     embeddings=[vectors[3].tolist()])
+
+        result = store.query(query_embeddings=[vectors[3].tolist()], n_results=1)
+        self.assertEqual(result["ids"][0], ["chunk4"])
+        self.assertEqual(result["documents"][0], ["new doc"])
+        self.assertEqual(store.count(), 9)
+
+        store.flush()
+        reopened = LocalVectorStore(self.store_dir)
+        self.assertEqual(reopened.count(), 9)
+        self.assertEqual(reopened.query(query_embeddings=[vectors[3].tolist()], n_results=1)["metadatas"][0],
+                         [{"file_path": "g.py"}])
+
+    def test_get_returns_stored_chunks(self):
+        store = LocalVectorStore(self.store_dir)
+        self.fill(store, random_vectors(4))
+        store.flush()
+        store = LocalVectorStore(self.store_dir)
+        store.delete(ids=["chunk1"])
+
+        result = store.get(["chunk2", "chunk1", "missing"])
+
+        self.assertEqual(result["ids"], ["chunk2"])
+        self.assertEqual(result["documents"], ["doc 2"])
+        self.assertEqual(result["metadatas"], [{"file_path": "f2.py", "start_line": 2, "end_line": 3}])
+
+    def test_empty_store(self):
+        store = LocalVectorStore(self.store_dir)
+        result = store.query(query_embeddings=[[1.0, 0.0]], n_results=5)
+
+        self.assertEqual(result["ids"], [[]])
+        self.assertEqual(store.count(), 0)
+
+    def test_ivf_recall_against_exhaustive_search(self):
+        vectors = random_vectors(2000, dim=32)
+        store = LocalVectorStore(self.store_dir, ivf_min_rows=1000, nprobe=8)
+        self.fill(store, vectors)
+        store.flush()
+        self.assertGreater(store._ivf_size, 0)
+
+        queries = random_vectors(20, dim=32, seed=1)
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        found = 0
+        for query in queries:
+            exact = np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:10]
+            approx = store.query(query_embeddings=[query.tolist()], n_results=10)["ids"][0]
+            found += len({f"chunk{i}" for i in exact} & set(approx))
+
+        self.assertGreaterEqual(found / (20 * 10), 0.5)
+
+    def test_rows_added_after_ivf_build_are_searched(self):
+        vectors = random_vectors(1200, dim=16)
+        store = LocalVectorStore(self.store_dir, ivf_min_rows=1000, nprobe=1)
+        self.fill(store, vectors)
+        store.flush()
+
+        extra = random_vectors(1, dim=16, seed=5)
+        store.upsert(ids=["late"], documents=["late"], metadatas=[{}], embeddings=extra.tolist())
+
+        self.assertEqual(store.query(query_embeddings=extra.tolist(), n_results=1)["ids"][0], ["late"])
+
+    def test_float16_storage(self):
+        vectors = random_vectors(20)
+        store = LocalVectorStore(self.store_dir, dtype="float16")
+        self.fill(store, vectors)
+        store.flush()
+
+        reopened = LocalVectorStore(self.store_dir, dtype="float16")
+        self.assertEqual(reopened._vectors.dtype, np.float16)
+        self.assertEqual(reopened.query(query_embeddings=[vectors[5].tolist()], n_results=1)["ids"][0], ["chunk5"])
+
+    def test_build_ivf_covers_every_row_once(self):
+        vectors = random_vectors(500)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        centroids, rows, offsets = build_ivf(vectors, n_lists=10)
+
+        self.assertEqual(centroids.shape, (10, 16))
+        self.assertEqual(sorted(rows.tolist()), list(range(500)))
+        self.assertEqual(offsets[-1], 500)
+
+    def test_int8_quantization_keeps_recall(self):
+        vectors = random_vectors(1000, dim=32)
+        store = LocalVectorStore(self.store_dir, quantization="int8", rerank_factor=4)
+        self.fill(store, vectors)
+        store.flush()
+
+        reopened = LocalVectorStore(self.store_dir, quantization="int8")
+        self.assertEqual(reopened._codes.dtype, np.int8)
+        self.assertEqual(reopened.query(query_embeddings=[vectors[42].tolist()], n_results=1)["ids"][0], ["chunk42"])
+
+        stats = measure_recall(reopened, random_vectors(20, dim=32, seed=2), n_results=10)
+        self.assertEqual(stats["compression"], 4.0)
+        self.assertGreaterEqual(stats["recall"], 0.9)
+
+    def test_binary_quantization_reranks_on_full_vectors(self):
+        vectors = random_vectors(1000, dim=64)
+        store = LocalVectorStore(self.store_dir, quantization="binary", rerank_factor=10)
+        self.fill(store, vectors)
+        store.flush()
+
+        result = store.query(query_embeddings=[vectors[7].tolist()], n_results=3)
+        stats = measure_recall(store, vectors[:20] + random_vectors(20, dim=64, seed=3) * 0.1)
+
+        self.assertEqual(result["ids"][0][0], "chunk7")
+        # Distances come from the full-precision rerank, not from the codes
+        self.assertAlmostEqual(result["distances"][0][0], 0.0, places=5)
+        self.assertEqual(stats["compression"], 32.0)
+        self.assertGreaterEqual(stats["recall"], 0.5)
+
+    def test_writes_after_quantized_flush_keep_codes(self):
+        vectors = random_vectors(100)
+        store = LocalVectorStore(self.store_dir, quantization="binary")
+        self.fill(store, vectors)
+        store.flush()
+
+        store.delete(ids=["chunk2"])
+        store.upsert(ids=["chunk3"], documents=["moved"], metadatas=[{}], embeddings=[vectors[2].tolist()])
+
+        # The base segment is untouched, so its codes still serve the first pass
+        self.assertIsNotNone(store._codes)
+        result = store.query(query_embeddings=[vectors[2].tolist()], n_results=2)["ids"][0]
+        self.assertEqual(result[0], "chunk3")
+        self.assertNotIn("chunk2", result)
+
+    def test_small_changes_are_appended_without_rewriting_the_base(self):
+        vectors = random_vectors(1200)
+        store = LocalVectorStore(self.store_dir, ivf_min_rows=1000)
+        self.fill(store, vectors)
+        store.flush()
+        base_files = {store._path(name): os.stat(store._path(name)).st_ino
+                      for name in ("vectors.npy", "ids.bin", "ivf_rows.npy")}
+
+        store.delete(ids=["chunk1"])
+        store.upsert(ids=["chunk2", "new"], documents=["changed", "new"], metadatas=[{}, {"file_path": "n.py"}],
+                     embeddings=random_vectors(2, seed=7).tolist())
+        store.flush()
+
+        for path, inode in base_files.items():
+            self.assertEqual(os.stat(path).st_ino, inode)
+        reopened = LocalVectorStore(self.store_dir, ivf_min_rows=1000)
+        self.assertEqual(reopened._ivf_size, 1200)
+        self.assertEqual(reopened.count(), 1200)
+        self.assertEqual(sorted(reopened._deleted), [1, 2])
+        extra = random_vectors(2, seed=7)
+        self.assertEqual(reopened.query(query_embeddings=[extra[0].tolist()], n_results=1)["documents"][0], ["changed"])
+        self.assertEqual(reopened.query(query_embeddings=[extra[1].tolist()], n_results=1)["metadatas"][0],
+                         [{"file_path": "n.py"}])
+        self.assertNotIn("chunk1", reopened.query(query_embeddings=[vectors[1].tolist()], n_results=5)["ids"][0])
+
+    def test_compacts_once_changes_exceed_a_tenth(self):
+        vectors = random_vectors(1200)
+        store = LocalVectorStore(self.store_dir, ivf_min_rows=1000)
+        self.fill(store, vectors)
+        store.flush()
+
+        store.delete(ids=[f"chunk{i}" for i in range(150)])
+        store.flush()
+
+        reopened = LocalVectorStore(self.store_dir, ivf_min_rows=1000)
+        self.assertEqual(reopened._deleted, set())
+        self.assertEqual(len(reopened._vectors), 1050)
+        self.assertEqual(reopened._ivf_size, 1050)
+        self.assertEqual(sorted(os.listdir(self.store_dir)), ["gen-2", "header.json"])
+        self.assertFalse(any(name.startswith("tombstones") for name in os.listdir(reopened._path(""))))
+        self.assertEqual(reopened.query(query_embeddings=[vectors[500].tolist()], n_results=1)["ids"][0], ["chunk500"])
+
+    def test_interrupted_compaction_keeps_the_previous_generation(self):
+        vectors = random_vectors(1200)
+        store = LocalVectorStore(self.store_dir, ivf_min_rows=1000)
+        self.fill(store, vectors)
+        store.flush()
+        store.delete(ids=["chunk1"])
+        store.flush()
+
+        store.delete(ids=[f"chunk{i}" for i in range(150)])
+        with patch("agent.vector_store.build_ivf", side_effect=MemoryError):
+            with self.assertRaises(MemoryError):
+                store.flush()
+
+        reopened = LocalVectorStore(self.store_dir, ivf_min_rows=1000)
+        self.assertEqual(reopened.count(), 1199)
+        self.assertEqual(reopened.get(["chunk100"])["documents"], ["doc 100"])
+        self.assertEqual(reopened.query(query_embeddings=[vectors[100].tolist()], n_results=1)["ids"][0], ["chunk100"])
+
+        reopened.delete(ids=[f"chunk{i}" for i in range(150)])
+        reopened.flush()
+        self.assertEqual(sorted(os.listdir(self.store_dir)), ["gen-2", "header.json"])
+        self.assertEqual(LocalVectorStore(self.store_dir).count(), 1050)
+
+    def test_get_looks_up_ids_without_reading_the_ids_column(self):
+        vectors = random_vectors(500)
+        store = LocalVectorStore(self.store_dir)
+        self.fill(store, vectors)
+        store.flush()
+        # Unflushed changes, seen by store only
+        store.delete(ids=["chunk7"])
+        store.upsert(ids=["chunk9"], documents=["changed"], metadatas=[{}], embeddings=[vectors[0].tolist()])
+
+        reopened = LocalVectorStore(self.store_dir)
+        reads = []
+        ids = reopened._ids
+
+        class CountingColumn:
+            def __len__(self):
+                return len(ids)
+
+            def __getitem__(self, i):
+                reads.append(i)
+                return ids[i]
+
+        reopened._ids = CountingColumn()
+        result = reopened.get(["chunk42", "chunk7", "missing"])
+
+        self.assertEqual(result["ids"], ["chunk42", "chunk7"])
+        self.assertEqual(result["documents"], ["doc 42", "doc 7"])
+        # One ids column read per id to confirm its hash match, plus the returned ids
+        self.assertLessEqual(len(reads), 5)
+        self.assertEqual(store.get(["chunk7", "chunk9", "chunk8"])["documents"], ["changed", "doc 8"])
+
+    def test_quantizers(self):
+        vectors = np.array([[0.5, -1.0, 0.0, 0.25, 1, 1, 1, -1, 0.1]], dtype=np.float32)
+
+        codes, scale = quantize_int8(vectors)
+        bits = quantize_binary(vectors)
+
+        self.assertEqual(codes.tolist(), [[127, -127, 0, 127, 127, 127, 127, -127, 127]])
+        np.testing.assert_allclose(codes * scale, vectors, atol=0.01)
+        self.assertEqual(bits.tolist(), [[0b10011110, 0b10000000]])
+
+    def test_namespaced_local_stores_are_separate(self):
+        default = open_vector_store("local", self.test_dir)
+        other = open_vector_store("local", self.test_dir, name="code_chunks_other")
+        self.fill(other, random_vectors(5))
+        other.flush()
+
+        self.assertEqual(default.directory, os.path.join(self.test_dir, "local_store"))
+        self.assertEqual(default.count(), 0)
+        self.assertEqual(open_vector_store("local", self.test_dir, name="code_chunks_other").count(), 5)
+
+    def test_open_unknown_store(self):
+        with self.assertRaises(ValueError):
+            open_vector_store("faiss", self.test_dir)
+        with self.assertRaises(ValueError):
+            LocalVectorStore(self.store_dir, quantization="pq")
+
+if __name__ == '__main__':
+    unittest.main()
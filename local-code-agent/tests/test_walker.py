@@ -0,0 +1,128 @@
+import sys
+import unittest
+from unittest.mock import patch
+import os
+import shutil
+import tempfile
+
+# Add local-code-agent to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from agent import walker
+from agent.walker import Walker, parse_ignore_lines
+
+class TestIgnorePatterns(unittest.TestCase):
+    def matches(self, pattern, path):
+        regex, _, _ = parse_ignore_lines([pattern])[0]
+        return bool(regex.match(path))
+
+    def test_unanchored_patterns_match_at_any_depth(self):
+        self.assertTrue(self.matches("*.log", "a/b/debug.log"))
+        self.assertTrue(self.matches("build", "src/build"))
+        self.assertFalse(self.matches("*.log", "debug.log.py"))
+
+    def test_anchored_patterns(self):
+        self.assertTrue(self.matches("/dist", "dist"))
+        self.assertFalse(self.matches("/dist", "src/dist"))
+        self.assertTrue(self.matches("docs/*.md", "docs/a.md"))
+        self.assertFalse(self.matches("docs/*.md", "docs/sub/a.md"))
+
+    def test_double_star(self):
+        self.assertTrue(self.matches("**/gen/*.py", "gen/a.py"))
+        self.assertTrue(self.matches("**/gen/*.py", "x/y/gen/a.py"))
+        self.assertTrue(self.matches("out/**", "out/a/b.py"))
+        self.assertTrue(self.matches("a/**/z.py", "a/z.py"))
+        self.assertTrue(self.matches("a/**/z.py", "a/b/c/z.py"))
+
+    def test_comments_negation_and_directory_only(self):
+        rules = parse_ignore_lines(["# comment", "", "!keep.py", "tmp/"])
+        self.assertEqual([(negated, directory_only) for _, negated, directory_only in rules],
+                         [(True, False), (False, True)])
+
+class TestWalker(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = os.path.realpath(tempfile.mkdtemp())
+        walker.clear_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, relative, content="x = 1", mode="w"):
+        path = os.path.join(self.test_dir, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, mode) as f:
+            f.write(content)
+        return path
+
+    def files(self, **kwargs):
+        paths = Walker(self.test_dir).files(**kwargs)
+        return sorted(os.path.relpath(p, self.test_dir) for p in paths)
+
+    def test_skips_ignored_directories_and_gitignored_paths(self):
+        self.write("main.py")
+        self.write("node_modules/lib/index.js")
+        self.write(".git/config.py")
+        self.write("build/out.py")
+        self.write("src/app.py")
+        self.write("src/app_pb2.py")
+        self.write("src/gen/model.py")
+        self.write(".gitignore", "build/\n*_pb2.py\n")
+        self.write("src/.gitignore", "gen\n")
+
+        self.assertEqual(self.files(extensions=(".py",)), ["main.py", "src/app.py"])
+
+    def test_project_ignore_file_and_negation(self):
+        self.write("a.py")
+        self.write("b.py")
+        self.write("vendor/c.py")
+        self.write(".gitignore", "*.py\n!a.py\n")
+        self.write(".agentignore", "vendor/\n!b.py\n")
+
+        self.assertEqual(self.files(extensions=(".py",)), ["a.py", "b.py"])
+
+    def test_skips_binary_files(self):
+        self.write("text.c", "int main;")
+        self.write("blob.c", b"\x7fELF\x00\x00", mode="wb")
+
+        self.assertEqual(self.files(), ["text.c"])
+        self.assertEqual(self.files(skip_binary=False), ["blob.c", "text.c"])
+
+    def test_listing_cache_is_revalidated(self):
+        self.write("a.py")
+        self.assertEqual(self.files(), ["a.py"])
+
+        with patch("os.scandir", side_effect=AssertionError("listing should be cached")):
+            self.assertEqual(self.files(), ["a.py"])
+
+        self.write("b.py")
+        # Adding a file changes the directory's mtime, so it is listed again
+        os.utime(self.test_dir, ns=(0, os.stat(self.test_dir).st_mtime_ns + 1_000_000))
+        self.assertEqual(self.files(), ["a.py", "b.py"])
+
+    def test_is_ignored(self):
+        self.write(".gitignore", "dist/\n*.min.js\n")
+        self.write("dist/app.js")
+        walk = Walker(self.test_dir)
+
+        self.assertTrue(walk.is_ignored(os.path.join(self.test_dir, "dist", "app.js")))
+        self.assertTrue(walk.is_ignored(os.path.join(self.test_dir, "src", "lib.min.js")))
+        self.assertTrue(walk.is_ignored(os.path.join(self.test_dir, "venv", "x.py")))
+        self.assertTrue(walk.is_ignored(os.path.dirname(self.test_dir)))
+        self.assertFalse(walk.is_ignored(os.path.join(self.test_dir, "src", "lib.js")))
+        self.assertFalse(walk.is_ignored(self.test_dir))
+
+    def test_ignore_files_and_their_scope(self):
+        exclude = os.path.join(self.test_dir, ".git", "info", "exclude")
+        nested = os.path.join(self.test_dir, "src", ".gitignore")
+
+        self.assertTrue(walker.is_ignore_file(exclude))
+        self.assertTrue(walker.is_ignore_file(nested))
+        self.assertFalse(walker.is_ignore_file(os.path.join(self.test_dir, "exclude")))
+        self.assertEqual(walker.ignore_file_scope(exclude), self.test_dir)
+        self.assertEqual(walker.ignore_file_scope(nested), os.path.join(self.test_dir, "src"))
+
+if __name__ == "__main__":
+    unittest.main()
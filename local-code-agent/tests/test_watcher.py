@@ -0,0 +1,209 @@
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import shutil
+import tempfile
+import threading
+
+# Add local-code-agent to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from module_mocks import ModuleMocks
+
+mocks = ModuleMocks({
+    # Mock dependencies before they are imported by agent.indexer
+    "chromadb": MagicMock(),
+    "tree_sitter_languages": MagicMock(),
+    "agent.embedding": MagicMock(),
+})
+with mocks:
+    from agent import indexer
+    from agent.watcher import Debouncer, InotifyWatcher, PollingWatcher, start_watching
+
+def setUpModule():
+    mocks.start()
+
+def tearDownModule():
+    mocks.stop()
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestDebouncer(unittest.TestCase):
+    def test_waits_for_quiet_period(self):
+        clock = FakeClock()
+        debouncer = Debouncer(quiet=0.5, max_delay=5.0, clock=clock)
+
+        debouncer.add({"a.py"})
+        clock.now = 0.3
+        debouncer.add({"b.py"})
+        clock.now = 0.6
+        self.assertFalse(debouncer.ready())
+        clock.now = 0.8
+
+        self.assertTrue(debouncer.ready())
+        self.assertEqual(debouncer.drain(), {"a.py", "b.py"})
+        self.assertFalse(debouncer.ready())
+
+    def test_long_burst_is_flushed_after_max_delay(self):
+        clock = FakeClock()
+        debouncer = Debouncer(quiet=0.5, max_delay=2.0, clock=clock)
+
+        for step in range(10):
+            clock.now = step * 0.25
+            debouncer.add({f"f{step}.py"})
+
+        self.assertTrue(debouncer.ready())
+        self.assertEqual(len(debouncer.drain()), 10)
+
+class WatcherTestMixin:
+    def setUp(self):
+        self.test_dir = os.path.realpath(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, relative, content="x = 1"):
+        path = os.path.join(self.test_dir, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def collect(self, watcher, expected, attempts=20):
+        changed = set()
+        for _ in range(attempts):
+            changed |= watcher.poll(0.05)
+            if expected <= changed:
+                break
+        return changed
+
+class TestPollingWatcher(WatcherTestMixin, unittest.TestCase):
+    def test_reports_created_modified_and_deleted_files(self):
+        existing = self.write("a.py")
+        watcher = PollingWatcher(self.test_dir, indexer.iter_source_files, interval=0.0)
+
+        created = self.write("pkg/b.py")
+        self.write("a.py", "x = 22")
+        self.assertEqual(watcher.poll(0.01), {created, existing})
+
+        os.remove(created)
+        self.assertEqual(watcher.poll(0.01), {created})
+        self.assertEqual(watcher.poll(0.01), set())
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux only")
+class TestInotifyWatcher(WatcherTestMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.watcher = InotifyWatcher(self.test_dir, ignore=lambda path: indexer.is_ignored(path, self.test_dir))
+
+    def tearDown(self):
+        self.watcher.close()
+        super().tearDown()
+
+    def test_reports_file_changes(self):
+        path = self.write("a.py")
+        self.assertIn(path, self.collect(self.watcher, {path}))
+
+        os.remove(path)
+        self.assertIn(path, self.collect(self.watcher, {path}))
+
+    def test_watches_new_directories(self):
+        os.makedirs(os.path.join(self.test_dir, "pkg"))
+        self.collect(self.watcher, {os.path.join(self.test_dir, "pkg")})
+
+        path = self.write("pkg/mod.py")
+
+        self.assertIn(path, self.collect(self.watcher, {path}))
+
+    def test_ignored_directories_are_not_reported(self):
+        os.makedirs(os.path.join(self.test_dir, ".git"))
+        self.write(".git/index.py")
+        visible = self.write("a.py")
+
+        changed = self.collect(self.watcher, {visible})
+
+        self.assertNotIn(os.path.join(self.test_dir, ".git", "index.py"), changed)
+        self.assertNotIn(os.path.join(self.test_dir, ".git"), changed)
+
+    def test_gitignored_directories_are_not_watched(self):
+        self.write(".gitignore", "build/\n")
+        self.write("build/out.py")
+        self.write("src/mod.py")
+        watcher = InotifyWatcher(self.test_dir)
+        self.addCleanup(watcher.close)
+
+        watched = set(watcher._dirs.values())
+
+        self.assertIn(os.path.join(self.test_dir, "src"), watched)
+        self.assertNotIn(os.path.join(self.test_dir, "build"), watched)
+
+    def test_reports_changes_of_the_git_exclude_file(self):
+        exclude = self.write(".git/info/exclude", "")
+        self.write(".git/info/attributes", "")
+        source = self.write("src/a.py")
+        watcher = InotifyWatcher(self.test_dir)
+        self.addCleanup(watcher.close)
+
+        self.write(".git/info/attributes", "*.py diff=python")
+        self.write(".git/info/exclude", "generated/")
+
+        changed = self.collect(watcher, {exclude})
+        self.assertEqual(changed, {exclude})
+        # The exclude file's rules apply to the whole repository
+        manifest = indexer.IndexManifest(os.path.join(self.test_dir, "manifest.json"))
+        files, _ = indexer.expand_changed_paths(self.test_dir, changed, manifest)
+        self.assertEqual(files, [source])
+
+class TestWatchLoop(WatcherTestMixin, unittest.TestCase):
+    @patch("config.WATCH_POLL_INTERVAL", 0.05)
+    @patch("config.WATCH_DEBOUNCE", 0.1)
+    def test_changes_are_indexed_incrementally(self):
+        self.write("a.py")
+        updated = threading.Event()
+        with patch("agent.indexer.index_codebase", return_value={"updated": 1}) as mock_index:
+            thread, stop = start_watching(self.test_dir, namespace="repo", polling=True,
+                                          on_update=lambda stats: updated.set())
+            path = self.write("b.py")
+            self.assertTrue(updated.wait(timeout=5))
+            stop.set()
+            thread.join(timeout=5)
+
+        kwargs = mock_index.call_args.kwargs
+        self.assertEqual(mock_index.call_args.args, (self.test_dir,))
+        self.assertEqual(kwargs["paths"], {path})
+        self.assertEqual(kwargs["namespace"], "repo")
+
+    @patch("config.WATCH_POLL_INTERVAL", 0.05)
+    @patch("config.WATCH_DEBOUNCE", 0.1)
+    @patch("config.WATCH_RETRY_DELAY", 0.1)
+    def test_failed_update_is_retried(self):
+        updated = threading.Event()
+        results = [RuntimeError("embedding retries exhausted"), {"updated": 1}]
+
+        def index_codebase(*args, **kwargs):
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        with patch("agent.indexer.index_codebase", side_effect=index_codebase) as mock_index:
+            thread, stop = start_watching(self.test_dir, polling=True, on_update=lambda stats: updated.set())
+            path = self.write("b.py")
+            self.assertTrue(updated.wait(timeout=5))
+            stop.set()
+            thread.join(timeout=5)
+
+        self.assertEqual(mock_index.call_count, 2)
+        self.assertEqual(mock_index.call_args.kwargs["paths"], {path})
+
+if __name__ == "__main__":
+    unittest.main()